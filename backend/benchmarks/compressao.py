@@ -0,0 +1,125 @@
+"""
+Benchmark de compressão: custo de CPU x economia de banda
+
+Gera payloads típicos da API (lista de funcionários, lista de frequência,
+relatório e exportação XLSX) e mede, para cada codificação e nível, a taxa
+de compressão, o tempo de CPU e o tempo estimado de transferência em 3G.
+
+Uso (a partir de backend/):
+    python benchmarks/compressao.py
+"""
+from pathlib import Path
+import json
+import random
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.compressao import codificacoes_disponiveis, criar_compressor
+
+# Banda típica de um tablet em campo (3G): ~1 Mbit/s
+BANDA_BYTES_POR_SEGUNDO = 1_000_000 / 8
+NIVEIS = {"gzip": [1, 6, 9], "br": [1, 4, 8], "zstd": [1, 3, 9]}
+REPETICOES = 5
+
+
+def _funcionarios(n: int):
+    setores = ["Obras", "Administrativo", "TI", "Financeiro", "Comercial"]
+    return [
+        {
+            "id": f"{i:08d}-1111-2222-3333-444455556666",
+            "nome": f"Funcionário Exemplo {i}",
+            "cpf": f"{i % 1000:03d}.{i % 997:03d}.{i % 991:03d}-{i % 97:02d}",
+            "cargo": random.choice(["Pedreiro", "Engenheiro", "Analista", "Servente"]),
+            "setor": random.choice(setores),
+            "data_admissao": "2024-01-15",
+            "ativo": True,
+            "email": f"funcionario{i}@example.com",
+            "telefone": "(31) 98765-4321"
+        }
+        for i in range(n)
+    ]
+
+
+def _frequencia(n: int):
+    return [
+        {
+            "id": f"{i:08d}-aaaa-bbbb-cccc-ddddeeeeffff",
+            "funcionario_id": f"{i % 500:08d}-1111-2222-3333-444455556666",
+            "nome": f"Funcionário Exemplo {i % 500}",
+            "data": f"2025-01-{i % 28 + 1:02d}",
+            "tipo_dia": "util",
+            "hora_entrada": f"0{random.randint(7, 9)}:{random.choice(['00', '15', '30'])}",
+            "hora_saida": f"{random.randint(17, 19)}:{random.choice(['00', '15', '30'])}",
+            "observacao": None,
+            "total_horas": round(random.uniform(8, 11), 2)
+        }
+        for i in range(n)
+    ]
+
+
+def _payloads():
+    funcionarios = _funcionarios(1000)
+    frequencia = _frequencia(5000)
+    relatorio = {
+        "tipo": "frequencia",
+        "periodo": {"data_inicio": "2025-01-01", "data_fim": "2025-01-31"},
+        "dados": [
+            {"funcionario_id": f["id"], "nome": f["nome"], "total_registros": 22,
+             "total_horas": 190.5, "dias_trabalhados": 22}
+            for f in funcionarios[:500]
+        ],
+        "totalizadores": {"total_registros": 11000, "total_horas": 95250.0, "total_funcionarios": 500},
+        "gerado_em": "2025-01-31T23:59:59"
+    }
+    payloads = {
+        "funcionarios (1k, JSON)": json.dumps(funcionarios).encode(),
+        "frequencia (5k, JSON)": json.dumps(frequencia).encode(),
+        "relatorio (500, JSON)": json.dumps(relatorio).encode(),
+    }
+    try:
+        from services.excel_service import ExcelService
+        payloads["frequencia (5k, XLSX)"] = ExcelService.export_frequencia_to_excel(frequencia).getvalue()
+    except ImportError:
+        print("pandas/openpyxl indisponíveis: XLSX fora do benchmark\n")
+    return payloads
+
+
+def _medir(codificacao: str, nivel: int, dados: bytes):
+    melhor = float("inf")
+    tamanho = 0
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        compressor = criar_compressor(codificacao, nivel)
+        saida = compressor.comprimir(dados) + compressor.finalizar()
+        melhor = min(melhor, time.perf_counter() - inicio)
+        tamanho = len(saida)
+    return tamanho, melhor
+
+
+def main():
+    random.seed(42)
+    codificacoes = codificacoes_disponiveis()
+    print(f"Codificações disponíveis: {', '.join(codificacoes)}\n")
+
+    for nome, dados in _payloads().items():
+        original = len(dados)
+        transferencia_original = original / BANDA_BYTES_POR_SEGUNDO
+        print(f"{nome}: {original / 1024:.1f} KiB, {transferencia_original:.2f}s em 3G sem compressão")
+        print(f"  {'codificação':<10} {'nível':>5} {'tamanho':>10} {'taxa':>7} {'CPU (ms)':>9} {'3G (s)':>7} {'ganho (s)':>9}")
+        for codificacao in codificacoes:
+            for nivel in NIVEIS[codificacao]:
+                tamanho, segundos = _medir(codificacao, nivel, dados)
+                transferencia = tamanho / BANDA_BYTES_POR_SEGUNDO
+                ganho = transferencia_original - transferencia - segundos
+                print(
+                    f"  {codificacao:<10} {nivel:>5} {tamanho / 1024:>8.1f}Ki "
+                    f"{original / tamanho:>6.1f}x {segundos * 1000:>9.2f} "
+                    f"{transferencia:>7.2f} {ganho:>9.2f}"
+                )
+        print()
+
+
+if __name__ == "__main__":
+    main()
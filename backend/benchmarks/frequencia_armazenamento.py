@@ -0,0 +1,147 @@
+"""
+Benchmark dos layouts de armazenamento da frequência: diário x mensal
+
+Gera o mesmo histórico sintético nos dois layouts, em um banco temporário
+(DB_NAME + "_benchmark", removido ao final), com os índices de produção, e
+compara:
+- tamanho dos documentos, armazenamento e índices (collStats)
+- consultas de período: um funcionário em 12 meses, todos em um mês e a
+  agregação da folha de ponto
+
+Uso (a partir de backend/, com MONGO_URL apontando para um mongod):
+    python benchmarks/frequencia_armazenamento.py [funcionarios] [meses]
+"""
+from pathlib import Path
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+load_dotenv(ROOT_DIR / ".env")
+
+from database import criar_indices
+from services.calendario_service import calendario
+from services.frequencia_armazenamento import armazenamento_frequencia
+
+FUNCIONARIOS = 500
+MESES = 24
+REPETICOES = 5
+ANO_INICIAL = 2023
+
+
+def _registros(funcionarios: int, meses: int):
+    """Histórico sintético: um registro por funcionário em cada dia útil"""
+    ids = [str(uuid.uuid4()) for _ in range(funcionarios)]
+    for mes_indice in range(meses):
+        ano, mes = ANO_INICIAL + mes_indice // 12, mes_indice % 12 + 1
+        for dia in range(1, 32):
+            try:
+                data = f"{ano}-{mes:02d}-{dia:02d}"
+                if not calendario.eh_dia_util(data):
+                    continue
+            except ValueError:
+                break
+            lote = []
+            for i, funcionario_id in enumerate(ids):
+                entrada = random.randint(7 * 60, 9 * 60)
+                saida = random.randint(17 * 60, 19 * 60)
+                lote.append({
+                    "id": str(uuid.uuid4()),
+                    "funcionario_id": funcionario_id,
+                    "nome": f"Funcionário Exemplo {i}",
+                    "data": data,
+                    "tipo_dia": "util",
+                    "hora_entrada": f"{entrada // 60:02d}:{entrada % 60:02d}",
+                    "hora_saida": f"{saida // 60:02d}:{saida % 60:02d}",
+                    "observacao": None,
+                    "total_horas": round((saida - entrada) / 60, 2),
+                })
+            yield ids, lote
+
+
+async def _tempo(consulta) -> float:
+    """Mediana de REPETICOES execuções, em ms"""
+    tempos = []
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        await consulta()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+async def _consultas(armazenamento, funcionario_id: str, ids):
+    ultimo_ano = ANO_INICIAL + (MESES - 1) // 12
+    ultimo_mes = (MESES - 1) % 12 + 1
+    mes = f"{ultimo_ano}-{ultimo_mes:02d}"
+
+    async def um_funcionario_um_ano():
+        return await armazenamento.listar(funcionario_id, f"{ultimo_ano - 1}-{ultimo_mes:02d}-01", f"{mes}-31")
+
+    async def todos_um_mes():
+        return [reg async for bloco in armazenamento.blocos(None, f"{mes}-01", f"{mes}-31") for reg in bloco]
+
+    async def folha_ponto():
+        pipeline = armazenamento.estagios(ids, f"{mes}-01", f"{mes}-31") + [
+            {"$group": {"_id": "$funcionario_id", "horas": {"$sum": "$total_horas"}}}
+        ]
+        return await armazenamento.colecao.aggregate(pipeline).to_list(None)
+
+    return {
+        "1 funcionário, 12 meses (ms)": await _tempo(um_funcionario_um_ano),
+        "todos, 1 mês (ms)": await _tempo(todos_um_mes),
+        "agregação folha de ponto (ms)": await _tempo(folha_ponto),
+    }
+
+
+async def main(funcionarios: int, meses: int):
+    random.seed(42)
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    db = client[f"{os.environ['DB_NAME']}_benchmark"]
+    await client.drop_database(db.name)
+    try:
+        await criar_indices(db)
+        layouts = {modo: armazenamento_frequencia(db, modo) for modo in ("diario", "mensal")}
+
+        total = 0
+        ids = []
+        inicio = time.perf_counter()
+        for ids, lote in _registros(funcionarios, meses):
+            total += len(lote)
+            for armazenamento in layouts.values():
+                await armazenamento.inserir_lote([dict(reg) for reg in lote])
+        print(f"{total} registros ({funcionarios} funcionários x {meses} meses) gerados em "
+              f"{time.perf_counter() - inicio:.1f}s\n")
+
+        resultados = {}
+        for modo, armazenamento in layouts.items():
+            stats = await db.command("collStats", armazenamento.nome_colecao)
+            resultados[modo] = {
+                "documentos": stats["count"],
+                "tamanho dos dados (MiB)": stats["size"] / 2**20,
+                "armazenamento (MiB)": stats["storageSize"] / 2**20,
+                "índices (MiB)": stats["totalIndexSize"] / 2**20,
+                **await _consultas(armazenamento, ids[0], ids),
+            }
+
+        print(f"{'métrica':<32} {'diário':>12} {'mensal':>12} {'razão':>8}")
+        for metrica in resultados["diario"]:
+            diario, mensal = resultados["diario"][metrica], resultados["mensal"][metrica]
+            razao = diario / mensal if mensal else float("inf")
+            print(f"{metrica:<32} {diario:>12.2f} {mensal:>12.2f} {razao:>7.1f}x")
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    argumentos = [int(valor) for valor in sys.argv[1:3]]
+    asyncio.run(main(*argumentos, *(FUNCIONARIOS, MESES)[len(argumentos):]))
@@ -0,0 +1,11 @@
+from .versoes import versoes_colecoes
+from .etag import calcular_etag, verificar_etag
+from .compressao import CompressaoMiddleware, sem_compressao
+
+__all__ = [
+    'versoes_colecoes',
+    'calcular_etag',
+    'verificar_etag',
+    'CompressaoMiddleware',
+    'sem_compressao'
+]
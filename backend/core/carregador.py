@@ -0,0 +1,126 @@
+"""
+Carregamento em lote por requisição (padrão DataLoader)
+
+As chamadas a `carregar(chave)` feitas na mesma volta do event loop (por
+exemplo, vários get_by_id dentro de um asyncio.gather) viram uma única busca
+com $in, e chaves repetidas são resolvidas uma vez só. O código dos serviços
+continua buscando item a item.
+
+Os carregadores vivem em um ContextVar aberto pelo CarregadoresMiddleware a
+cada requisição, então o cache nunca é compartilhado entre requisições nem
+sobrevive a elas. Fora de uma requisição (tarefas em segundo plano, scripts)
+`carregadores_atuais()` retorna None e os serviços consultam o banco direto.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from starlette.types import ASGIApp, Receive, Scope, Send
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, List, Optional, Set
+import asyncio
+
+BuscarLote = Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+
+
+class CarregadorEmLote:
+    """Agrupa as chaves pedidas na mesma volta do loop em uma busca só"""
+
+    def __init__(self, buscar_lote: BuscarLote):
+        self._buscar_lote = buscar_lote
+        self._cache: Dict[Hashable, asyncio.Future] = {}
+        self._pendentes: List[Hashable] = []
+        self._tarefas: Set[asyncio.Task] = set()
+
+    async def carregar(self, chave: Hashable) -> Any:
+        """Valor da chave (None se não existir)"""
+        futuro = self._cache.get(chave)
+        if futuro is None:
+            loop = asyncio.get_running_loop()
+            futuro = loop.create_future()
+            self._cache[chave] = futuro
+            self._pendentes.append(chave)
+            # O despacho roda depois que as demais corrotinas da volta atual
+            # tiverem registrado suas chaves
+            if len(self._pendentes) == 1:
+                loop.call_soon(self._despachar)
+        # shield: o cancelamento de quem espera não cancela o resultado compartilhado
+        return await asyncio.shield(futuro)
+
+    def limpar(self, chave: Optional[Hashable] = None) -> None:
+        """Esquece uma chave (ou todas), para a próxima leitura ir ao banco"""
+        if chave is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(chave, None)
+
+    def _despachar(self) -> None:
+        chaves, self._pendentes = self._pendentes, []
+        tarefa = asyncio.ensure_future(self._executar(chaves))
+        self._tarefas.add(tarefa)
+        tarefa.add_done_callback(self._tarefas.discard)
+
+    async def _executar(self, chaves: List[Hashable]) -> None:
+        futuros = [(chave, self._cache.get(chave)) for chave in chaves]
+        try:
+            resultados = await self._buscar_lote(chaves)
+        except Exception as e:
+            for chave, futuro in futuros:
+                # Erros não ficam em cache: a próxima chamada tenta de novo
+                if self._cache.get(chave) is futuro:
+                    self._cache.pop(chave)
+                if futuro is not None and not futuro.done():
+                    futuro.set_exception(e)
+            return
+        for chave, futuro in futuros:
+            if futuro is not None and not futuro.done():
+                futuro.set_result(resultados.get(chave))
+
+
+class Carregadores:
+    """Carregadores de uma requisição, por nome ("funcionarios.id", ...)"""
+
+    def __init__(self):
+        self._por_nome: Dict[str, CarregadorEmLote] = {}
+
+    def obter(self, nome: str, buscar_lote: BuscarLote) -> CarregadorEmLote:
+        carregador = self._por_nome.get(nome)
+        if carregador is None:
+            carregador = self._por_nome[nome] = CarregadorEmLote(buscar_lote)
+        return carregador
+
+    def limpar(self, prefixo: str) -> None:
+        """Esvazia os carregadores cujo nome começa pelo prefixo (após escritas)"""
+        for nome, carregador in self._por_nome.items():
+            if nome.startswith(prefixo):
+                carregador.limpar()
+
+
+_carregadores: ContextVar[Optional[Carregadores]] = ContextVar("carregadores", default=None)
+
+
+def carregadores_atuais() -> Optional[Carregadores]:
+    """Carregadores da requisição em andamento, ou None fora de uma"""
+    return _carregadores.get()
+
+
+@contextmanager
+def escopo_carregadores() -> Iterator[Carregadores]:
+    """Abre um conjunto novo de carregadores (uma requisição, um job)"""
+    carregadores = Carregadores()
+    token = _carregadores.set(carregadores)
+    try:
+        yield carregadores
+    finally:
+        _carregadores.reset(token)
+
+
+class CarregadoresMiddleware:
+    """Dá a cada requisição HTTP seus próprios carregadores em lote"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with escopo_carregadores():
+            await self.app(scope, receive, send)
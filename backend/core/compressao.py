@@ -0,0 +1,276 @@
+"""
+Compressão negociada das respostas HTTP (brotli, zstd e gzip)
+
+Middleware ASGI puro: escolhe a codificação pelo Accept-Encoding do cliente,
+ignora corpos abaixo de um tamanho mínimo e comprime StreamingResponse pedaço
+a pedaço, sem acumular o corpo inteiro em memória. brotli e zstandard são
+opcionais; sem eles a negociação cai para gzip.
+"""
+from abc import ABC, abstractmethod
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Callable, Iterable, Optional, Sequence, Tuple
+import anyio
+import zlib
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependência opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - dependência opcional
+    zstandard = None
+
+
+# Tipos de conteúdo que valem a pena comprimir. Apesar de o XLSX já ser um
+# zip, cada parte é comprimida isoladamente e ainda sobra redundância entre
+# elas (~2.5x nas exportações de frequência, ver benchmarks/compressao.py).
+# text/event-stream fica de fora: o feed ao vivo precisa de cada evento na hora
+# (e o endpoint do feed também é marcado com @sem_compressao).
+TIPOS_COMPRIMIVEIS = (
+    "application/json",
+    "text/plain",
+    "text/html",
+    "text/csv",
+    "application/javascript",
+    "image/svg+xml",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+)
+
+# Acima deste tamanho, a compressão de um corpo único roda em thread separada
+# para não bloquear o event loop
+LIMITE_THREAD_BYTES = 256 * 1024
+
+
+def sem_compressao(endpoint: Callable) -> Callable:
+    """Marca um endpoint para nunca ter a resposta comprimida"""
+    endpoint._sem_compressao = True
+    return endpoint
+
+
+class Compressor(ABC):
+    """Interface comum dos compressores em streaming"""
+
+    @abstractmethod
+    def comprimir(self, dados: bytes) -> bytes:
+        ...
+
+    @abstractmethod
+    def finalizar(self) -> bytes:
+        ...
+
+
+class GzipCompressor(Compressor):
+    def __init__(self, nivel: int = 6):
+        self._obj = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+
+    def comprimir(self, dados: bytes) -> bytes:
+        return self._obj.compress(dados)
+
+    def finalizar(self) -> bytes:
+        return self._obj.flush()
+
+
+class BrotliCompressor(Compressor):
+    def __init__(self, nivel: int = 4):
+        self._obj = brotli.Compressor(quality=nivel)
+
+    def comprimir(self, dados: bytes) -> bytes:
+        return self._obj.process(dados)
+
+    def finalizar(self) -> bytes:
+        return self._obj.finish()
+
+
+class ZstdCompressor(Compressor):
+    def __init__(self, nivel: int = 3):
+        self._obj = zstandard.ZstdCompressor(level=nivel).compressobj()
+
+    def comprimir(self, dados: bytes) -> bytes:
+        return self._obj.compress(dados)
+
+    def finalizar(self) -> bytes:
+        return self._obj.flush()
+
+
+def codificacoes_disponiveis() -> Tuple[str, ...]:
+    """Codificações suportadas neste ambiente, em ordem de preferência"""
+    disponiveis = []
+    if brotli is not None:
+        disponiveis.append("br")
+    if zstandard is not None:
+        disponiveis.append("zstd")
+    disponiveis.append("gzip")
+    return tuple(disponiveis)
+
+
+def criar_compressor(codificacao: str, nivel: Optional[int] = None) -> Compressor:
+    """Cria o compressor da codificação informada"""
+    classes = {"gzip": GzipCompressor, "br": BrotliCompressor, "zstd": ZstdCompressor}
+    classe = classes[codificacao]
+    return classe() if nivel is None else classe(nivel)
+
+
+def negociar_codificacao(accept_encoding: str, preferencia: Sequence[str]) -> Optional[str]:
+    """Escolhe a codificação aceita pelo cliente respeitando a preferência do servidor"""
+    aceitas = {}
+    for item in accept_encoding.split(","):
+        partes = item.strip().split(";")
+        nome = partes[0].strip().lower()
+        if not nome:
+            continue
+        q = 1.0
+        for parametro in partes[1:]:
+            chave, _, valor = parametro.strip().partition("=")
+            if chave == "q":
+                try:
+                    q = float(valor)
+                except ValueError:
+                    q = 0.0
+        aceitas[nome] = q
+
+    for codificacao in preferencia:
+        q = aceitas.get(codificacao, aceitas.get("*", 0.0))
+        if q > 0:
+            return codificacao
+    return None
+
+
+class CompressaoMiddleware:
+    """
+    Middleware de compressão negociada.
+
+    - minimo_bytes: corpos menores são enviados sem compressão
+    - excluir_prefixos: caminhos que nunca são comprimidos
+    - tipos: content-types comprimíveis (prefixo)
+    - niveis: nível por codificação, ex. {"gzip": 6, "br": 4, "zstd": 3}
+
+    Endpoints decorados com @sem_compressao e respostas que já definem
+    Content-Encoding também passam direto.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimo_bytes: int = 1024,
+        excluir_prefixos: Iterable[str] = (),
+        tipos: Iterable[str] = TIPOS_COMPRIMIVEIS,
+        preferencia: Optional[Sequence[str]] = None,
+        niveis: Optional[dict] = None,
+    ):
+        self.app = app
+        self.minimo_bytes = minimo_bytes
+        self.excluir_prefixos = tuple(p for p in excluir_prefixos if p)
+        self.tipos = tuple(tipos)
+        disponiveis = codificacoes_disponiveis()
+        self.preferencia = tuple(c for c in (preferencia or disponiveis) if c in disponiveis)
+        self.niveis = niveis or {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.excluir_prefixos):
+            await self.app(scope, receive, send)
+            return
+
+        codificacao = negociar_codificacao(
+            Headers(scope=scope).get("accept-encoding", ""),
+            self.preferencia
+        )
+        if codificacao is None:
+            await self.app(scope, receive, send)
+            return
+
+        resposta = _RespostaComprimida(self, scope, send, codificacao)
+        await self.app(scope, receive, resposta.send)
+
+
+class _RespostaComprimida:
+    """Intercepta as mensagens ASGI de uma resposta e comprime o corpo"""
+
+    def __init__(self, middleware: CompressaoMiddleware, scope: Scope, send: Send, codificacao: str):
+        self.middleware = middleware
+        self.scope = scope
+        self._send = send
+        self.codificacao = codificacao
+        self.inicio: Optional[Message] = None
+        self.compressor: Optional[Compressor] = None
+        self.repassar = False
+
+    def _deve_comprimir(self, inicio: Message) -> bool:
+        if inicio["status"] in (204, 304) or inicio["status"] < 200:
+            return False
+        endpoint = self.scope.get("endpoint")
+        if endpoint is not None and getattr(endpoint, "_sem_compressao", False):
+            return False
+        headers = Headers(raw=inicio["headers"])
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(self.middleware.tipos)
+
+    def _cabecalhos_comprimidos(self, tamanho: Optional[int]) -> Message:
+        headers = MutableHeaders(raw=self.inicio["headers"])
+        headers["Content-Encoding"] = self.codificacao
+        headers.add_vary_header("Accept-Encoding")
+        # Os bytes mudam com a codificação: a ETag forte do corpo original
+        # vira fraca (o If-None-Match usa comparação fraca e continua valendo)
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        if tamanho is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(tamanho)
+        return self.inicio
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.inicio = message
+            self.repassar = not self._deve_comprimir(message)
+            if self.repassar:
+                await self._send(message)
+            return
+
+        if message["type"] != "http.response.body" or self.repassar:
+            await self._send(message)
+            return
+
+        corpo = message.get("body", b"")
+        mais = message.get("more_body", False)
+
+        if self.compressor is None:
+            # Primeiro pedaço do corpo: decide entre enviar cru, comprimir
+            # de uma vez ou comprimir em streaming
+            if not mais and len(corpo) < self.middleware.minimo_bytes:
+                self.repassar = True
+                await self._send(self.inicio)
+                await self._send(message)
+                return
+
+            self.compressor = criar_compressor(
+                self.codificacao,
+                self.middleware.niveis.get(self.codificacao)
+            )
+
+            if not mais:
+                comprimido = await self._comprimir_tudo(corpo)
+                await self._send(self._cabecalhos_comprimidos(len(comprimido)))
+                await self._send({"type": "http.response.body", "body": comprimido})
+                return
+
+            await self._send(self._cabecalhos_comprimidos(None))
+
+        dados = self.compressor.comprimir(corpo)
+        if not mais:
+            dados += self.compressor.finalizar()
+        if dados or not mais:
+            await self._send({"type": "http.response.body", "body": dados, "more_body": mais})
+
+    async def _comprimir_tudo(self, corpo: bytes) -> bytes:
+        def trabalho() -> bytes:
+            return self.compressor.comprimir(corpo) + self.compressor.finalizar()
+
+        if len(corpo) >= LIMITE_THREAD_BYTES:
+            return await anyio.to_thread.run_sync(trabalho)
+        return trabalho()
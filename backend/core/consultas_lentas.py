@@ -0,0 +1,237 @@
+"""
+Log estruturado de comandos lentos do MongoDB, com plano de execução
+
+Listener de monitoramento de comandos do pymongo (registrado no cliente do
+Motor): todo comando acima de MONGO_LENTO_MS vira um registro estruturado
+no logger `mongo.lento` (os campos vão em `extra`, serializados pelo
+formatador JSON de core/logs.py). Os valores dos filtros são trocados por "?" (só a forma da
+consulta vai para o log, sem CPFs e nomes).
+
+find e aggregate lentos têm o plano capturado com
+explain("executionStats") em uma thread separada, fora do caminho da
+requisição: sempre na primeira vez que uma forma de consulta aparece (um
+índice faltando é registrado na hora) e, depois, por amostragem
+(MONGO_EXPLAIN_AMOSTRA), no máximo uma vez por forma a cada
+MONGO_EXPLAIN_INTERVALO_S. Planos com COLLSCAN são registrados em WARNING
+com "collscan": true.
+
+MONGO_LENTO_MS=0 desliga o monitoramento.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import MongoClient, monitoring
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger("mongo.lento")
+
+MONGO_LENTO_MS = float(os.environ.get("MONGO_LENTO_MS", "200"))
+MONGO_EXPLAIN_AMOSTRA = float(os.environ.get("MONGO_EXPLAIN_AMOSTRA", "0.05"))
+MONGO_EXPLAIN_INTERVALO_S = float(os.environ.get("MONGO_EXPLAIN_INTERVALO_S", "300"))
+# Explains enfileirados além disso são descartados
+MAX_EXPLAINS_PENDENTES = 4
+
+COMANDOS_EXPLICAVEIS = ("find", "aggregate")
+# Campos de sessão/protocolo que não podem ir dentro de um explain
+CAMPOS_PROTOCOLO = {
+    "$db", "lsid", "$clusterTime", "$readPreference", "txnNumber",
+    "autocommit", "startTransaction", "readConcern", "writeConcern", "apiVersion",
+}
+
+
+def forma(valor: Any) -> Any:
+    """Estrutura da consulta com os valores trocados por '?'"""
+    if isinstance(valor, dict):
+        return {chave: forma(item) for chave, item in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        # $in com 500 IDs vira ["?"]: o que importa é a estrutura
+        formas = []
+        for item in valor:
+            item_forma = forma(item)
+            if item_forma not in formas:
+                formas.append(item_forma)
+        return formas
+    return "?"
+
+
+def _estagios(plano: Any, encontrados: List[str], indices: List[str]) -> None:
+    """Coleta os estágios (COLLSCAN, IXSCAN...) e índices de um explain"""
+    if isinstance(plano, dict):
+        estagio = plano.get("stage")
+        if isinstance(estagio, str):
+            encontrados.append(estagio)
+            if plano.get("indexName"):
+                indices.append(plano["indexName"])
+        for chave, item in plano.items():
+            # rejectedPlans não foram executados
+            if chave != "rejectedPlans":
+                _estagios(item, encontrados, indices)
+    elif isinstance(plano, list):
+        for item in plano:
+            _estagios(item, encontrados, indices)
+
+
+def _estatisticas(explain: Any) -> Optional[Dict[str, Any]]:
+    """Primeiro executionStats do explain (no topo ou dentro de $cursor)"""
+    if isinstance(explain, dict):
+        if "executionStats" in explain:
+            return explain["executionStats"]
+        for item in explain.values():
+            encontrado = _estatisticas(item)
+            if encontrado:
+                return encontrado
+    elif isinstance(explain, list):
+        for item in explain:
+            encontrado = _estatisticas(item)
+            if encontrado:
+                return encontrado
+    return None
+
+
+def resumir_explain(explain: Dict[str, Any]) -> Dict[str, Any]:
+    estagios: List[str] = []
+    indices: List[str] = []
+    _estagios(explain.get("queryPlanner", explain.get("stages", explain)), estagios, indices)
+    estatisticas = _estatisticas(explain) or {}
+    return {
+        "collscan": "COLLSCAN" in estagios,
+        "estagios": list(dict.fromkeys(estagios)),
+        "indices": list(dict.fromkeys(indices)),
+        "docs_examinados": estatisticas.get("totalDocsExamined"),
+        "chaves_examinadas": estatisticas.get("totalKeysExamined"),
+        "retornados": estatisticas.get("nReturned"),
+        "tempo_explain_ms": estatisticas.get("executionTimeMillis"),
+    }
+
+
+class MonitorConsultasLentas(monitoring.CommandListener):
+    """
+    Os callbacks rodam nas threads do pymongo, no meio da operação: aqui só
+    se mede e se registra; o explain vai para um executor próprio.
+    """
+
+    def __init__(
+        self,
+        criar_cliente_explain: Callable[[], MongoClient],
+        limite_ms: float = MONGO_LENTO_MS,
+        amostra: float = MONGO_EXPLAIN_AMOSTRA,
+        intervalo_s: float = MONGO_EXPLAIN_INTERVALO_S
+    ):
+        self._criar_cliente_explain = criar_cliente_explain
+        self._cliente_explain: Optional[MongoClient] = None
+        self.limite_ms = limite_ms
+        self.amostra = amostra
+        self.intervalo_s = intervalo_s
+        self._iniciados: Dict[Tuple[Any, int], Dict[str, Any]] = {}
+        # forma da consulta -> instante do último explain
+        self._explicados: Dict[str, float] = {}
+        self._pendentes = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mongo-explain")
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        # Só find/aggregate precisam do comando original (para o explain)
+        if event.command_name in COMANDOS_EXPLICAVEIS:
+            self._iniciados[(event.connection_id, event.request_id)] = event.command
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        comando = self._iniciados.pop((event.connection_id, event.request_id), None)
+        self._registrar(event, comando, erro=None)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        comando = self._iniciados.pop((event.connection_id, event.request_id), None)
+        self._registrar(event, comando, erro=str(event.failure.get("errmsg", "")))
+
+    def _registrar(self, event, comando: Optional[Dict[str, Any]], erro: Optional[str]) -> None:
+        duracao_ms = event.duration_micros / 1000
+        if duracao_ms < self.limite_ms:
+            return
+        registro: Dict[str, Any] = {
+            "evento": "mongo_lento",
+            "comando": event.command_name,
+            "banco": event.database_name,
+            "duracao_ms": round(duracao_ms, 1),
+            "limite_ms": self.limite_ms,
+        }
+        if comando is not None:
+            registro["colecao"] = comando.get(event.command_name)
+            if event.command_name == "find":
+                registro["filtro"] = forma(comando.get("filter", {}))
+                registro["ordenacao"] = comando.get("sort")
+            else:
+                registro["pipeline"] = forma(comando.get("pipeline", []))
+        if erro is not None:
+            registro["erro"] = erro
+        logger.warning("Comando lento no MongoDB", extra=registro)
+
+        if comando is not None and erro is None:
+            self._agendar_explain(event.database_name, event.command_name, comando, registro)
+
+    def _deve_explicar(self, chave_forma: str) -> bool:
+        agora = time.monotonic()
+        with self._lock:
+            ultimo = self._explicados.get(chave_forma)
+            if ultimo is not None and (agora - ultimo < self.intervalo_s or random.random() >= self.amostra):
+                return False
+            if self._pendentes >= MAX_EXPLAINS_PENDENTES:
+                return False
+            if len(self._explicados) > 10000:
+                self._explicados.clear()
+            self._explicados[chave_forma] = agora
+            self._pendentes += 1
+            return True
+
+    def _agendar_explain(self, banco: str, nome: str, comando: Dict[str, Any], registro: Dict[str, Any]) -> None:
+        pipeline = comando.get("pipeline") or []
+        # Estágios de escrita não são explicados em executionStats
+        if any("$out" in estagio or "$merge" in estagio for estagio in pipeline if isinstance(estagio, dict)):
+            return
+        chave_forma = json.dumps(
+            [banco, nome, registro.get("colecao"), registro.get("filtro"), registro.get("pipeline"), registro.get("ordenacao")],
+            sort_keys=True, default=str
+        )
+        if not self._deve_explicar(chave_forma):
+            return
+        original = {chave: valor for chave, valor in comando.items() if chave not in CAMPOS_PROTOCOLO}
+        self._executor.submit(self._explicar, banco, original, registro)
+
+    def _explicar(self, banco: str, comando: Dict[str, Any], registro: Dict[str, Any]) -> None:
+        try:
+            if self._cliente_explain is None:
+                self._cliente_explain = self._criar_cliente_explain()
+            explain = self._cliente_explain[banco].command(
+                {"explain": comando, "verbosity": "executionStats"}
+            )
+            resumo = resumir_explain(explain)
+            nivel = logging.WARNING if resumo["collscan"] else logging.INFO
+            logger.log(nivel, "Plano de execução de comando lento", extra={
+                "evento": "mongo_explain",
+                "comando": registro["comando"],
+                "colecao": registro.get("colecao"),
+                "filtro": registro.get("filtro"),
+                "pipeline": registro.get("pipeline"),
+                "duracao_ms": registro["duracao_ms"],
+                **resumo,
+            })
+        except Exception as e:
+            logger.error("Falha no explain de %s: %s", registro.get('colecao'), e)
+        finally:
+            with self._lock:
+                self._pendentes -= 1
+
+    def fechar(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._cliente_explain is not None:
+            self._cliente_explain.close()
+
+
+def criar_monitor(mongo_url: str) -> Optional[MonitorConsultasLentas]:
+    """Monitor para o cliente do Motor, ou None com MONGO_LENTO_MS=0"""
+    if MONGO_LENTO_MS <= 0:
+        return None
+    # Cliente à parte, sem o listener: os explains não se monitoram
+    return MonitorConsultasLentas(lambda: MongoClient(mongo_url, maxPoolSize=1))
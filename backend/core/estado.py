@@ -0,0 +1,244 @@
+"""
+Estado compartilhado entre workers (cache de relatórios, versões e limites)
+
+Com um único processo, tudo fica em memória (EstadoLocal). Para rodar vários
+workers (gunicorn/uvicorn --workers), aponte ESTADO_COMPARTILHADO_URL para um
+Redis: os contadores de limite de taxa, o cache de relatórios e as versões das
+coleções passam a valer para todos os workers. O pacote `redis` é opcional e
+só é exigido nesse modo.
+
+O status das importações já fica na coleção `importacoes` do MongoDB e é
+visto por qualquer worker; não passa por aqui.
+
+Cada incremento de versão (core/versoes.py) é publicado no backend antes de
+a escrita responder, e o VersoesCompartilhadasMiddleware traz as versões
+publicadas pelos outros workers no início de cada requisição.
+"""
+from abc import ABC, abstractmethod
+from starlette.types import ASGIApp, Receive, Scope, Send
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+import os
+import time
+import uuid
+
+from core.versoes import versoes_colecoes
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # pragma: no cover - dependência opcional
+    redis_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+ESTADO_COMPARTILHADO_URL = os.environ.get("ESTADO_COMPARTILHADO_URL", "")
+ESTADO_PREFIXO = os.environ.get("ESTADO_PREFIXO", "saneurb:")
+
+# Coleções cujas versões são publicadas para os demais workers
+COLECOES_VERSIONADAS = ("funcionarios", "frequencia", "alimentacao", "materiais")
+
+
+class EstadoCompartilhado(ABC):
+    """Interface dos backends: chave/valor em texto com expiração e contadores"""
+
+    # True quando o estado é visto por outros processos
+    compartilhado = False
+
+    @abstractmethod
+    async def obter(self, chave: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def obter_varios(self, chaves: Sequence[str]) -> List[Optional[str]]:
+        ...
+
+    @abstractmethod
+    async def definir(self, chave: str, valor: str, ttl: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    async def incrementar(self, chave: str, ttl: Optional[float] = None) -> int:
+        """
+        Incrementa e retorna o contador. O ttl só vale na criação da chave
+        (janela fixa: a expiração não é renovada a cada incremento).
+        """
+
+    @abstractmethod
+    async def remover(self, chave: str) -> None:
+        ...
+
+    async def fechar(self) -> None:
+        pass
+
+
+class EstadoLocal(EstadoCompartilhado):
+    """Estado em memória do processo: padrão com um worker e nos testes"""
+
+    MAX_CHAVES = 10000
+
+    def __init__(self):
+        self._valores: Dict[str, Tuple[str, Optional[float]]] = {}
+
+    def _ler(self, chave: str) -> Optional[str]:
+        item = self._valores.get(chave)
+        if item is None:
+            return None
+        valor, expira_em = item
+        if expira_em is not None and expira_em <= time.monotonic():
+            del self._valores[chave]
+            return None
+        return valor
+
+    def _gravar(self, chave: str, valor: str, ttl: Optional[float]) -> None:
+        if chave not in self._valores and len(self._valores) >= self.MAX_CHAVES:
+            self._liberar_espaco()
+        self._valores[chave] = (valor, time.monotonic() + ttl if ttl else None)
+
+    def _liberar_espaco(self) -> None:
+        agora = time.monotonic()
+        for chave in [c for c, (_, expira) in self._valores.items() if expira is not None and expira <= agora]:
+            del self._valores[chave]
+        # Ainda cheio: descarta as chaves mais antigas (ordem de inserção)
+        excesso = len(self._valores) - self.MAX_CHAVES + 1
+        for chave in list(self._valores)[:max(excesso, 0)]:
+            del self._valores[chave]
+
+    def _incrementar(self, chave: str, ttl: Optional[float] = None) -> int:
+        atual = self._ler(chave)
+        if atual is None:
+            self._gravar(chave, "1", ttl)
+            return 1
+        _, expira_em = self._valores[chave]
+        novo = int(atual) + 1
+        self._valores[chave] = (str(novo), expira_em)
+        return novo
+
+    async def obter(self, chave: str) -> Optional[str]:
+        return self._ler(chave)
+
+    async def obter_varios(self, chaves: Sequence[str]) -> List[Optional[str]]:
+        return [self._ler(chave) for chave in chaves]
+
+    async def definir(self, chave: str, valor: str, ttl: Optional[float] = None) -> None:
+        self._gravar(chave, valor, ttl)
+
+    async def incrementar(self, chave: str, ttl: Optional[float] = None) -> int:
+        return self._incrementar(chave, ttl)
+
+    async def remover(self, chave: str) -> None:
+        self._valores.pop(chave, None)
+
+
+class EstadoRedis(EstadoCompartilhado):
+    """Estado em um Redis, compartilhado por todos os workers"""
+
+    compartilhado = True
+
+    def __init__(self, url: str, prefixo: str = ESTADO_PREFIXO):
+        if redis_asyncio is None:
+            raise RuntimeError("ESTADO_COMPARTILHADO_URL aponta para Redis, mas o pacote 'redis' não está instalado")
+        # from_url não abre conexão: ela é criada no primeiro comando
+        self._redis = redis_asyncio.from_url(url, decode_responses=True)
+        self._prefixo = prefixo
+
+    def _chave(self, chave: str) -> str:
+        return f"{self._prefixo}{chave}"
+
+    async def obter(self, chave: str) -> Optional[str]:
+        return await self._redis.get(self._chave(chave))
+
+    async def obter_varios(self, chaves: Sequence[str]) -> List[Optional[str]]:
+        if not chaves:
+            return []
+        return await self._redis.mget([self._chave(chave) for chave in chaves])
+
+    async def definir(self, chave: str, valor: str, ttl: Optional[float] = None) -> None:
+        await self._redis.set(self._chave(chave), valor, px=int(ttl * 1000) if ttl else None)
+
+    async def incrementar(self, chave: str, ttl: Optional[float] = None) -> int:
+        chave = self._chave(chave)
+        valor = await self._redis.incr(chave)
+        if ttl and valor == 1:
+            await self._redis.pexpire(chave, int(ttl * 1000))
+        return valor
+
+    async def remover(self, chave: str) -> None:
+        await self._redis.delete(self._chave(chave))
+
+    async def fechar(self) -> None:
+        await self._redis.aclose()
+
+
+def criar_estado(url: Optional[str] = ESTADO_COMPARTILHADO_URL) -> EstadoCompartilhado:
+    """Backend pelo esquema da URL: vazia ou memoria:// (local), redis:// ou rediss://"""
+    if not url or url.startswith("memoria://"):
+        return EstadoLocal()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return EstadoRedis(url)
+    raise ValueError(f"ESTADO_COMPARTILHADO_URL com esquema não suportado: {url}")
+
+
+estado_compartilhado = criar_estado()
+
+
+async def publicar_versao(colecao: str) -> None:
+    """
+    Publica a escrita para os outros workers (aguardado pela escrita)
+
+    A escrita no banco já aconteceu: se o backend falhar, o erro é registrado,
+    a coleção volta para a versão local deste worker e a requisição segue; os
+    caches se corrigem no próximo incremento ou no TTL.
+    """
+    try:
+        versao = await estado_compartilhado.incrementar(f"versao:{colecao}")
+    except Exception as e:
+        logger.error("Falha ao publicar a versão de %s: %s", colecao, e)
+        versoes_colecoes.descartar_publicada(colecao)
+        return
+    if estado_compartilhado.compartilhado:
+        versoes_colecoes.atualizar_publicadas({colecao: versao})
+
+
+versoes_colecoes.ouvir(publicar_versao)
+
+
+async def versoes_publicadas(*colecoes: str) -> str:
+    """Versões das coleções vistas por todos os workers, para chaves de cache"""
+    valores = await estado_compartilhado.obter_varios([f"versao:{c}" for c in colecoes])
+    return ",".join(f"{c}:{v or 0}" for c, v in zip(colecoes, valores))
+
+
+async def sincronizar_versoes() -> None:
+    """
+    Traz para as versões locais as escritas feitas pelos outros workers
+
+    A época identifica a geração dos contadores (criada pelo primeiro worker):
+    se o backend perder as chaves, os contadores recomeçam em outra época e
+    ETags antigas não voltam a coincidir.
+    """
+    epoca, *valores = await estado_compartilhado.obter_varios(
+        ["versao:epoca", *(f"versao:{c}" for c in COLECOES_VERSIONADAS)]
+    )
+    if epoca is None:
+        epoca = uuid.uuid4().hex[:12]
+        await estado_compartilhado.definir("versao:epoca", epoca)
+    versoes_colecoes.atualizar_publicadas(
+        {colecao: int(valor or 0) for colecao, valor in zip(COLECOES_VERSIONADAS, valores)},
+        epoca=epoca
+    )
+
+
+class VersoesCompartilhadasMiddleware:
+    """Sincroniza as versões das coleções antes de cada requisição (modo multi-worker)"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            try:
+                await sincronizar_versoes()
+            except Exception as e:
+                # Sem o backend, segue com as versões locais deste worker
+                logger.warning("Falha ao sincronizar versões das coleções: %s", e)
+        await self.app(scope, receive, send)
@@ -0,0 +1,45 @@
+"""
+ETags fortes e GET condicional (If-None-Match)
+
+A ETag é derivada da URL da requisição e das versões das coleções de que o
+endpoint depende, então pode ser calculada e comparada sem ler o banco.
+"""
+from fastapi import Request, Response
+from typing import Optional
+import hashlib
+
+from core.versoes import versoes_colecoes
+
+
+def calcular_etag(request: Request, *colecoes: str) -> str:
+    """Calcula a ETag forte de um endpoint de leitura"""
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    versoes = ",".join(f"{c}:{versoes_colecoes.get(c)}" for c in colecoes)
+    chave = f"{request.url.path}?{query}|{versoes}"
+    return f'"{hashlib.sha1(chave.encode()).hexdigest()}"'
+
+
+def _etag_corresponde(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    candidatas = (t.strip() for t in if_none_match.split(","))
+    # If-None-Match usa comparação fraca: ignora o prefixo W/
+    return any(t.removeprefix("W/") == etag for t in candidatas)
+
+
+def verificar_etag(request: Request, response: Response, *colecoes: str) -> Optional[Response]:
+    """
+    Retorna uma resposta 304 se o cliente já possui a versão atual.
+    
+    Caso contrário define a ETag na resposta e retorna None, e o endpoint
+    segue normalmente.
+    """
+    etag = calcular_etag(request, *colecoes)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_corresponde(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    
+    response.headers.update(headers)
+    return None
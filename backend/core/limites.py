@@ -0,0 +1,258 @@
+"""
+Limites dos endpoints caros: taxa por cliente e concorrência por endpoint
+
+Contagem em janela fixa (por minuto) no estado compartilhado: com vários
+workers e ESTADO_COMPARTILHADO_URL apontando para um Redis, o limite vale
+para o conjunto, e um único cliente não ocupa todos os workers com
+exportações, importações e relatórios. Acima do limite a resposta é 429 com
+Retry-After.
+
+O cliente é identificado pelo IP da conexão. Atrás de um proxy, rode o
+uvicorn com --proxy-headers e --forwarded-allow-ips para que o IP venha do
+X-Forwarded-For.
+
+A concorrência é controlada por processo (é a memória do processo que se quer
+proteger): cada grupo (relatórios, importações, exportações) tem um número de
+execuções simultâneas e uma fila limitada. Com a fila cheia a resposta é 429;
+quem espera na fila mais que o timeout recebe 503. As duas trazem Retry-After
+estimado pela duração recente das execuções do grupo.
+"""
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from typing import AsyncIterator, Iterable, Optional, Tuple
+import asyncio
+import logging
+import math
+import os
+import re
+import time
+
+from core.estado import EstadoCompartilhado, estado_compartilhado
+
+logger = logging.getLogger(__name__)
+
+LIMITE_EXCEL_POR_MINUTO = int(os.environ.get("LIMITE_EXCEL_POR_MINUTO", "30"))
+LIMITE_RELATORIOS_POR_MINUTO = int(os.environ.get("LIMITE_RELATORIOS_POR_MINUTO", "60"))
+JANELA_SEGUNDOS = 60
+
+CONCORRENCIA_RELATORIOS = int(os.environ.get("CONCORRENCIA_RELATORIOS", "4"))
+CONCORRENCIA_IMPORTACOES = int(os.environ.get("CONCORRENCIA_IMPORTACOES", "2"))
+CONCORRENCIA_EXPORTACOES = int(os.environ.get("CONCORRENCIA_EXPORTACOES", "2"))
+FILA_RELATORIOS = int(os.environ.get("FILA_RELATORIOS", "16"))
+FILA_IMPORTACOES = int(os.environ.get("FILA_IMPORTACOES", "4"))
+FILA_EXPORTACOES = int(os.environ.get("FILA_EXPORTACOES", "8"))
+FILA_TIMEOUT_SEGUNDOS = float(os.environ.get("FILA_TIMEOUT_SEGUNDOS", "30"))
+
+
+@dataclass(frozen=True)
+class RegraTaxa:
+    """Limite de requisições por cliente e janela para um grupo de rotas"""
+    grupo: str
+    prefixos: Tuple[str, ...]
+    limite: int
+    # Rotas baratas dentro dos prefixos (ex.: consulta de status)
+    excluir: Tuple[str, ...] = ()
+
+    def corresponde(self, caminho: str) -> bool:
+        return caminho.startswith(self.prefixos) and not caminho.startswith(self.excluir)
+
+
+REGRAS_TAXA = (
+    RegraTaxa("excel", ("/api/excel/",), LIMITE_EXCEL_POR_MINUTO, excluir=("/api/excel/importacoes/",)),
+    RegraTaxa("relatorios", ("/api/relatorios/gerar",), LIMITE_RELATORIOS_POR_MINUTO),
+)
+
+
+class LimiteTaxaMiddleware:
+    """Recusa com 429 os clientes que passaram do limite da janela"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        regras: Iterable[RegraTaxa] = REGRAS_TAXA,
+        estado: EstadoCompartilhado = estado_compartilhado,
+        janela: int = JANELA_SEGUNDOS
+    ):
+        self.app = app
+        # Limite 0 desativa a regra
+        self.regras = tuple(regra for regra in regras if regra.limite > 0)
+        self.estado = estado
+        self.janela = janela
+
+    def _regra(self, caminho: str) -> Optional[RegraTaxa]:
+        for regra in self.regras:
+            if regra.corresponde(caminho):
+                return regra
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        regra = self._regra(scope["path"]) if scope["type"] == "http" else None
+        if regra is None:
+            await self.app(scope, receive, send)
+            return
+
+        cliente = (scope.get("client") or ("desconhecido",))[0]
+        agora = time.time()
+        janela_atual = int(agora // self.janela)
+        try:
+            contagem = await self.estado.incrementar(
+                f"taxa:{regra.grupo}:{cliente}:{janela_atual}", ttl=self.janela
+            )
+        except Exception as e:
+            # Backend fora do ar: deixa passar em vez de derrubar as rotas
+            logger.warning("Limite de taxa indisponível: %s", e)
+            await self.app(scope, receive, send)
+            return
+
+        if contagem > regra.limite:
+            retry_after = max(1, math.ceil((janela_atual + 1) * self.janela - agora))
+            resposta = JSONResponse(
+                status_code=429,
+                content={"detail": f"Limite de {regra.limite} requisições por minuto excedido. Tente novamente em {retry_after}s"},
+                headers={
+                    "Retry-After": str(retry_after),
+                    "X-RateLimit-Limit": str(regra.limite),
+                    "X-RateLimit-Remaining": "0",
+                }
+            )
+            await resposta(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
+
+class AdmissaoRecusada(Exception):
+    """Requisição recusada pelo controle de concorrência"""
+
+    def __init__(self, status_code: int, mensagem: str, retry_after: int):
+        super().__init__(mensagem)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class LimiteConcorrencia:
+    """Semáforo com fila limitada e timeout de espera"""
+
+    def __init__(self, grupo: str, maximo: int, fila: int, timeout: float = FILA_TIMEOUT_SEGUNDOS):
+        self.grupo = grupo
+        self.maximo = maximo
+        self.fila = fila
+        self.timeout = timeout
+        self._semaforo = asyncio.Semaphore(maximo)
+        self._aguardando = 0
+        self._executando = 0
+        # Média móvel da duração das execuções, para o Retry-After
+        self._duracao_media = 1.0
+
+    def _retry_after(self) -> int:
+        rodadas = 1 + self._aguardando // max(self.maximo, 1)
+        return max(1, math.ceil(self._duracao_media * rodadas))
+
+    @asynccontextmanager
+    async def vaga(self) -> AsyncIterator[None]:
+        """Ocupa uma vaga do grupo durante o bloco"""
+        if not self._semaforo.locked():
+            # Vaga livre: acquire retorna sem suspender
+            await self._semaforo.acquire()
+        elif self._aguardando >= self.fila:
+            raise AdmissaoRecusada(
+                429, f"Muitas requisições de {self.grupo} em andamento. Tente novamente mais tarde",
+                self._retry_after()
+            )
+        else:
+            self._aguardando += 1
+            try:
+                await asyncio.wait_for(self._semaforo.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                raise AdmissaoRecusada(
+                    503, f"Tempo de espera esgotado na fila de {self.grupo}. Tente novamente mais tarde",
+                    self._retry_after()
+                )
+            finally:
+                self._aguardando -= 1
+
+        self._executando += 1
+        inicio = time.monotonic()
+        try:
+            yield
+        finally:
+            self._executando -= 1
+            self._semaforo.release()
+            self._duracao_media = 0.8 * self._duracao_media + 0.2 * (time.monotonic() - inicio)
+
+    def situacao(self) -> dict:
+        return {
+            "grupo": self.grupo,
+            "maximo": self.maximo,
+            "fila": self.fila,
+            "executando": self._executando,
+            "aguardando": self._aguardando,
+            "duracao_media_s": round(self._duracao_media, 2),
+        }
+
+
+@dataclass(frozen=True)
+class RegraConcorrencia:
+    """Rotas (método + expressão regular do caminho) que disputam o mesmo limite"""
+    grupo: str
+    metodos: Tuple[str, ...]
+    padrao: str
+    maximo: int
+    fila: int
+
+    def corresponde(self, metodo: str, caminho: str) -> bool:
+        return metodo in self.metodos and re.fullmatch(self.padrao, caminho) is not None
+
+
+REGRAS_CONCORRENCIA = (
+    RegraConcorrencia("relatórios", ("GET", "POST"), r"/api/relatorios/gerar", CONCORRENCIA_RELATORIOS, FILA_RELATORIOS),
+    RegraConcorrencia("importações", ("POST",), r"/api/excel/[^/]+/import", CONCORRENCIA_IMPORTACOES, FILA_IMPORTACOES),
+    RegraConcorrencia("exportações", ("GET",), r"/api/excel/[^/]+/export", CONCORRENCIA_EXPORTACOES, FILA_EXPORTACOES),
+)
+
+
+class ConcorrenciaMiddleware:
+    """
+    Admissão dos endpoints caros: a vaga é mantida até o fim do envio da
+    resposta, então exportações em streaming também contam enquanto transmitem
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        regras: Iterable[RegraConcorrencia] = REGRAS_CONCORRENCIA,
+        timeout: float = FILA_TIMEOUT_SEGUNDOS
+    ):
+        self.app = app
+        # Máximo 0 desativa o limite do grupo
+        self.regras = tuple(regra for regra in regras if regra.maximo > 0)
+        self.limites = {
+            regra.grupo: LimiteConcorrencia(regra.grupo, regra.maximo, regra.fila, timeout)
+            for regra in self.regras
+        }
+
+    def _limite(self, metodo: str, caminho: str) -> Optional[LimiteConcorrencia]:
+        for regra in self.regras:
+            if regra.corresponde(metodo, caminho):
+                return self.limites[regra.grupo]
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limite = self._limite(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if limite is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            async with limite.vaga():
+                await self.app(scope, receive, send)
+        except AdmissaoRecusada as e:
+            logger.warning("Requisição recusada (%s) em %s: %s", e.status_code, scope['path'], limite.situacao())
+            resposta = JSONResponse(
+                status_code=e.status_code,
+                content={"detail": str(e)},
+                headers={"Retry-After": str(e.retry_after)}
+            )
+            await resposta(scope, receive, send)
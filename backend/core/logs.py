@@ -0,0 +1,137 @@
+"""
+Logging assíncrono e estruturado
+
+Os loggers da aplicação só enfileiram o registro (QueueHandler); a
+formatação JSON e a escrita no stderr acontecem na thread do QueueListener,
+então I/O de log nunca bloqueia o event loop. As mensagens usam formatação
+preguiçosa (`logger.info("... %s", valor)`): registros abaixo do nível do
+logger são descartados sem montar a string.
+
+Configuração:
+- LOG_NIVEL: nível da raiz (padrão INFO)
+- LOG_NIVEIS: níveis por módulo, ex. "mongo.lento=WARNING,services.importacao_service=DEBUG"
+- LOG_FORMATO: json (padrão) ou texto, para desenvolvimento
+
+Campos passados em `extra={...}` viram chaves do JSON.
+"""
+from typing import Any, Dict, Optional
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+
+LOG_NIVEL = os.environ.get("LOG_NIVEL", "INFO").upper()
+LOG_NIVEIS = os.environ.get("LOG_NIVEIS", "")
+LOG_FORMATO = os.environ.get("LOG_FORMATO", "json").lower()
+
+# Atributos padrão do LogRecord: o que não estiver aqui veio de `extra`
+_ATRIBUTOS_PADRAO = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _extras(record: logging.LogRecord) -> Dict[str, Any]:
+    return {chave: valor for chave, valor in vars(record).items() if chave not in _ATRIBUTOS_PADRAO}
+
+
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON por registro"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        documento = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "nivel": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **_extras(record),
+        }
+        if record.exc_text:
+            documento["exc"] = record.exc_text
+        return json.dumps(documento, default=str, ensure_ascii=False)
+
+
+class FormatadorTexto(logging.Formatter):
+    """Formato legível, com os campos extras ao final"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s - %(levelname)s - %(name)s - %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        texto = super().format(record)
+        extras = _extras(record)
+        if extras:
+            texto += " " + json.dumps(extras, default=str, ensure_ascii=False)
+        return texto
+
+
+class FilaHandler(logging.handlers.QueueHandler):
+    """
+    Enfileira uma cópia do registro com a mensagem já resolvida (os
+    argumentos podem mudar depois) e o traceback em texto; a serialização
+    fica para a thread do listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _niveis_por_modulo(configuracao: str) -> Dict[str, str]:
+    niveis = {}
+    for item in configuracao.split(","):
+        if "=" in item:
+            modulo, nivel = item.split("=", 1)
+            niveis[modulo.strip()] = nivel.strip().upper()
+    return niveis
+
+
+def configurar_logs(
+    nivel: str = LOG_NIVEL,
+    niveis: str = LOG_NIVEIS,
+    formato: str = LOG_FORMATO
+) -> None:
+    """Troca os handlers da raiz pela fila assíncrona (idempotente)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    destino = logging.StreamHandler(sys.stderr)
+    destino.setFormatter(FormatadorTexto() if formato == "texto" else FormatadorJSON())
+
+    fila: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    raiz.addHandler(FilaHandler(fila))
+    raiz.setLevel(nivel)
+
+    for modulo, nivel_modulo in _niveis_por_modulo(niveis).items():
+        logging.getLogger(modulo).setLevel(nivel_modulo)
+
+    # Os loggers do uvicorn têm handlers próprios: passam a usar a fila também
+    for nome in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logger_uvicorn = logging.getLogger(nome)
+        logger_uvicorn.handlers.clear()
+        logger_uvicorn.propagate = True
+
+    _listener = logging.handlers.QueueListener(fila, destino, respect_handler_level=True)
+    _listener.start()
+    atexit.register(parar_logs)
+
+
+def parar_logs() -> None:
+    """Esvazia a fila e para a thread do listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
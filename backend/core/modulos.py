@@ -0,0 +1,37 @@
+"""
+Importação tardia das bibliotecas pesadas (pandas, numpy, openpyxl)
+
+`pd = modulo_tardio("pandas")` devolve um substituto que só importa o módulo
+no primeiro acesso a um atributo. Workers que só registram ponto sobem sem
+carregar a pilha de Excel e análises; quem exporta paga a importação uma vez,
+na primeira requisição.
+
+Os módulos que usam o substituto declaram `from __future__ import
+annotations`, para que anotações como `pd.DataFrame` não sejam avaliadas na
+importação, e importam o módulo de verdade sob TYPE_CHECKING para os
+verificadores de tipo.
+"""
+from types import ModuleType
+import importlib
+
+
+class ModuloTardio:
+    """Substituto de um módulo, importado no primeiro acesso a atributo"""
+
+    def __init__(self, nome: str):
+        self._nome = nome
+        self._modulo: ModuleType = None
+
+    def __getattr__(self, atributo: str):
+        modulo = self.__dict__["_modulo"]
+        if modulo is None:
+            modulo = self.__dict__["_modulo"] = importlib.import_module(self.__dict__["_nome"])
+        return getattr(modulo, atributo)
+
+    def __repr__(self) -> str:
+        estado = "carregado" if self.__dict__["_modulo"] is not None else "não carregado"
+        return f"<módulo tardio {self.__dict__['_nome']} ({estado})>"
+
+
+def modulo_tardio(nome: str) -> ModuloTardio:
+    return ModuloTardio(nome)
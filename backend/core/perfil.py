@@ -0,0 +1,214 @@
+"""
+Perfilamento sob demanda de uma requisição (diagnóstico em produção)
+
+Desabilitado por padrão: ative com PERFIL_HABILITADO=true e defina
+PERFIL_TOKEN. O pedido de perfil e as rotas /api/admin/perfis exigem o header
+X-Perfil-Token com o mesmo valor; sem PERFIL_TOKEN o perfilamento fica
+desligado (e o erro é registrado na inicialização).
+
+Uma requisição é perfilada quando traz `X-Perfil: cpu` ou `X-Perfil: memoria`
+(ou `?_perfil=cpu|memoria` na URL):
+- cpu: cProfile durante toda a requisição, inclusive o envio do corpo
+- memoria: tracemalloc, com o pico e as linhas que mais alocaram; pensado
+  para exportações e importações
+
+A resposta traz X-Perfil-Id; o resultado fica no estado compartilhado por
+PERFIL_TTL_SEGUNDOS e é baixado em /api/admin/perfis/{id}.
+
+Limitações: só uma requisição é perfilada por vez em cada processo (as
+demais seguem sem perfil), o cProfile também registra o que as outras
+corrotinas executarem no mesmo event loop nesse intervalo, e o que roda em
+threads (endpoints síncronos, asyncio.to_thread) não aparece no perfil de
+CPU. O tracemalloc, por ser global, vê as alocações de todas as threads.
+"""
+from datetime import datetime
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs
+import base64
+import cProfile
+import hmac
+import io
+import json
+import linecache
+import logging
+import marshal
+import os
+import pstats
+import time
+import tracemalloc
+import uuid
+
+from core.estado import EstadoCompartilhado, estado_compartilhado
+
+logger = logging.getLogger(__name__)
+
+PERFIL_HABILITADO = os.environ.get("PERFIL_HABILITADO", "false").lower() == "true"
+PERFIL_TOKEN = os.environ.get("PERFIL_TOKEN", "")
+PERFIL_TTL_SEGUNDOS = int(os.environ.get("PERFIL_TTL_SEGUNDOS", "3600"))
+PERFIL_MAX_RECENTES = 50
+MODOS_PERFIL = ("cpu", "memoria")
+# Habilitado sem token deixaria qualquer cliente perfilar e baixar perfis
+PERFIL_ATIVO = PERFIL_HABILITADO and bool(PERFIL_TOKEN)
+
+# Linhas do relatório em texto
+LINHAS_CPU = 80
+LINHAS_MEMORIA = 40
+
+
+def _texto_cpu(profiler: cProfile.Profile) -> str:
+    saida = io.StringIO()
+    stats = pstats.Stats(profiler, stream=saida)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(LINHAS_CPU)
+    return saida.getvalue()
+
+
+def _texto_memoria(snapshot: tracemalloc.Snapshot, atual: int, pico: int) -> str:
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    linhas = [
+        f"Pico durante a requisição: {pico / 2**20:.1f} MiB",
+        f"Ainda alocado ao final: {atual / 2**20:.1f} MiB",
+        "",
+        f"Top {LINHAS_MEMORIA} linhas por memória alocada e não liberada:",
+    ]
+    for i, estatistica in enumerate(snapshot.statistics("lineno")[:LINHAS_MEMORIA], 1):
+        frame = estatistica.traceback[0]
+        codigo = linecache.getline(frame.filename, frame.lineno).strip()
+        linhas.append(
+            f"{i:>3}. {frame.filename}:{frame.lineno}: "
+            f"{estatistica.size / 1024:.1f} KiB em {estatistica.count} blocos\n     {codigo}"
+        )
+    return "\n".join(linhas) + "\n"
+
+
+class Perfis:
+    """Resultados dos perfis, guardados no estado compartilhado com expiração"""
+
+    def __init__(self, estado: EstadoCompartilhado = estado_compartilhado, ttl: int = PERFIL_TTL_SEGUNDOS):
+        self.estado = estado
+        self.ttl = ttl
+
+    async def salvar(self, metadados: Dict[str, Any], texto: str, pstats_bytes: Optional[bytes] = None) -> None:
+        documento = {
+            **metadados,
+            "texto": texto,
+            "pstats": base64.b64encode(pstats_bytes).decode() if pstats_bytes else None,
+        }
+        await self.estado.definir(f"perfil:{metadados['id']}", json.dumps(documento), ttl=self.ttl)
+        # Índice dos mais recentes: leitura e escrita não atômicas, um perfil
+        # gravado ao mesmo tempo em outro worker pode ficar fora da lista
+        recentes = await self.listar()
+        recentes.insert(0, metadados)
+        await self.estado.definir(
+            "perfis:recentes", json.dumps(recentes[:PERFIL_MAX_RECENTES], default=str), ttl=self.ttl
+        )
+
+    async def listar(self) -> List[Dict[str, Any]]:
+        valor = await self.estado.obter("perfis:recentes")
+        return json.loads(valor) if valor else []
+
+    async def obter(self, perfil_id: str) -> Optional[Dict[str, Any]]:
+        valor = await self.estado.obter(f"perfil:{perfil_id}")
+        if not valor:
+            return None
+        documento = json.loads(valor)
+        if documento.get("pstats"):
+            documento["pstats"] = base64.b64decode(documento["pstats"])
+        return documento
+
+
+perfis = Perfis()
+
+
+def token_valido(recebido: Optional[str], esperado: str = PERFIL_TOKEN) -> bool:
+    """Compara o X-Perfil-Token em tempo constante; token vazio nunca é válido"""
+    return bool(esperado) and recebido is not None and hmac.compare_digest(recebido.encode(), esperado.encode())
+
+
+class PerfilMiddleware:
+    """Perfila as requisições que pedirem (X-Perfil ou ?_perfil)"""
+
+    def __init__(self, app: ASGIApp, habilitado: bool = PERFIL_HABILITADO, token: str = PERFIL_TOKEN):
+        if habilitado and not token:
+            logger.error("PERFIL_HABILITADO=true sem PERFIL_TOKEN: perfilamento desligado")
+            habilitado = False
+        self.app = app
+        self.habilitado = habilitado
+        self.token = token
+        self._ocupado = False
+
+    def _modo(self, scope: Scope) -> Optional[str]:
+        headers = Headers(scope=scope)
+        modo = headers.get("x-perfil")
+        if not modo:
+            valores = parse_qs(scope.get("query_string", b"").decode()).get("_perfil")
+            modo = valores[0] if valores else None
+        if modo not in MODOS_PERFIL:
+            return None
+        if not token_valido(headers.get("x-perfil-token"), self.token):
+            return None
+        return modo
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        modo = self._modo(scope) if self.habilitado and scope["type"] == "http" else None
+        if modo is None or self._ocupado:
+            await self.app(scope, receive, send)
+            return
+        if modo == "memoria" and tracemalloc.is_tracing():
+            # tracemalloc já ligado por outra ferramenta: não interfere
+            await self.app(scope, receive, send)
+            return
+
+        perfil_id = uuid.uuid4().hex[:12]
+        status = {"codigo": None}
+
+        async def enviar(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                status["codigo"] = message["status"]
+                MutableHeaders(scope=message).append("X-Perfil-Id", perfil_id)
+            await send(message)
+
+        self._ocupado = True
+        inicio = time.perf_counter()
+        profiler = None
+        try:
+            if modo == "cpu":
+                profiler = cProfile.Profile()
+                profiler.enable()
+            else:
+                tracemalloc.start(10)
+            try:
+                await self.app(scope, receive, enviar)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                    texto = _texto_cpu(profiler)
+                    profiler.create_stats()
+                    pstats_bytes = marshal.dumps(profiler.stats)
+                else:
+                    snapshot = tracemalloc.take_snapshot()
+                    atual, pico = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+                    texto = _texto_memoria(snapshot, atual, pico)
+                    pstats_bytes = None
+        finally:
+            self._ocupado = False
+
+        metadados = {
+            "id": perfil_id,
+            "modo": modo,
+            "metodo": scope["method"],
+            "caminho": scope["path"],
+            "status": status["codigo"],
+            "duracao_ms": round((time.perf_counter() - inicio) * 1000, 1),
+            "criado_em": datetime.utcnow().isoformat(),
+        }
+        try:
+            await perfis.salvar(metadados, texto, pstats_bytes)
+            logger.info("Perfil %s gravado: %s (%s %s)", modo, perfil_id, scope['method'], scope['path'])
+        except Exception as e:
+            logger.error("Erro ao gravar perfil %s: %s", perfil_id, e)
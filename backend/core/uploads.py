@@ -0,0 +1,151 @@
+"""
+Limites de upload para as rotas de importação
+
+O LimiteUploadMiddleware recusa com 413 corpos maiores que o limite antes de
+qualquer parsing: pelo Content-Length quando ele vem na requisição e, caso
+contrário, contando os bytes à medida que chegam. O multipart do Starlette
+já grava os arquivos em SpooledTemporaryFile (disco acima de 1 MB), então
+as rotas trabalham com o arquivo em disco em vez de `await file.read()`.
+"""
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import BinaryIO, Iterable, Sequence
+import hashlib
+import os
+import zipfile
+
+UPLOAD_MAX_BYTES = int(float(os.environ.get("UPLOAD_MAX_MB", "20")) * 1024 * 1024)
+IMPORTACAO_MAX_LINHAS = int(os.environ.get("IMPORTACAO_MAX_LINHAS", "50000"))
+
+
+def _resposta_413(max_bytes: int) -> JSONResponse:
+    return JSONResponse(
+        status_code=413,
+        content={"detail": f"Arquivo excede o limite de {max_bytes / (1024 * 1024):g} MB"}
+    )
+
+
+class LimiteUploadMiddleware:
+    """Limita o tamanho do corpo das requisições nos prefixos informados"""
+
+    def __init__(self, app: ASGIApp, max_bytes: int = UPLOAD_MAX_BYTES, prefixos: Iterable[str] = ("/api/excel/",)):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.prefixos = tuple(prefixos)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("POST", "PUT", "PATCH")
+            or not scope["path"].startswith(self.prefixos)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await _resposta_413(self.max_bytes)(scope, receive, send)
+            return
+
+        recebidos = 0
+        excedido = False
+
+        async def receive_limitado() -> Message:
+            nonlocal recebidos, excedido
+            if excedido:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                recebidos += len(message.get("body", b""))
+                if recebidos > self.max_bytes:
+                    # Interrompe a leitura: o parser do app enxerga uma desconexão
+                    excedido = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def send_filtrado(message: Message) -> None:
+            # A resposta de erro gerada pelo app é descartada em favor do 413
+            if not excedido:
+                await send(message)
+
+        try:
+            await self.app(scope, receive_limitado, send_filtrado)
+        except Exception:
+            if not excedido:
+                raise
+
+        if excedido:
+            await _resposta_413(self.max_bytes)(scope, receive, send)
+
+
+def preparar_upload(file: UploadFile, extensoes: Sequence[str], max_bytes: int = UPLOAD_MAX_BYTES) -> BinaryIO:
+    """
+    Valida extensão e tamanho do arquivo enviado e o retorna posicionado no início.
+
+    O tamanho é obtido pelo seek no arquivo temporário, sem ler o conteúdo.
+    """
+    if not file.filename or not file.filename.lower().endswith(tuple(extensoes)):
+        raise HTTPException(status_code=400, detail=f"Arquivo deve ser {', '.join(extensoes)}")
+
+    arquivo = file.file
+    arquivo.seek(0, os.SEEK_END)
+    tamanho = arquivo.tell()
+    arquivo.seek(0)
+
+    if tamanho > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Arquivo excede o limite de {max_bytes / (1024 * 1024):g} MB")
+    if tamanho == 0:
+        raise HTTPException(status_code=400, detail="Arquivo vazio")
+    return arquivo
+
+
+def verificar_linhas_xlsx(arquivo: BinaryIO, max_linhas: int = IMPORTACAO_MAX_LINHAS) -> None:
+    """
+    Recusa planilhas acima do limite de linhas antes do parsing.
+
+    Em modo read_only o openpyxl só lê a dimensão declarada da planilha, sem
+    carregar as células. Planilhas sem dimensão declarada seguem e são
+    limitadas pelo nrows na leitura. Arquivos que não são um .xlsx válido
+    (zip corrompido ou sem a estrutura da planilha) são recusados com 400.
+    """
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        workbook = load_workbook(arquivo, read_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError):
+        arquivo.seek(0)
+        raise HTTPException(status_code=400, detail="Arquivo .xlsx inválido ou corrompido")
+    try:
+        linhas = workbook.worksheets[0].max_row if workbook.worksheets else 0
+    finally:
+        workbook.close()
+        arquivo.seek(0)
+
+    if linhas and linhas - 1 > max_linhas:
+        raise HTTPException(status_code=413, detail=f"Planilha excede o limite de {max_linhas} linhas")
+
+
+def verificar_linhas_csv(arquivo: BinaryIO, max_linhas: int = IMPORTACAO_MAX_LINHAS) -> None:
+    """Recusa CSVs acima do limite de linhas contando quebras de linha em blocos"""
+    linhas = 0
+    try:
+        for bloco in iter(lambda: arquivo.read(1024 * 1024), b""):
+            linhas += bloco.count(b"\n")
+            if linhas - 1 > max_linhas:
+                raise HTTPException(status_code=413, detail=f"Planilha excede o limite de {max_linhas} linhas")
+    finally:
+        arquivo.seek(0)
+
+
+def hash_conteudo(arquivo: BinaryIO) -> str:
+    """SHA-256 do arquivo enviado, lido em blocos a partir do disco"""
+    sha = hashlib.sha256()
+    try:
+        for bloco in iter(lambda: arquivo.read(1024 * 1024), b""):
+            sha.update(bloco)
+    finally:
+        arquivo.seek(0)
+    return sha.hexdigest()
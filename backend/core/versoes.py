@@ -0,0 +1,64 @@
+"""
+Versões das coleções, usadas para validar caches HTTP (ETag)
+
+Cada escrita feita pelos serviços incrementa a versão da coleção. Com um
+único processo, a versão é o contador local mais um identificador do
+processo, então um restart invalida todas as ETags. Com vários workers, a
+versão vem só do estado compartilhado (core/estado.py): a época e o contador
+publicados são os mesmos em todos os workers, então uma ETag emitida por um
+worker vale (304) em qualquer outro. Se a publicação de uma escrita falhar, a
+coleção volta para a versão local até a próxima sincronização.
+"""
+from typing import Awaitable, Callable, Dict, List, Optional
+import threading
+import uuid
+
+
+class VersoesColecoes:
+    """Contador de versão por coleção"""
+
+    def __init__(self):
+        self._instancia = uuid.uuid4().hex[:12]
+        self._versoes: Dict[str, int] = {}
+        self._publicadas: Dict[str, int] = {}
+        self._epoca: Optional[str] = None
+        self._ouvintes: List[Callable[[str], Awaitable[None]]] = []
+        self._lock = threading.Lock()
+
+    def get(self, colecao: str) -> str:
+        """Versão atual da coleção"""
+        publicada = self._publicadas.get(colecao)
+        if publicada is not None and self._epoca is not None:
+            return f"{self._epoca}.{publicada}"
+        return f"{self._instancia}.{self._versoes.get(colecao, 0)}"
+
+    async def incrementar(self, colecao: str) -> None:
+        """
+        Marca a coleção como alterada
+
+        Os ouvintes (a publicação no estado compartilhado) são aguardados:
+        quando a escrita responde, a nova versão já vale para todos os workers.
+        """
+        with self._lock:
+            self._versoes[colecao] = self._versoes.get(colecao, 0) + 1
+        for ouvinte in self._ouvintes:
+            await ouvinte(colecao)
+
+    def ouvir(self, ouvinte: Callable[[str], Awaitable[None]]) -> None:
+        """Registra uma corrotina chamada a cada incremento (com o nome da coleção)"""
+        self._ouvintes.append(ouvinte)
+
+    def atualizar_publicadas(self, publicadas: Dict[str, int], epoca: Optional[str] = None) -> None:
+        """Versões publicadas por todos os workers, lidas do estado compartilhado"""
+        with self._lock:
+            if epoca is not None:
+                self._epoca = epoca
+            self._publicadas.update(publicadas)
+
+    def descartar_publicada(self, colecao: str) -> None:
+        """Volta a coleção para a versão local (escrita que não foi publicada)"""
+        with self._lock:
+            self._publicadas.pop(colecao, None)
+
+
+versoes_colecoes = VersoesColecoes()
@@ -0,0 +1,82 @@
+"""
+Criação dos índices do MongoDB usados pelos serviços
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def criar_indices(db: AsyncIOMotorDatabase) -> None:
+    """Garante os índices das coleções (operação idempotente)"""
+    # Buscas por ID (get_by_id e afins)
+    await db.funcionarios.create_index("id")
+    await db.frequencia.create_index("id")
+    # Quadro ativo: índices parciais só com ativo=true, menores que o total
+    # de funcionários quando o histórico de inativos cresce. As consultas
+    # precisam filtrar {"ativo": True} para usá-los.
+    await db.funcionarios.create_index(
+        [("nome", 1)],
+        name="ativos_nome",
+        partialFilterExpression={"ativo": True}
+    )
+    await db.funcionarios.create_index(
+        [("setor", 1), ("nome", 1)],
+        name="ativos_setor_nome",
+        partialFilterExpression={"ativo": True}
+    )
+    # Arquivamento: inativos pela data de desativação
+    await db.funcionarios.create_index(
+        [("desativado_em", 1)],
+        name="inativos_desativado_em",
+        partialFilterExpression={"ativo": False}
+    )
+    await db.funcionarios_arquivo.create_index("id", unique=True)
+    await db.frequencia_arquivo.create_index("id", unique=True)
+    await db.frequencia_arquivo.create_index([("funcionario_id", 1), ("data", 1)])
+    # Consultas por funcionário e período (folha de ponto, duplicidade no create)
+    await db.frequencia.create_index([("funcionario_id", 1), ("data", 1)])
+    # Feed ao vivo em modo polling: busca incremental por data de atualização
+    await db.frequencia.create_index("atualizado_em")
+    # Layout mensal (FREQUENCIA_ARMAZENAMENTO=mensal): o _id já é
+    # funcionário + mês; por ID de registro via índice multikey do array
+    await db.frequencia_mensal.create_index([("funcionario_id", 1), ("mes", 1)])
+    await db.frequencia_mensal.create_index("mes")
+    await db.frequencia_mensal.create_index("dias.i")
+    await db.frequencia_mensal.create_index("atualizado_em")
+    await db.frequencia_mensal_arquivo.create_index("funcionario_id")
+    # Demais coleções de arquivo: upsert pela chave e restauração por funcionário
+    await db.alimentacao_arquivo.create_index("id", unique=True)
+    await db.alimentacao_arquivo.create_index("funcionario_id")
+    await db.banco_horas_arquivo.create_index("funcionario_id", unique=True)
+    # Importações: um job por arquivo (hash do conteúdo) e upsert por ID em materiais
+    await db.importacoes.create_index([("esquema", 1), ("hash", 1)], unique=True)
+    await db.importacoes.create_index("id", unique=True)
+    await db.materiais.create_index("id")
+    # Busca de funcionários: prefixo por token normalizado, CPF parcial e texto
+    await db.funcionarios.create_index("busca_tokens")
+    await db.funcionarios.create_index("cpf_digitos")
+    await db.funcionarios.create_index(
+        [("nome", "text"), ("cargo", "text")],
+        name="funcionarios_texto",
+        default_language="portuguese",
+        weights={"nome": 3, "cargo": 1}
+    )
+    # Propagação de nomes: update_many por funcionário em alimentação e fila de jobs
+    await db.alimentacao.create_index([("funcionario_id", 1), ("data", 1)])
+    await db.propagacoes_nome.create_index([("status", 1), ("criado_em", 1)])
+    await db.propagacoes_nome.create_index([("funcionario_id", 1), ("criado_em", -1)])
+    # No máximo um job em andamento por funcionário (vários workers propagando)
+    await db.propagacoes_nome.create_index(
+        "funcionario_id",
+        name="propagacao_em_andamento_unica",
+        unique=True,
+        partialFilterExpression={"status": "em_andamento"}
+    )
+    # Banco de horas: um saldo por funcionário, lido pela chave
+    await db.banco_horas.create_index("funcionario_id", unique=True)
+    # Marcas de escrita e lease da reconstrução: contadas pela reconstrução e
+    # removidas pelo TTL se o processo que as criou cair
+    await db.banco_horas_controle.create_index([("tipo", 1), ("expira_em", 1)])
+    await db.banco_horas_controle.create_index("expira_em", expireAfterSeconds=0)
+    logger.info("Índices do MongoDB verificados")
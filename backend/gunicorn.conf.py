@@ -0,0 +1,28 @@
+"""
+Configuração do gunicorn para o modo com vários workers
+
+Uso (a partir de backend/):
+    ESTADO_COMPARTILHADO_URL=redis://localhost:6379/0 gunicorn server:app -c gunicorn.conf.py
+
+Sem ESTADO_COMPARTILHADO_URL cada worker tem seu próprio cache de relatórios,
+limites de taxa e versões das coleções (ETags podem ficar desatualizadas entre
+workers), então mais de um worker exige o Redis.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8001")
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Cada worker importa o app depois do fork: o cliente do MongoDB (e o do Redis)
+# não pode ser compartilhado entre processos
+preload_app = False
+
+# Exportações e importações grandes passam do timeout padrão de 30s
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# IP real do cliente para o limite de taxa (cabeçalhos do proxy confiável)
+forwarded_allow_ips = os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1")
@@ -0,0 +1,84 @@
+"""
+Migração da frequência entre os layouts diário e mensal
+
+Copia todos os registros do layout de origem para o de destino em lotes,
+sem duplicar funcionário + data (pode ser executada de novo após uma
+interrupção), e confere as contagens. A coleção de origem só é removida com
+--remover-origem e se as contagens baterem.
+
+Depois de migrar, ajuste FREQUENCIA_ARMAZENAMENTO e reinicie o servidor.
+
+Uso (a partir de backend/):
+    python migracoes/frequencia_mensal.py                  # diário -> mensal
+    python migracoes/frequencia_mensal.py --reverter       # mensal -> diário
+    python migracoes/frequencia_mensal.py --remover-origem
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+load_dotenv(ROOT_DIR / ".env")
+
+from database import criar_indices
+from services.frequencia_armazenamento import armazenamento_frequencia
+
+TAMANHO_LOTE = 5000
+
+
+async def migrar(origem_modo: str, destino_modo: str, remover_origem: bool) -> None:
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    try:
+        await _migrar(client[os.environ["DB_NAME"]], origem_modo, destino_modo, remover_origem)
+    finally:
+        client.close()
+
+
+async def _migrar(db, origem_modo: str, destino_modo: str, remover_origem: bool) -> None:
+    origem = armazenamento_frequencia(db, origem_modo)
+    destino = armazenamento_frequencia(db, destino_modo)
+    await criar_indices(db)
+
+    total = await origem.contar()
+    print(f"Migrando {total} registros: {origem.nome_colecao} -> {destino.nome_colecao}")
+
+    inicio = time.perf_counter()
+    lidos = criados = 0
+    async for bloco in origem.blocos(tamanho=TAMANHO_LOTE):
+        lote_criados, _, _ = await destino.inserir_lote(bloco, manter_atualizado_em=True)
+        lidos += len(bloco)
+        criados += lote_criados
+        print(f"  {lidos}/{total} lidos, {criados} gravados", end="\r")
+
+    migrados = await destino.contar()
+    print(f"\nConcluído em {time.perf_counter() - inicio:.1f}s: {migrados} registros em {destino.nome_colecao}")
+
+    if migrados < total:
+        print(f"Contagens divergentes ({migrados} < {total}): origem mantida")
+        return
+    if remover_origem:
+        await origem.colecao.drop()
+        print(f"Coleção {origem.nome_colecao} removida")
+    print(f"Ajuste FREQUENCIA_ARMAZENAMENTO={destino_modo} e reinicie o servidor")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra a frequência entre os layouts diário e mensal")
+    parser.add_argument("--reverter", action="store_true", help="mensal -> diário")
+    parser.add_argument("--remover-origem", action="store_true", help="remove a coleção de origem ao final")
+    args = parser.parse_args()
+
+    origem, destino = ("mensal", "diario") if args.reverter else ("diario", "mensal")
+    asyncio.run(migrar(origem, destino, args.remover_origem))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Migração única: data e horários da frequência de texto para tipos nativos
+
+Converte, no layout diário (`frequencia` e `frequencia_arquivo`), `data` de
+"YYYY-MM-DD" (ou "YYYY-MM-DD 00:00:00", gravado por importações antigas)
+para datetime e `hora_entrada`/`hora_saida` de "HH:MM" para minutos do dia.
+Só documentos que ainda têm algum desses campos em texto são lidos, então a
+migração pode ser interrompida e executada de novo. Valores que não podem
+ser convertidos são listados e mantidos como estão.
+
+Uso (a partir de backend/):
+    python migracoes/frequencia_tipos_nativos.py [--simular]
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+load_dotenv(ROOT_DIR / ".env")
+
+from services.frequencia_armazenamento import CAMPOS_HORA, codificar
+
+COLECOES = ("frequencia", "frequencia_arquivo")
+CAMPOS = ("data",) + CAMPOS_HORA
+TAMANHO_LOTE = 1000
+FILTRO_LEGADO = {"$or": [{campo: {"$type": "string"}} for campo in CAMPOS]}
+
+
+async def _migrar_colecao(colecao, simular: bool) -> None:
+    total = await colecao.count_documents(FILTRO_LEGADO)
+    print(f"{colecao.name}: {total} documentos com campos em texto")
+    if simular or not total:
+        return
+
+    inicio = time.perf_counter()
+    convertidos = 0
+    invalidos = []
+    operacoes = []
+    projecao = {campo: 1 for campo in CAMPOS}
+    async for doc in colecao.find(FILTRO_LEGADO, projecao, batch_size=TAMANHO_LOTE):
+        campos = {campo: doc[campo] for campo in CAMPOS if isinstance(doc.get(campo), str)}
+        try:
+            operacoes.append(UpdateOne({"_id": doc["_id"]}, {"$set": codificar(campos)}))
+        except ValueError:
+            invalidos.append((doc["_id"], campos))
+            continue
+        if len(operacoes) >= TAMANHO_LOTE:
+            convertidos += (await colecao.bulk_write(operacoes, ordered=False)).modified_count
+            operacoes = []
+            print(f"  {convertidos}/{total}", end="\r")
+    if operacoes:
+        convertidos += (await colecao.bulk_write(operacoes, ordered=False)).modified_count
+
+    print(f"  {convertidos} convertidos em {time.perf_counter() - inicio:.1f}s")
+    for _id, campos in invalidos:
+        print(f"  não convertido: _id={_id} {campos}")
+
+
+async def migrar(simular: bool) -> None:
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    try:
+        db = client[os.environ["DB_NAME"]]
+        for nome in COLECOES:
+            await _migrar_colecao(db[nome], simular)
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converte data e horários da frequência para tipos nativos")
+    parser.add_argument("--simular", action="store_true", help="apenas conta os documentos a converter")
+    args = parser.parse_args()
+    asyncio.run(migrar(args.simular))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 from .funcionario import Funcionario, FuncionarioCreate, FuncionarioUpdate
-from .frequencia import RegistroFrequencia, RegistroFrequenciaCreate, RegistroFrequenciaUpdate
+from .frequencia import (
+    RegistroFrequencia, RegistroFrequenciaCreate, RegistroFrequenciaUpdate, FolhaPonto
+)
 from .relatorio import RelatorioRequest, RelatorioResponse
+from .banco_horas import SaldoBancoHoras
 
 __all__ = [
     'Funcionario',
@@ -9,6 +12,8 @@ __all__ = [
     'RegistroFrequencia',
     'RegistroFrequenciaCreate',
     'RegistroFrequenciaUpdate',
+    'FolhaPonto',
     'RelatorioRequest',
-    'RelatorioResponse'
+    'RelatorioResponse',
+    'SaldoBancoHoras'
 ]
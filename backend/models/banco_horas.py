@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+from typing import Dict, Optional
+from datetime import datetime
+
+
+class SaldoBancoHoras(BaseModel):
+    funcionario_id: str
+    saldo_minutos: int = 0
+    saldo_horas: float = 0
+    por_tipo: Dict[str, float] = {}  # horas creditadas por tipo de dia
+    registros: int = 0
+    atualizado_em: Optional[datetime] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "funcionario_id": "123e4567-e89b-12d3-a456-426614174000",
+                "saldo_minutos": 390,
+                "saldo_horas": 6.5,
+                "por_tipo": {"util": 2.5, "feriado": 0, "fim_de_semana": 4.0},
+                "registros": 21,
+                "atualizado_em": "2025-01-31T18:00:00"
+            }
+        }
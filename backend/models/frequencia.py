@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Literal
+from typing import Optional, Literal, List, Dict, Any
 import uuid
 
 
@@ -41,3 +41,32 @@ class RegistroFrequencia(RegistroFrequenciaBase):
                 "tipo_dia": "util"
             }
         }
+
+
+class FolhaPontoDia(BaseModel):
+    data: str  # formato YYYY-MM-DD
+    dia_semana: int  # 1 = segunda ... 7 = domingo
+    fim_de_semana: bool
+    feriado: bool
+    hora_entrada: Optional[str] = None
+    hora_saida: Optional[str] = None
+    total_horas: float = 0
+    falta: bool
+
+
+class FolhaPontoFuncionario(BaseModel):
+    funcionario_id: str
+    nome: Optional[str] = None
+    setor: Optional[str] = None
+    dias: List[FolhaPontoDia]
+    total_horas: float
+    dias_trabalhados: int
+    faltas: int
+
+
+class FolhaPonto(BaseModel):
+    ano: int
+    mes: int
+    setor: Optional[str] = None
+    funcionarios: List[FolhaPontoFuncionario]
+    totalizadores: Dict[str, Any]
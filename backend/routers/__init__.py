@@ -1,5 +1,10 @@
 from .funcionarios import router as funcionarios_router
 from .frequencia import router as frequencia_router
 from .relatorios import router as relatorios_router
+from .analises import router as analises_router
+from .calendario import router as calendario_router
+from .banco_horas import router as banco_horas_router
+from .arquivo import router as arquivo_router
+from .perfil import router as perfil_router
 
-__all__ = ['funcionarios_router', 'frequencia_router', 'relatorios_router']
+__all__ = ['funcionarios_router', 'frequencia_router', 'relatorios_router', 'analises_router', 'calendario_router', 'banco_horas_router', 'arquivo_router', 'perfil_router']
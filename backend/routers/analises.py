@@ -0,0 +1,152 @@
+"""
+Endpoints de análise de frequência (horas extras, atrasos e ausências)
+"""
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.analise_frequencia_service import AnaliseFrequenciaService
+from dependencies import get_database
+from typing import Any, Dict, Literal, Optional
+from io import BytesIO
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/analises", tags=["Análises"])
+
+
+def get_service(db: AsyncIOMotorDatabase = Depends(get_database)) -> AnaliseFrequenciaService:
+    return AnaliseFrequenciaService(db)
+
+
+async def _resumo(
+    service: AnaliseFrequenciaService,
+    data_inicio: str,
+    data_fim: str,
+    setor: Optional[str],
+    jornada_horas: float,
+    hora_limite: str,
+    tolerancia_minutos: int
+) -> Dict[str, Any]:
+    try:
+        return await service.resumo(
+            data_inicio, data_fim, setor,
+            jornada_horas=jornada_horas,
+            hora_limite=hora_limite,
+            tolerancia_minutos=tolerancia_minutos
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Erro ao calcular análise de frequência: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+
+@router.get("/frequencia")
+async def analise_frequencia(
+    data_inicio: str = Query(..., description="Data inicial (YYYY-MM-DD)"),
+    data_fim: str = Query(..., description="Data final (YYYY-MM-DD)"),
+    setor: Optional[str] = Query(None, description="Filtrar por setor"),
+    jornada_horas: float = Query(8.0, gt=0, le=24, description="Jornada diária; o que passar disso é hora extra"),
+    hora_limite: str = Query("08:00", pattern=r'^\d{2}:\d{2}$', description="Entradas depois deste horário contam como atraso"),
+    tolerancia_minutos: int = Query(0, ge=0, le=120, description="Tolerância do atraso em minutos"),
+    service: AnaliseFrequenciaService = Depends(get_service)
+):
+    """
+    Horas extras, atrasos e ausências por funcionário e por setor no período.
+    
+    Todas as métricas são calculadas juntas sobre o DataFrame do período.
+    A taxa de ausência considera os dias úteis e apenas funcionários ativos.
+    """
+    return await _resumo(service, data_inicio, data_fim, setor, jornada_horas, hora_limite, tolerancia_minutos)
+
+
+@router.get("/frequencia/horas-extras")
+async def analise_horas_extras(
+    data_inicio: str = Query(..., description="Data inicial (YYYY-MM-DD)"),
+    data_fim: str = Query(..., description="Data final (YYYY-MM-DD)"),
+    setor: Optional[str] = Query(None, description="Filtrar por setor"),
+    jornada_horas: float = Query(8.0, gt=0, le=24, description="Jornada diária; o que passar disso é hora extra"),
+    service: AnaliseFrequenciaService = Depends(get_service)
+):
+    """
+    Ranking de horas extras por funcionário e por setor
+    
+    Calcula o resumo completo do período e devolve só esta métrica.
+    """
+    resultado = await _resumo(service, data_inicio, data_fim, setor, jornada_horas, "08:00", 0)
+    return service.recortar(resultado, "horas_extras", ("horas_trabalhadas", "horas_extras"))
+
+
+@router.get("/frequencia/atrasos")
+async def analise_atrasos(
+    data_inicio: str = Query(..., description="Data inicial (YYYY-MM-DD)"),
+    data_fim: str = Query(..., description="Data final (YYYY-MM-DD)"),
+    setor: Optional[str] = Query(None, description="Filtrar por setor"),
+    hora_limite: str = Query("08:00", pattern=r'^\d{2}:\d{2}$', description="Entradas depois deste horário contam como atraso"),
+    tolerancia_minutos: int = Query(0, ge=0, le=120, description="Tolerância do atraso em minutos"),
+    service: AnaliseFrequenciaService = Depends(get_service)
+):
+    """
+    Ranking de atrasos (quantidade e minutos) por funcionário e por setor
+    
+    Calcula o resumo completo do período e devolve só esta métrica.
+    """
+    resultado = await _resumo(service, data_inicio, data_fim, setor, 8.0, hora_limite, tolerancia_minutos)
+    return service.recortar(resultado, "atrasos", ("atrasos", "minutos_atraso"))
+
+
+@router.get("/frequencia/ausencias")
+async def analise_ausencias(
+    data_inicio: str = Query(..., description="Data inicial (YYYY-MM-DD)"),
+    data_fim: str = Query(..., description="Data final (YYYY-MM-DD)"),
+    setor: Optional[str] = Query(None, description="Filtrar por setor"),
+    service: AnaliseFrequenciaService = Depends(get_service)
+):
+    """
+    Taxa de ausência (faltas / dias úteis esperados) por funcionário e por setor
+    
+    Calcula o resumo completo do período e devolve só esta métrica.
+    """
+    resultado = await _resumo(service, data_inicio, data_fim, setor, 8.0, "08:00", 0)
+    return service.recortar(resultado, "taxa_ausencia", ("dias_esperados", "dias_presentes", "faltas", "taxa_ausencia"))
+
+
+@router.get("/frequencia/dados")
+async def dados_frequencia(
+    data_inicio: str = Query(..., description="Data inicial (YYYY-MM-DD)"),
+    data_fim: str = Query(..., description="Data final (YYYY-MM-DD)"),
+    setor: Optional[str] = Query(None, description="Filtrar por setor"),
+    formato: Literal['parquet', 'csv'] = Query('parquet'),
+    service: AnaliseFrequenciaService = Depends(get_service)
+):
+    """
+    Registros do período já tipados, para carregar direto no pandas.
+    
+    Parquet preserva os tipos (datas, categóricos) e exige o pyarrow no
+    servidor; CSV está sempre disponível.
+    """
+    try:
+        _, registros = await service.carregar(data_inicio, data_fim, setor)
+        output = BytesIO()
+        if formato == 'parquet':
+            try:
+                registros.to_parquet(output, index=False)
+            except ImportError:
+                raise HTTPException(status_code=400, detail="Parquet indisponível no servidor (pyarrow não instalado)")
+            media_type = "application/vnd.apache.parquet"
+        else:
+            registros.to_csv(output, index=False)
+            media_type = "text/csv"
+        output.seek(0)
+        return StreamingResponse(
+            output,
+            media_type=media_type,
+            headers={"Content-Disposition": f"attachment; filename=frequencia_{data_inicio}_{data_fim}.{formato}"}
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Erro ao exportar dados de frequência: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
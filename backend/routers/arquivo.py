@@ -0,0 +1,55 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.arquivo_service import ArquivoService, ARQUIVAMENTO_HABILITADO, ARQUIVAMENTO_INATIVOS_DIAS
+from services.banco_horas_service import ReconstrucaoEmAndamento
+from dependencies import get_database
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/arquivo", tags=["Arquivo"])
+
+
+def get_service(db: AsyncIOMotorDatabase = Depends(get_database)) -> ArquivoService:
+    if not ARQUIVAMENTO_HABILITADO:
+        raise HTTPException(status_code=403, detail="Arquivamento desabilitado (ARQUIVAMENTO_HABILITADO)")
+    return ArquivoService(db)
+
+
+@router.post("/executar")
+async def executar_arquivamento(
+    inativos_ha_dias: int = Query(ARQUIVAMENTO_INATIVOS_DIAS, ge=30, description="Dias desde a desativação"),
+    simular: bool = Query(True, description="Apenas contar o que seria arquivado"),
+    service: ArquivoService = Depends(get_service)
+):
+    """
+    Move funcionários inativos há mais de N dias e seus registros de
+    frequência, alimentação e saldo do banco de horas para as coleções de
+    arquivo.
+    
+    Por padrão só simula; envie simular=false para mover de fato.
+    Funcionários com registros dentro do intervalo não são arquivados.
+    """
+    try:
+        return await service.arquivar(inativos_ha_dias, simular=simular)
+    except ReconstrucaoEmAndamento as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        logger.error("Erro ao arquivar funcionários: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+
+@router.post("/restaurar/{funcionario_id}")
+async def restaurar_funcionario(
+    funcionario_id: str,
+    service: ArquivoService = Depends(get_service)
+):
+    """Traz um funcionário arquivado e seus registros de volta (continua inativo)"""
+    try:
+        return await service.restaurar(funcionario_id)
+    except ReconstrucaoEmAndamento as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error("Erro ao restaurar funcionário do arquivo: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
@@ -0,0 +1,73 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from models.banco_horas import SaldoBancoHoras
+from services.banco_horas_service import BancoHorasService, ReconstrucaoEmAndamento
+from services.funcionario_service import FuncionarioService
+from dependencies import get_database
+from typing import List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/banco-horas", tags=["Banco de Horas"])
+
+
+def get_service(db: AsyncIOMotorDatabase = Depends(get_database)) -> BancoHorasService:
+    return BancoHorasService(db)
+
+
+@router.get("", response_model=List[SaldoBancoHoras])
+async def listar_saldos(
+    setor: Optional[str] = Query(None, description="Filtrar por setor"),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    service: BancoHorasService = Depends(get_service)
+):
+    """Saldos do banco de horas de todos os funcionários (ou de um setor)"""
+    try:
+        ids = None
+        if setor:
+            funcionarios = await FuncionarioService(db).get_all_raw(
+                setor=setor, projection={"id": 1}, limit=None
+            )
+            ids = [f["id"] for f in funcionarios]
+        return await service.get_saldos(ids)
+    except Exception as e:
+        logger.error("Erro ao listar banco de horas: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+
+@router.get("/{funcionario_id}", response_model=SaldoBancoHoras)
+async def buscar_saldo(
+    funcionario_id: str,
+    service: BancoHorasService = Depends(get_service)
+):
+    """
+    Saldo do banco de horas de um funcionário.
+    
+    O saldo é mantido a cada registro de frequência; a consulta é uma
+    leitura única, sem recalcular o histórico.
+    """
+    try:
+        return await service.get_saldo(funcionario_id)
+    except Exception as e:
+        logger.error("Erro ao buscar banco de horas: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+
+@router.post("/reconstruir")
+async def reconstruir_banco_horas(service: BancoHorasService = Depends(get_service)):
+    """
+    Recalcula todos os saldos a partir do histórico de frequência.
+    
+    Necessário após mudar BANCO_HORAS_JORNADA_HORAS ou
+    BANCO_HORAS_MULTIPLICADORES, ou para corrigir divergências.
+    
+    Enquanto roda, registros de frequência (manuais e importados) são
+    recusados com 503; uma segunda reconstrução simultânea recebe 409.
+    """
+    try:
+        return await service.reconstruir()
+    except ReconstrucaoEmAndamento as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error("Erro ao reconstruir banco de horas: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
@@ -0,0 +1,37 @@
+"""
+Endpoints do calendário de trabalho (feriados e dias úteis)
+"""
+from fastapi import APIRouter, HTTPException, Path, Query
+from services.calendario_service import calendario
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/calendario", tags=["Calendário"])
+
+
+@router.get("/feriados/{ano}")
+async def listar_feriados(ano: int = Path(..., ge=1900, le=2100)):
+    """
+    Feriados nacionais e municipais do ano.
+    
+    Os municipais vêm da variável de ambiente FERIADOS_MUNICIPAIS.
+    """
+    feriados = calendario.feriados(ano)
+    return {"ano": ano, "total": len(feriados), "feriados": feriados}
+
+
+@router.get("/dias-uteis")
+async def contar_dias_uteis(
+    data_inicio: str = Query(..., description="Data inicial (YYYY-MM-DD)"),
+    data_fim: str = Query(..., description="Data final (YYYY-MM-DD)")
+):
+    """Dias úteis no período (inclusivo), sem fins de semana e feriados"""
+    try:
+        return {
+            "data_inicio": data_inicio,
+            "data_fim": data_fim,
+            "dias_uteis": calendario.dias_uteis(data_inicio, data_fim),
+            "feriados": [d.isoformat() for d in calendario.feriados_no_periodo(data_inicio, data_fim)]
+        }
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Datas devem estar no formato YYYY-MM-DD")
@@ -1,16 +1,19 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Request
 from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import List
+from typing import BinaryIO, Iterator, List, Optional
+from datetime import datetime
 import logging
 
 from services.funcionario_service import FuncionarioService
 from services.frequencia_service import FrequenciaService
 from services.excel_service import ExcelService
-from models.funcionario import FuncionarioCreate
+from services.exportacao_consolidada_service import ExportacaoConsolidadaService
 
 logger = logging.getLogger(__name__)
 
+TAMANHO_PEDACO = 64 * 1024
+
 router = APIRouter(prefix="/excel", tags=["Excel"])
 
 
@@ -25,10 +28,7 @@ async def export_funcionarios(db: AsyncIOMotorDatabase = Depends(get_database)):
     """
     try:
         funcionario_service = FuncionarioService(db)
-        funcionarios = await funcionario_service.get_all()
-        
-        # Converte para dicionários
-        funcionarios_dict = [func.model_dump() for func in funcionarios]
+        funcionarios_dict = await funcionario_service.get_all_raw()
         
         # Gera Excel
         excel_buffer = ExcelService.export_funcionarios_to_excel(funcionarios_dict)
@@ -38,110 +38,96 @@ async def export_funcionarios(db: AsyncIOMotorDatabase = Depends(get_database)):
             excel_buffer,
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers={
-                "Content-Disposition": f"attachment; filename=funcionarios_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+                "Content-Disposition": f"attachment; filename=funcionarios_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
             }
         )
         
     except Exception as e:
-        logger.error(f"Erro ao exportar funcionários: {e}")
+        logger.error("Erro ao exportar funcionários: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/funcionarios/import")
-async def import_funcionarios(
-    file: UploadFile = File(...),
+@router.get("/frequencia/export")
+async def export_frequencia(
+    data_inicio: str = None,
+    data_fim: str = None,
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """
-    Importa funcionários de arquivo Excel
+    Exporta registros de frequência para arquivo Excel
     
-    Formato esperado:
-    - Planilha "Funcionários" com colunas: Nome, CPF, Cargo, Setor, Data Admissão, Telefone, Email, Ativo
+    Query params opcionais:
+    - data_inicio: Filtro de data inicial (YYYY-MM-DD)
+    - data_fim: Filtro de data final (YYYY-MM-DD)
     """
     try:
-        # Valida tipo de arquivo
-        if not file.filename.endswith(('.xlsx', '.xls')):
-            raise HTTPException(status_code=400, detail="Arquivo deve ser .xlsx ou .xls")
-        
-        # Lê conteúdo do arquivo
-        content = await file.read()
-        
-        # Importa dados do Excel
-        funcionarios_data = ExcelService.import_funcionarios_from_excel(content)
-        
-        # Salva funcionários no banco
-        funcionario_service = FuncionarioService(db)
+        frequencia_service = FrequenciaService(db)
         
-        created = []
-        errors = []
+        # Busca registros (com filtros se fornecidos)
+        registros = await frequencia_service.get_all_raw(
+            data_inicio=data_inicio,
+            data_fim=data_fim,
+            limit=10000
+        )
         
-        for func_data in funcionarios_data:
-            try:
-                funcionario_create = FuncionarioCreate(**func_data)
-                funcionario = await funcionario_service.create(funcionario_create)
-                created.append(funcionario.model_dump())
-            except Exception as e:
-                errors.append({
-                    'funcionario': func_data.get('nome', 'Desconhecido'),
-                    'erro': str(e)
-                })
+        # Gera Excel
+        excel_buffer = ExcelService.export_frequencia_to_excel(registros)
         
-        return {
-            "message": f"Importação concluída",
-            "total_processados": len(funcionarios_data),
-            "criados": len(created),
-            "erros": len(errors),
-            "detalhes_erros": errors
-        }
+        # Retorna como download
+        return StreamingResponse(
+            excel_buffer,
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            headers={
+                "Content-Disposition": f"attachment; filename=frequencia_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+            }
+        )
         
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Erro ao importar funcionários: {e}")
+        logger.error("Erro ao exportar frequência: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/frequencia/export")
-async def export_frequencia(
-    data_inicio: str = None,
-    data_fim: str = None,
+def _pedacos(arquivo: BinaryIO) -> Iterator[bytes]:
+    """Envia o arquivo em pedaços e o descarta no fim (ou se o cliente desistir)"""
+    try:
+        while pedaco := arquivo.read(TAMANHO_PEDACO):
+            yield pedaco
+    finally:
+        arquivo.close()
+
+
+@router.get("/consolidado/export")
+async def export_consolidado(
+    data_inicio: Optional[str] = None,
+    data_fim: Optional[str] = None,
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """
-    Exporta registros de frequência para arquivo Excel
+    Exporta funcionários, frequência, alimentação e materiais em uma única
+    planilha, com uma aba de resumo (totais do período)
     
     Query params opcionais:
     - data_inicio: Filtro de data inicial (YYYY-MM-DD)
     - data_fim: Filtro de data final (YYYY-MM-DD)
+    
+    O período vale para frequência, alimentação e materiais; a aba de
+    funcionários traz todos.
     """
     try:
-        frequencia_service = FrequenciaService(db)
-        
-        # Busca registros (com filtros se fornecidos)
-        query = {}
-        if data_inicio or data_fim:
-            query["data"] = {}
-            if data_inicio:
-                query["data"]["$gte"] = data_inicio
-            if data_fim:
-                query["data"]["$lte"] = data_fim
-        
-        cursor = frequencia_service.collection.find(query).sort("data", -1)
-        registros = await cursor.to_list(length=10000)
-        
-        # Gera Excel
-        excel_buffer = ExcelService.export_frequencia_to_excel(registros)
-        
-        # Retorna como download
-        import pandas as pd
+        arquivo = await ExportacaoConsolidadaService(db).exportar(data_inicio, data_fim)
         return StreamingResponse(
-            excel_buffer,
+            _pedacos(arquivo),
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers={
-                "Content-Disposition": f"attachment; filename=frequencia_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+                "Content-Disposition": f"attachment; filename=consolidado_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
             }
         )
         
+    except ValueError as e:
+        # Período inválido ou aba acima do limite de linhas (PlanilhaGrandeDemais)
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Erro ao exportar frequência: {e}")
+        logger.error("Erro ao exportar planilha consolidada: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
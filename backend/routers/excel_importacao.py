@@ -1,16 +1,42 @@
 """
 Endpoints adicionais para importação de planilhas Excel
-Alimentação e Materiais
+Frequência, Alimentação e Materiais
 """
+from __future__ import annotations
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request
 from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
+import asyncio
 import logging
-import pandas as pd
 from io import BytesIO
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any
 
+from core.modulos import modulo_tardio
+from core.uploads import (
+    IMPORTACAO_MAX_LINHAS,
+    hash_conteudo,
+    preparar_upload,
+    verificar_linhas_csv,
+    verificar_linhas_xlsx,
+)
 from services.excel_service import ExcelService
+from services.banco_horas_service import ReconstrucaoEmAndamento
+from services.importacao_service import (
+    ImportacaoService,
+    EsquemaImportacao,
+    PipelineImportacao,
+    LimiteLinhasExcedido,
+    ImportacaoEmAndamento,
+    ESQUEMA_FUNCIONARIOS,
+    ESQUEMA_FREQUENCIA,
+    ESQUEMA_ALIMENTACAO,
+    ESQUEMA_MATERIAIS,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+else:
+    pd = modulo_tardio("pandas")
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +47,68 @@ def get_database(request: Request):
     return request.app.state.db
 
 
+async def _importar(file: UploadFile, esquema: EsquemaImportacao, db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+    """Lê a planilha enviada e executa a importação do esquema"""
+    try:
+        # O arquivo já está em disco (SpooledTemporaryFile): lê direto dele
+        arquivo = preparar_upload(file, ('.xlsx', '.xls', '.csv'))
+        nome_arquivo = file.filename.lower()
+        
+        # Contagem de linhas lê o arquivo do disco: fora do event loop
+        if nome_arquivo.endswith('.csv'):
+            await asyncio.to_thread(verificar_linhas_csv, arquivo)
+        elif nome_arquivo.endswith('.xlsx'):
+            await asyncio.to_thread(verificar_linhas_xlsx, arquivo)
+        
+        # O hash identifica o arquivo: reenvios viram no-op ou retomam a importação
+        hash_arquivo = await asyncio.to_thread(hash_conteudo, arquivo)
+        
+        # Linhas seguem da planilha para a gravação em lotes, sem carregar o arquivo todo
+        lotes = ExcelService.ler_em_lotes(
+            arquivo,
+            nome_arquivo,
+            planilha=esquema.planilha,
+            tamanho_lote=PipelineImportacao.TAMANHO_LOTE
+        )
+        return await ImportacaoService(db).importar(
+            esquema,
+            lotes,
+            max_linhas=IMPORTACAO_MAX_LINHAS,
+            hash_conteudo=hash_arquivo,
+            nome_arquivo=file.filename
+        )
+        
+    except HTTPException:
+        raise
+    except LimiteLinhasExcedido as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ImportacaoEmAndamento as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ReconstrucaoEmAndamento as e:
+        # O job fica em erro e o reenvio do arquivo retoma do último lote
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Erro ao importar %s: %s", esquema.nome, e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/funcionarios/import")
+async def import_funcionarios(
+    file: UploadFile = File(...),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Importa funcionários de arquivo Excel
+    
+    Formato esperado:
+    - Planilha "Funcionários" com colunas: Nome, CPF, Cargo, Setor, Data Admissão, Telefone, Email, Ativo
+    - Funcionários com CPF já cadastrado são ignorados
+    """
+    return await _importar(file, ESQUEMA_FUNCIONARIOS, db)
+
+
 @router.post("/frequencia/import")
 async def import_frequencia(
     file: UploadFile = File(...),
@@ -30,64 +118,10 @@ async def import_frequencia(
     Importa registros de frequência de arquivo Excel
     
     Formato esperado:
-    - Colunas: Funcionário ID, Data, Hora Entrada, Hora Saída, Tipo Dia, Observações
+    - Colunas: Funcionário ID, Data, Hora Entrada, Hora Saída, Tipo Dia, Observação
+    - Registros já existentes para o mesmo funcionário e data são ignorados
     """
-    try:
-        if not file.filename.endswith(('.xlsx', '.xls', '.csv')):
-            raise HTTPException(status_code=400, detail="Arquivo deve ser .xlsx, .xls ou .csv")
-        
-        content = await file.read()
-        
-        # Lê o arquivo
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(BytesIO(content))
-        else:
-            df = pd.read_excel(BytesIO(content))
-        
-        # Valida colunas obrigatórias
-        required_columns = ['funcionario_id', 'data']
-        for col in required_columns:
-            if col not in df.columns:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Coluna obrigatória ausente: {col}"
-                )
-        
-        created = []
-        errors = []
-        
-        for idx, row in df.iterrows():
-            try:
-                registro = {
-                    'funcionario_id': str(row['funcionario_id']),
-                    'data': str(row['data']),
-                    'hora_entrada': str(row.get('hora_entrada', '')),
-                    'hora_saida': str(row.get('hora_saida', '')),
-                    'tipo_dia': str(row.get('tipo_dia', 'util')),
-                    'observacao': str(row.get('observacao', ''))
-                }
-                
-                # Insere no banco
-                result = await db.frequencia.insert_one(registro)
-                created.append(str(result.inserted_id))
-                
-            except Exception as e:
-                errors.append({
-                    'linha': idx + 2,
-                    'erro': str(e)
-                })
-        
-        return {
-            "message": "Importação concluída",
-            "total_processados": len(df),
-            "criados": len(created),
-            "erros": len(errors),
-            "detalhes_erros": errors
-        }
-        
-    except Exception as e:
-        logger.error(f"Erro ao importar frequência: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return await _importar(file, ESQUEMA_FREQUENCIA, db)
 
 
 @router.get("/alimentacao/export")
@@ -131,7 +165,7 @@ async def export_alimentacao(
         )
         
     except Exception as e:
-        logger.error(f"Erro ao exportar alimentação: {e}")
+        logger.error("Erro ao exportar alimentação: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -145,62 +179,9 @@ async def import_alimentacao(
     
     Formato esperado:
     - Colunas: Funcionário ID, Nome, Data, Tipo Refeição, Valor Unitário, Quantidade, Fornecedor
+    - Registros já existentes para o mesmo funcionário, data e refeição são ignorados
     """
-    try:
-        if not file.filename.endswith(('.xlsx', '.xls', '.csv')):
-            raise HTTPException(status_code=400, detail="Arquivo deve ser .xlsx, .xls ou .csv")
-        
-        content = await file.read()
-        
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(BytesIO(content))
-        else:
-            df = pd.read_excel(BytesIO(content))
-        
-        required_columns = ['funcionario_id', 'data', 'tipo_refeicao']
-        for col in required_columns:
-            if col not in df.columns:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Coluna obrigatória ausente: {col}"
-                )
-        
-        created = []
-        errors = []
-        
-        for idx, row in df.iterrows():
-            try:
-                registro = {
-                    'funcionario_id': str(row['funcionario_id']),
-                    'nome': str(row.get('nome', '')),
-                    'data': str(row['data']),
-                    'tipo_refeicao': str(row['tipo_refeicao']),
-                    'valor_unitario': float(row.get('valor_unitario', 0)),
-                    'quantidade': int(row.get('quantidade', 1)),
-                    'total_dia': float(row.get('valor_unitario', 0)) * int(row.get('quantidade', 1)),
-                    'fornecedor': str(row.get('fornecedor', ''))
-                }
-                
-                result = await db.alimentacao.insert_one(registro)
-                created.append(str(result.inserted_id))
-                
-            except Exception as e:
-                errors.append({
-                    'linha': idx + 2,
-                    'erro': str(e)
-                })
-        
-        return {
-            "message": "Importação concluída",
-            "total_processados": len(df),
-            "criados": len(created),
-            "erros": len(errors),
-            "detalhes_erros": errors
-        }
-        
-    except Exception as e:
-        logger.error(f"Erro ao importar alimentação: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return await _importar(file, ESQUEMA_ALIMENTACAO, db)
 
 
 @router.get("/materiais/export")
@@ -242,7 +223,7 @@ async def export_materiais(
         )
         
     except Exception as e:
-        logger.error(f"Erro ao exportar materiais: {e}")
+        logger.error("Erro ao exportar materiais: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -257,61 +238,21 @@ async def import_materiais(
     Formato esperado:
     - Colunas: Data, Descrição, Local Uso, Categoria, Quantidade, Valor Unitário, Autorizado Por
     """
-    try:
-        if not file.filename.endswith(('.xlsx', '.xls', '.csv')):
-            raise HTTPException(status_code=400, detail="Arquivo deve ser .xlsx, .xls ou .csv")
-        
-        content = await file.read()
-        
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(BytesIO(content))
-        else:
-            df = pd.read_excel(BytesIO(content))
-        
-        required_columns = ['data', 'descricao', 'local_uso']
-        for col in required_columns:
-            if col not in df.columns:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Coluna obrigatória ausente: {col}"
-                )
-        
-        created = []
-        errors = []
-        
-        for idx, row in df.iterrows():
-            try:
-                quantidade = float(row.get('quantidade', 1))
-                valor_unitario = float(row.get('valor_unitario', 0))
-                
-                registro = {
-                    'data': str(row['data']),
-                    'descricao': str(row['descricao']),
-                    'local_uso': str(row['local_uso']),
-                    'categoria': str(row.get('categoria', '')),
-                    'quantidade': quantidade,
-                    'valor_unitario': valor_unitario,
-                    'valor_total': quantidade * valor_unitario,
-                    'autorizado_por': str(row.get('autorizado_por', ''))
-                }
-                
-                result = await db.materiais.insert_one(registro)
-                created.append(str(result.inserted_id))
-                
-            except Exception as e:
-                errors.append({
-                    'linha': idx + 2,
-                    'erro': str(e)
-                })
-        
-        return {
-            "message": "Importação concluída",
-            "total_processados": len(df),
-            "criados": len(created),
-            "erros": len(errors),
-            "detalhes_erros": errors
-        }
-        
-    except Exception as e:
-        logger.error(f"Erro ao importar materiais: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return await _importar(file, ESQUEMA_MATERIAIS, db)
+
+
+@router.get("/importacoes/{importacao_id}")
+async def status_importacao(
+    importacao_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Situação de uma importação: status, lotes gravados e contadores
+    
+    Útil quando o cliente perde a resposta do upload: reenviar o mesmo
+    arquivo retoma a importação a partir do último lote gravado.
+    """
+    job = await ImportacaoService(db).get_job(importacao_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Importação não encontrada")
+    return job
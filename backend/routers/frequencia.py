@@ -1,9 +1,15 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Request
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from models.frequencia import RegistroFrequencia, RegistroFrequenciaCreate, RegistroFrequenciaUpdate
+from models.frequencia import RegistroFrequencia, RegistroFrequenciaCreate, RegistroFrequenciaUpdate, FolhaPonto
 from services.frequencia_service import FrequenciaService
+from services.banco_horas_service import ReconstrucaoEmAndamento
+from services.frequencia_feed_service import FrequenciaFeedService
+from services.frequencia_armazenamento import data_nativa
+from core.compressao import sem_compressao
 from dependencies import get_database
 from typing import List, Optional
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,6 +20,11 @@ def get_service(db: AsyncIOMotorDatabase = Depends(get_database)) -> FrequenciaS
     return FrequenciaService(db)
 
 
+def _em_reconstrucao(e: ReconstrucaoEmAndamento) -> HTTPException:
+    """Escritas recusadas durante a reconstrução do banco de horas"""
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
 @router.post("", response_model=RegistroFrequencia, status_code=201)
 async def registrar_frequencia(
     registro: RegistroFrequenciaCreate,
@@ -26,14 +37,16 @@ async def registrar_frequencia(
     - **data**: Data do registro (YYYY-MM-DD)
     - **hora_entrada**: Hora de entrada (HH:MM)
     - **hora_saida**: Hora de saída (HH:MM) - opcional
-    - **tipo_dia**: Tipo do dia (util, feriado, fim_de_semana)
+    - **tipo_dia**: Tipo do dia (util, feriado, fim_de_semana); se omitido, é classificado pelo calendário
     """
     try:
         return await service.create(registro)
+    except ReconstrucaoEmAndamento as e:
+        raise _em_reconstrucao(e)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Erro ao registrar frequência: {e}")
+        logger.error("Erro ao registrar frequência: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 
@@ -53,11 +66,53 @@ async def listar_frequencia(
             data_fim=data_fim,
             funcionario_id=funcionario_id
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Erro ao listar frequência: {e}")
+        logger.error("Erro ao listar frequência: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 
+@router.get("/ao-vivo")
+@sem_compressao
+async def feed_frequencia(
+    request: Request,
+    data: Optional[str] = Query(None, description="Data dos registros (YYYY-MM-DD)"),
+    setor: Optional[str] = Query(None, description="Filtrar por setor"),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Feed ao vivo (Server-Sent Events) de entradas e atualizações de ponto.
+    
+    Usa change streams do MongoDB; em servidores standalone faz polling
+    incremental. Linhas de comentário (`:`) são enviadas como heartbeat.
+    Nunca é comprimido: cada evento precisa chegar assim que é gerado.
+    """
+    try:
+        data_nativa(data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    feed = FrequenciaFeedService(db)
+
+    async def gerar_eventos():
+        try:
+            async for evento in feed.eventos(data=data, setor=setor):
+                if await request.is_disconnected():
+                    break
+                if evento is None:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield f"event: {evento['operacao']}\ndata: {json.dumps(evento['registro'], default=str)}\n\n"
+        except Exception as e:
+            logger.error("Erro no feed de frequência: %s", e)
+
+    return StreamingResponse(
+        gerar_eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/{registro_id}", response_model=RegistroFrequencia)
 async def buscar_frequencia(
     registro_id: str,
@@ -74,7 +129,7 @@ async def buscar_frequencia(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Erro ao buscar frequência: {e}")
+        logger.error("Erro ao buscar frequência: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 
@@ -94,8 +149,10 @@ async def atualizar_frequencia(
         return registro
     except HTTPException:
         raise
+    except ReconstrucaoEmAndamento as e:
+        raise _em_reconstrucao(e)
     except Exception as e:
-        logger.error(f"Erro ao atualizar frequência: {e}")
+        logger.error("Erro ao atualizar frequência: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 
@@ -114,8 +171,10 @@ async def remover_frequencia(
         return None
     except HTTPException:
         raise
+    except ReconstrucaoEmAndamento as e:
+        raise _em_reconstrucao(e)
     except Exception as e:
-        logger.error(f"Erro ao remover frequência: {e}")
+        logger.error("Erro ao remover frequência: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 
@@ -137,5 +196,33 @@ async def buscar_frequencia_mes(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Erro ao buscar frequência do mês: {e}")
+        logger.error("Erro ao buscar frequência do mês: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+
+@router.get("/folha-ponto/{ano}/{mes}", response_model=FolhaPonto)
+async def folha_ponto_mes(
+    ano: int,
+    mes: int,
+    funcionario_id: Optional[str] = Query(None, description="ID do funcionário"),
+    setor: Optional[str] = Query(None, description="Setor (todos os funcionários ativos)"),
+    service: FrequenciaService = Depends(get_service)
+):
+    """
+    Folha de ponto do mês completo, de um funcionário ou de um setor.
+    
+    Traz cada dia do mês com horas, faltas e marcação de fim de semana/feriado,
+    além dos totais mensais por funcionário, calculados em uma única agregação.
+    """
+    try:
+        if mes < 1 or mes > 12:
+            raise HTTPException(status_code=400, detail="Mês inválido (deve ser entre 1 e 12)")
+        
+        return await service.get_folha_ponto(ano, mes, funcionario_id=funcionario_id, setor=setor)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Erro ao gerar folha de ponto: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, Response
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models.funcionario import Funcionario, FuncionarioCreate, FuncionarioUpdate
 from services.funcionario_service import FuncionarioService
+from services.propagacao_nome_service import PropagacaoNomeService
 from dependencies import get_database
-from typing import List, Optional
+from core.etag import verificar_etag
+from typing import List, Literal, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -34,34 +36,70 @@ async def criar_funcionario(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Erro ao criar funcionário: {e}")
+        logger.error("Erro ao criar funcionário: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 
 @router.get("", response_model=List[Funcionario])
 async def listar_funcionarios(
+    request: Request,
+    response: Response,
     ativo: Optional[bool] = Query(None, description="Filtrar por status ativo/inativo"),
     setor: Optional[str] = Query(None, description="Filtrar por setor"),
     service: FuncionarioService = Depends(get_service)
 ):
     """
     Lista todos os funcionários com filtros opcionais.
+    
+    Suporta GET condicional: com `If-None-Match` igual à ETag atual a
+    resposta é 304, sem consulta ao banco.
     """
+    nao_modificado = verificar_etag(request, response, "funcionarios")
+    if nao_modificado:
+        return nao_modificado
     try:
         return await service.get_all(ativo=ativo, setor=setor)
     except Exception as e:
-        logger.error(f"Erro ao listar funcionários: {e}")
+        logger.error("Erro ao listar funcionários: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+
+@router.get("/busca", response_model=List[Funcionario])
+async def pesquisar_funcionarios(
+    q: str = Query(..., min_length=1, max_length=100, description="Nome, cargo ou trecho do CPF"),
+    ativo: Optional[bool] = Query(None, description="Filtrar por status ativo/inativo"),
+    setor: Optional[str] = Query(None, description="Filtrar por setor"),
+    modo: Literal['prefixo', 'texto'] = Query('prefixo', description="prefixo (type-ahead) ou texto (palavras inteiras)"),
+    limite: int = Query(20, ge=1, le=100),
+    service: FuncionarioService = Depends(get_service)
+):
+    """
+    Busca funcionários no servidor.
+    
+    No modo `prefixo` (padrão), cada palavra digitada casa com o início de uma
+    palavra do nome ou do cargo, sem diferenciar acentos ("joao si" encontra
+    "João Silva"); números casam com qualquer trecho do CPF.
+    """
+    try:
+        return await service.buscar(q, ativo=ativo, setor=setor, modo=modo, limite=limite)
+    except Exception as e:
+        logger.error("Erro ao buscar funcionários: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 
 @router.get("/{funcionario_id}", response_model=Funcionario)
 async def buscar_funcionario(
     funcionario_id: str,
+    request: Request,
+    response: Response,
     service: FuncionarioService = Depends(get_service)
 ):
     """
     Busca um funcionário por ID.
     """
+    nao_modificado = verificar_etag(request, response, "funcionarios")
+    if nao_modificado:
+        return nao_modificado
     try:
         funcionario = await service.get_by_id(funcionario_id)
         if not funcionario:
@@ -70,7 +108,7 @@ async def buscar_funcionario(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Erro ao buscar funcionário: {e}")
+        logger.error("Erro ao buscar funcionário: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 
@@ -93,7 +131,7 @@ async def atualizar_funcionario(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Erro ao atualizar funcionário: {e}")
+        logger.error("Erro ao atualizar funcionário: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 
@@ -113,18 +151,23 @@ async def desativar_funcionario(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Erro ao desativar funcionário: {e}")
+        logger.error("Erro ao desativar funcionário: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 
 @router.get("/cpf/{cpf}", response_model=Funcionario)
 async def buscar_por_cpf(
     cpf: str,
+    request: Request,
+    response: Response,
     service: FuncionarioService = Depends(get_service)
 ):
     """
     Busca um funcionário por CPF.
     """
+    nao_modificado = verificar_etag(request, response, "funcionarios")
+    if nao_modificado:
+        return nao_modificado
     try:
         funcionario = await service.get_by_cpf(cpf)
         if not funcionario:
@@ -133,5 +176,24 @@ async def buscar_por_cpf(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Erro ao buscar funcionário por CPF: {e}")
+        logger.error("Erro ao buscar funcionário por CPF: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+
+@router.get("/{funcionario_id}/propagacao-nome")
+async def status_propagacao_nome(
+    funcionario_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Progresso da atualização do nome nos registros de frequência e
+    alimentação após a última troca de nome do funcionário.
+    """
+    try:
+        job = await PropagacaoNomeService(db).get_ultimo(funcionario_id)
+    except Exception as e:
+        logger.error("Erro ao buscar propagação de nome: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
+    if not job:
+        raise HTTPException(status_code=404, detail="Nenhuma troca de nome registrada para o funcionário")
+    return job
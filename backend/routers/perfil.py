@@ -0,0 +1,58 @@
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response
+from fastapi.responses import PlainTextResponse
+from core.perfil import Perfis, perfis, token_valido, PERFIL_ATIVO
+from typing import Literal, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/admin/perfis", tags=["Admin - Perfis"])
+
+
+def get_perfis(x_perfil_token: Optional[str] = Header(None)) -> Perfis:
+    if not PERFIL_ATIVO:
+        raise HTTPException(status_code=403, detail="Perfilamento desabilitado (PERFIL_HABILITADO e PERFIL_TOKEN)")
+    if not token_valido(x_perfil_token):
+        raise HTTPException(status_code=401, detail="X-Perfil-Token inválido")
+    return perfis
+
+
+@router.get("")
+async def listar_perfis(service: Perfis = Depends(get_perfis)):
+    """Perfis gravados recentemente (mais novos primeiro)"""
+    try:
+        return await service.listar()
+    except Exception as e:
+        logger.error("Erro ao listar perfis: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+
+@router.get("/{perfil_id}")
+async def baixar_perfil(
+    perfil_id: str,
+    formato: Literal["texto", "pstats"] = Query("texto", description="texto ou pstats (cProfile, para snakeviz)"),
+    service: Perfis = Depends(get_perfis)
+):
+    """
+    Resultado de um perfil. `texto` traz o relatório legível; `pstats` baixa o
+    arquivo .prof do cProfile (só no modo cpu), que abre com snakeviz ou
+    `python -m pstats`.
+    """
+    try:
+        perfil = await service.obter(perfil_id)
+    except Exception as e:
+        logger.error("Erro ao buscar perfil: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+    if not perfil:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado ou expirado")
+
+    if formato == "pstats":
+        if not perfil.get("pstats"):
+            raise HTTPException(status_code=400, detail="Perfil de memória não tem arquivo pstats")
+        return Response(
+            perfil["pstats"],
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f"attachment; filename=perfil_{perfil_id}.prof"}
+        )
+
+    cabecalho = f"{perfil['metodo']} {perfil['caminho']} -> {perfil['status']} em {perfil['duracao_ms']} ms ({perfil['modo']}, {perfil['criado_em']})\n\n"
+    return PlainTextResponse(cabecalho + perfil["texto"])
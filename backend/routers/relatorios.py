@@ -1,8 +1,10 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models.relatorio import RelatorioRequest, RelatorioResponse
 from services.relatorio_service import RelatorioService
 from dependencies import get_database
+from core.etag import verificar_etag
+from typing import Literal, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -42,5 +44,42 @@ async def gerar_relatorio(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Erro ao gerar relatório: {e}")
+        logger.error("Erro ao gerar relatório: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+
+@router.get("/gerar", response_model=RelatorioResponse)
+async def gerar_relatorio_condicional(
+    request: Request,
+    response: Response,
+    tipo: Literal['frequencia', 'alimentacao', 'materiais', 'combustivel', 'geral'] = Query(...),
+    data_inicio: str = Query(..., description="Data inicial (YYYY-MM-DD)"),
+    data_fim: str = Query(..., description="Data final (YYYY-MM-DD)"),
+    funcionario_id: Optional[str] = Query(None, description="ID do funcionário"),
+    setor: Optional[str] = Query(None, description="Filtrar por setor"),
+    service: RelatorioService = Depends(get_service)
+):
+    """
+    Versão GET de `/relatorios/gerar`, com os mesmos parâmetros na query string.
+    
+    Suporta GET condicional: enquanto funcionários e frequência não mudarem,
+    `If-None-Match` com a ETag recebida retorna 304 sem gerar o relatório.
+    """
+    nao_modificado = verificar_etag(request, response, "funcionarios", "frequencia")
+    if nao_modificado:
+        return nao_modificado
+    try:
+        return await service.gerar_relatorio(RelatorioRequest(
+            tipo=tipo,
+            data_inicio=data_inicio,
+            data_fim=data_fim,
+            funcionario_id=funcionario_id,
+            setor=setor
+        ))
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Erro ao gerar relatório: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
@@ -12,6 +12,9 @@ from pathlib import Path
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+from services.calendario_service import calendario
+from services.frequencia_armazenamento import armazenamento_frequencia
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
 db_name = os.environ['DB_NAME']
@@ -113,13 +116,14 @@ async def seed_database():
     """Popula o banco de dados com dados de teste"""
     client = AsyncIOMotorClient(mongo_url)
     db = client[db_name]
+    armazenamento = armazenamento_frequencia(db)
     
     print("🌱 Iniciando seed do banco de dados...")
     
     # Limpar dados existentes
     print("🗑️  Limpando dados existentes...")
     await db.funcionarios.delete_many({})
-    await db.frequencia.delete_many({})
+    await armazenamento.colecao.delete_many({})
     
     # Inserir funcionários
     print("👥 Inserindo funcionários...")
@@ -135,8 +139,8 @@ async def seed_database():
         data = hoje - timedelta(days=dia)
         data_str = data.strftime("%Y-%m-%d")
         
-        # Apenas dias úteis (segunda a sexta)
-        if data.weekday() < 5:
+        # Apenas dias úteis (sem fins de semana e feriados)
+        if calendario.eh_dia_util(data):
             for func in funcionarios_mock:
                 # 90% de chance de estar presente
                 if random.random() < 0.9:
@@ -161,14 +165,14 @@ async def seed_database():
                     registros_frequencia.append(registro)
     
     if registros_frequencia:
-        await db.frequencia.insert_many(registros_frequencia)
+        await armazenamento.inserir_lote(registros_frequencia)
         print(f"✅ {len(registros_frequencia)} registros de frequência inseridos")
     
     print("🎉 Seed concluído com sucesso!")
     
     # Estatísticas
     total_funcionarios = await db.funcionarios.count_documents({})
-    total_frequencia = await db.frequencia.count_documents({})
+    total_frequencia = await armazenamento.contar()
     
     print("\n📊 Estatísticas:")
     print(f"   Funcionários: {total_funcionarios}")
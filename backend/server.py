@@ -2,7 +2,8 @@
 from fastapi import FastAPI, APIRouter, Request, Depends
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from typing import Optional
 from pathlib import Path
 import logging
 import os
@@ -16,14 +17,24 @@ load_dotenv(ROOT_DIR / '.env')
 sys.path.insert(0, str(ROOT_DIR))
 
 # Importa os routers
-from routers import funcionarios_router, frequencia_router, relatorios_router
+from routers import funcionarios_router, frequencia_router, relatorios_router, analises_router, calendario_router, banco_horas_router, arquivo_router, perfil_router
 from routers.excel import router as excel_router
-
-# --- Configuração do Logger ---
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
+from routers.excel_importacao import router as excel_importacao_router
+from database import criar_indices
+from services.funcionario_service import FuncionarioService
+from services.propagacao_nome_service import propagador_nomes
+from services.frequencia_armazenamento import armazenamento_frequencia
+from core.compressao import CompressaoMiddleware
+from core.uploads import LimiteUploadMiddleware
+from core.carregador import CarregadoresMiddleware
+from core.estado import VersoesCompartilhadasMiddleware, estado_compartilhado
+from core.limites import ConcorrenciaMiddleware, LimiteTaxaMiddleware
+from core.perfil import PerfilMiddleware
+from core.consultas_lentas import criar_monitor
+from core.logs import configurar_logs, parar_logs
+
+# --- Configuração do Logger (fila assíncrona, JSON; ver core/logs.py) ---
+configurar_logs()
 logger = logging.getLogger(__name__)
 
 # --- Criação do app FastAPI ---
@@ -34,18 +45,28 @@ app = FastAPI(
 )
 
 # --- Conexão com o MongoDB ---
+# Só a configuração é lida aqui: o cliente é criado no startup, já dentro do
+# processo do worker, e importar este módulo não abre conexões
 try:
     mongo_url = os.environ["MONGO_URL"]
     db_name = os.environ["DB_NAME"]
+except KeyError as e:
+    logger.error("Configuração do MongoDB ausente: %s", e)
+    raise RuntimeError("Falha na conexão com o banco de dados")
 
-    client = AsyncIOMotorClient(mongo_url)
-    db = client[db_name]
-    app.state.db = db
+client: Optional[AsyncIOMotorClient] = None
+monitor_mongo = None
 
-    logger.info(f"✅ Conectado ao MongoDB: {db_name}")
-except Exception as e:
-    logger.error(f"❌ Erro ao conectar ao MongoDB: {e}")
-    raise RuntimeError("Falha na conexão com o banco de dados")
+
+def conectar_mongo() -> AsyncIOMotorDatabase:
+    """Cria o cliente do MongoDB e publica o banco em app.state.db"""
+    global client, monitor_mongo
+    # Log de comandos lentos com explain (MONGO_LENTO_MS=0 desliga)
+    monitor_mongo = criar_monitor(mongo_url)
+    client = AsyncIOMotorClient(mongo_url, event_listeners=[monitor_mongo] if monitor_mongo else [])
+    app.state.db = client[db_name]
+    logger.info("Cliente do MongoDB criado: %s", db_name)
+    return app.state.db
 
 # --- Dependência para acessar o DB nas rotas ---
 def get_database(request: Request):
@@ -67,11 +88,43 @@ async def health_check():
 api_router.include_router(funcionarios_router)
 api_router.include_router(frequencia_router)
 api_router.include_router(relatorios_router)
+api_router.include_router(analises_router)
+api_router.include_router(calendario_router)
+api_router.include_router(banco_horas_router)
+api_router.include_router(arquivo_router)
+api_router.include_router(perfil_router)
 api_router.include_router(excel_router)
+api_router.include_router(excel_importacao_router)
 
 # --- Adiciona o router principal à aplicação ---
 app.include_router(api_router)
 
+# --- Middleware de compressão (brotli/zstd/gzip negociados) ---
+app.add_middleware(
+    CompressaoMiddleware,
+    minimo_bytes=int(os.environ.get("COMPRESSAO_MINIMO_BYTES", "1024")),
+    excluir_prefixos=os.environ.get("COMPRESSAO_EXCLUIR", "").split(","),
+)
+
+# --- Perfilamento sob demanda (X-Perfil: cpu|memoria, desabilitado por padrão) ---
+app.add_middleware(PerfilMiddleware)
+
+# --- Concorrência e fila por grupo (relatórios, importações, exportações) ---
+app.add_middleware(ConcorrenciaMiddleware)
+
+# --- Limite de taxa por cliente em /excel/* e /relatorios/gerar ---
+app.add_middleware(LimiteTaxaMiddleware)
+
+# --- Vários workers: versões das coleções vindas do estado compartilhado ---
+if estado_compartilhado.compartilhado:
+    app.add_middleware(VersoesCompartilhadasMiddleware)
+
+# --- Carregamento em lote por requisição (get_by_id/get_by_cpf viram $in) ---
+app.add_middleware(CarregadoresMiddleware)
+
+# --- Limite de tamanho dos uploads (recusa antes do parsing) ---
+app.add_middleware(LimiteUploadMiddleware)
+
 # --- Middleware CORS ---
 app.add_middleware(
     CORSMiddleware,
@@ -84,10 +137,26 @@ app.add_middleware(
 # --- Eventos do ciclo de vida ---
 @app.on_event("startup")
 async def on_startup():
-    logger.info("🚀 Servidor iniciado e pronto para uso")
+    db = conectar_mongo()
+    await criar_indices(db)
+    await FuncionarioService(db).indexar_busca()
+    propagador_nomes.iniciar(db)
+    logger.info("Estado compartilhado: %s", type(estado_compartilhado).__name__)
+    if await armazenamento_frequencia(db).tem_registros_legados():
+        logger.warning(
+            "Há registros de frequência com data/horário em texto: os filtros de período "
+            "não os encontram. Rode python migracoes/frequencia_tipos_nativos.py"
+        )
+    logger.info("Servidor iniciado e pronto para uso")
 
 @app.on_event("shutdown")
 async def on_shutdown():
-    client.close()
-    logger.info("🛑 Conexão com o MongoDB encerrada")
+    await propagador_nomes.parar()
+    await estado_compartilhado.fechar()
+    if client:
+        client.close()
+    if monitor_mongo:
+        monitor_mongo.fechar()
+    logger.info("Conexão com o MongoDB encerrada")
+    parar_logs()
 
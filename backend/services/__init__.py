@@ -1,5 +1,9 @@
 from .funcionario_service import FuncionarioService
 from .frequencia_service import FrequenciaService
 from .relatorio_service import RelatorioService
+from .analise_frequencia_service import AnaliseFrequenciaService
+from .calendario_service import CalendarioService, calendario
+from .banco_horas_service import BancoHorasService
+from .arquivo_service import ArquivoService
 
-__all__ = ['FuncionarioService', 'FrequenciaService', 'RelatorioService']
+__all__ = ['FuncionarioService', 'FrequenciaService', 'RelatorioService', 'AnaliseFrequenciaService', 'CalendarioService', 'calendario', 'BancoHorasService', 'ArquivoService']
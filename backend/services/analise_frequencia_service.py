@@ -0,0 +1,262 @@
+"""
+Análises de frequência sobre um DataFrame colunar
+
+Os registros do período saem do cursor do Motor em blocos direto para
+listas por coluna (sem um dicionário por linha no meio) e viram um
+DataFrame tipado: datas em datetime64, horários em minutos do dia (os tipos
+gravados no banco, sem conversão de texto) e funcionário/nome/setor/tipo_dia
+como categóricos. Horas extras, atrasos e ausências são calculados juntos,
+em uma única passada vetorizada.
+"""
+from __future__ import annotations
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.funcionario_service import FuncionarioService
+from services.calendario_service import calendario
+from services.frequencia_armazenamento import armazenamento_frequencia, minutos_do_dia
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from datetime import datetime
+import asyncio
+import logging
+
+from core.modulos import modulo_tardio
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+else:
+    np = modulo_tardio("numpy")
+    pd = modulo_tardio("pandas")
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_FREQUENCIA = ("funcionario_id", "data", "tipo_dia", "hora_entrada", "hora_saida", "total_horas")
+TAMANHO_BLOCO = 5000
+
+
+class AnaliseFrequenciaService:
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.funcionario_service = FuncionarioService(db)
+
+    @staticmethod
+    def _validar_periodo(data_inicio: str, data_fim: str) -> Tuple[datetime, datetime]:
+        try:
+            inicio = datetime.strptime(data_inicio, "%Y-%m-%d")
+            fim = datetime.strptime(data_fim, "%Y-%m-%d")
+        except ValueError:
+            raise ValueError("Datas devem estar no formato YYYY-MM-DD")
+        if fim < inicio:
+            raise ValueError("data_fim deve ser maior ou igual a data_inicio")
+        return inicio, fim
+
+    async def carregar(
+        self,
+        data_inicio: str,
+        data_fim: str,
+        setor: Optional[str] = None
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Carrega funcionários e registros do período como DataFrames tipados
+
+        Retorna (funcionarios, registros). Os registros já trazem nome e
+        setor do funcionário como categóricos.
+        """
+        self._validar_periodo(data_inicio, data_fim)
+
+        funcionarios = pd.DataFrame(
+            await self.funcionario_service.get_all_raw(
+                setor=setor,
+                projection={"id": 1, "nome": 1, "setor": 1, "ativo": 1},
+                limit=None
+            ),
+            columns=["id", "nome", "setor", "ativo"]
+        )
+        funcionarios["ativo"] = funcionarios["ativo"].fillna(True).astype(bool)
+
+        colunas: Dict[str, List[Any]] = {campo: [] for campo in CAMPOS_FREQUENCIA}
+        blocos = armazenamento_frequencia(self.db).blocos(
+            funcionarios["id"].tolist() if setor else None,
+            data_inicio,
+            data_fim,
+            campos=CAMPOS_FREQUENCIA,
+            tamanho=TAMANHO_BLOCO,
+            nativo=True
+        )
+        async for bloco in blocos:
+            for campo, valores in colunas.items():
+                valores.extend(doc.get(campo) for doc in bloco)
+
+        registros = pd.DataFrame({
+            "funcionario_id": pd.Categorical(colunas["funcionario_id"]),
+            # Tipos nativos do banco: datetime e minutos do dia, sem parse de texto
+            "data": pd.to_datetime(pd.Series(colunas["data"], dtype="object"), errors="coerce"),
+            "tipo_dia": pd.Categorical(colunas["tipo_dia"], categories=["util", "feriado", "fim_de_semana"]),
+            "entrada_min": pd.to_numeric(pd.Series(colunas["hora_entrada"], dtype="object"), errors="coerce").astype("float64"),
+            "saida_min": pd.to_numeric(pd.Series(colunas["hora_saida"], dtype="object"), errors="coerce").astype("float64"),
+            "total_horas": pd.to_numeric(pd.Series(colunas["total_horas"], dtype="object"), errors="coerce"),
+        })
+
+        ids = funcionarios["id"]
+        registros["nome"] = registros["funcionario_id"].map(dict(zip(ids, funcionarios["nome"]))).astype("category")
+        registros["setor"] = registros["funcionario_id"].map(dict(zip(ids, funcionarios["setor"]))).astype("category")
+        if setor:
+            registros = registros[registros["setor"].notna()]
+        return funcionarios, registros
+
+    @staticmethod
+    def dias_esperados(data_inicio: str, data_fim: str) -> int:
+        """Dias úteis no período (inclusivo), descontando fins de semana e feriados"""
+        return calendario.dias_uteis(data_inicio, data_fim)
+
+    def calcular(
+        self,
+        funcionarios: pd.DataFrame,
+        registros: pd.DataFrame,
+        data_inicio: str,
+        data_fim: str,
+        jornada_horas: float = 8.0,
+        hora_limite: str = "08:00",
+        tolerancia_minutos: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Calcula as métricas por funcionário e por setor
+
+        - horas extras: horas acima da jornada em cada dia
+        - atraso: entrada depois de hora_limite + tolerância
+        - ausência: dias úteis esperados (sem fins de semana e feriados) sem
+          registro de entrada, apenas para funcionários ativos
+        """
+        try:
+            limite = minutos_do_dia(hora_limite)
+        except ValueError:
+            limite = None
+        if limite is None:
+            raise ValueError("hora_limite deve estar no formato HH:MM")
+
+        # Colunas derivadas, todas vetorizadas sobre o período inteiro
+        horas = registros["total_horas"].fillna(0)
+        minutos_atraso = (registros["entrada_min"] - limite).where(
+            registros["entrada_min"] > limite + tolerancia_minutos, 0
+        ).fillna(0)
+        dia_util = calendario.classificar(registros["data"]) == "util"
+        presente = registros["entrada_min"].notna() & dia_util
+
+        metricas = pd.DataFrame({
+            "funcionario_id": registros["funcionario_id"],
+            "horas_trabalhadas": horas,
+            "horas_extras": (horas - jornada_horas).clip(lower=0),
+            "atrasos": (minutos_atraso > 0).astype("int64"),
+            "minutos_atraso": minutos_atraso,
+            "dias_presentes": presente.astype("int64"),
+        })
+        por_funcionario = metricas.groupby("funcionario_id", observed=True).sum()
+
+        esperados = self.dias_esperados(data_inicio, data_fim)
+        tabela = funcionarios.set_index("id").join(por_funcionario, how="left").fillna({
+            coluna: 0 for coluna in por_funcionario.columns
+        })
+        tabela["dias_esperados"] = np.where(tabela["ativo"], esperados, 0)
+        tabela["faltas"] = (tabela["dias_esperados"] - tabela["dias_presentes"]).clip(lower=0)
+        tabela["taxa_ausencia"] = np.where(
+            tabela["dias_esperados"] > 0,
+            tabela["faltas"] / tabela["dias_esperados"].where(tabela["dias_esperados"] > 0, 1),
+            0.0
+        )
+
+        somas = ["horas_trabalhadas", "horas_extras", "atrasos", "minutos_atraso",
+                 "dias_presentes", "dias_esperados", "faltas"]
+        grupos = tabela.groupby(tabela["setor"].fillna("Sem setor"))
+        por_setor = grupos[somas].sum()
+        por_setor["funcionarios"] = grupos.size()
+        por_setor["taxa_ausencia"] = np.where(
+            por_setor["dias_esperados"] > 0,
+            por_setor["faltas"] / por_setor["dias_esperados"].where(por_setor["dias_esperados"] > 0, 1),
+            0.0
+        )
+
+        totais = tabela[somas].sum()
+        return {
+            "periodo": {"data_inicio": data_inicio, "data_fim": data_fim},
+            "parametros": {
+                "jornada_horas": jornada_horas,
+                "hora_limite": hora_limite,
+                "tolerancia_minutos": tolerancia_minutos,
+                "dias_uteis": esperados
+            },
+            "por_funcionario": self._registros(tabela.reset_index(names="funcionario_id")),
+            "por_setor": self._registros(por_setor.reset_index()),
+            "totalizadores": {
+                "total_funcionarios": len(tabela),
+                "total_registros": len(registros),
+                "horas_trabalhadas": round(float(totais["horas_trabalhadas"]), 2),
+                "horas_extras": round(float(totais["horas_extras"]), 2),
+                "atrasos": int(totais["atrasos"]),
+                "faltas": int(totais["faltas"]),
+                "taxa_ausencia": round(
+                    float(totais["faltas"] / totais["dias_esperados"]) if totais["dias_esperados"] else 0.0, 4
+                )
+            },
+            "gerado_em": datetime.utcnow().isoformat()
+        }
+
+    @staticmethod
+    def _registros(df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Arredonda e converte para tipos nativos do JSON"""
+        df = df.copy()
+        for coluna in ("horas_trabalhadas", "horas_extras", "minutos_atraso"):
+            if coluna in df:
+                df[coluna] = df[coluna].astype(float).round(2)
+        if "taxa_ausencia" in df:
+            df["taxa_ausencia"] = df["taxa_ausencia"].astype(float).round(4)
+        for coluna in ("atrasos", "dias_presentes", "dias_esperados", "faltas", "funcionarios"):
+            if coluna in df:
+                df[coluna] = df[coluna].astype("int64")
+        objetos = df.astype(object)
+        return objetos.where(objetos.notna(), None).to_dict("records")
+
+    async def resumo(
+        self,
+        data_inicio: str,
+        data_fim: str,
+        setor: Optional[str] = None,
+        jornada_horas: float = 8.0,
+        hora_limite: str = "08:00",
+        tolerancia_minutos: int = 0
+    ) -> Dict[str, Any]:
+        """Carrega o período e calcula todas as métricas"""
+        funcionarios, registros = await self.carregar(data_inicio, data_fim, setor)
+        return await asyncio.to_thread(
+            self.calcular,
+            funcionarios, registros, data_inicio, data_fim,
+            jornada_horas=jornada_horas,
+            hora_limite=hora_limite,
+            tolerancia_minutos=tolerancia_minutos
+        )
+
+    @staticmethod
+    def recortar(resultado: Dict[str, Any], metrica: str, campos: Tuple[str, ...]) -> Dict[str, Any]:
+        """
+        Ranking de uma métrica: só os campos dela, em ordem decrescente
+
+        Recorta um resumo já calculado: as três métricas são computadas juntas
+        sobre o período e as das outras são descartadas aqui. Um ranking custa
+        o mesmo que GET /analises/frequencia.
+        """
+        base = ("funcionario_id", "nome", "setor")
+        por_funcionario = sorted(
+            ({campo: linha[campo] for campo in base + campos} for linha in resultado["por_funcionario"]),
+            key=lambda linha: linha[metrica],
+            reverse=True
+        )
+        por_setor = sorted(
+            ({campo: linha[campo] for campo in ("setor", "funcionarios") + campos} for linha in resultado["por_setor"]),
+            key=lambda linha: linha[metrica],
+            reverse=True
+        )
+        return {
+            "periodo": resultado["periodo"],
+            "parametros": resultado["parametros"],
+            "por_funcionario": por_funcionario,
+            "por_setor": por_setor,
+            "gerado_em": resultado["gerado_em"]
+        }
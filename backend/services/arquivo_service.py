@@ -0,0 +1,176 @@
+"""
+Arquivamento de funcionários inativos há muito tempo
+
+Move funcionários desativados há mais de N dias (e sem registros de
+frequência nesse intervalo), junto com todos os registros deles, para as
+coleções frias `funcionarios_arquivo`, `<coleção da frequência>_arquivo`
+(`frequencia_arquivo` ou `frequencia_mensal_arquivo`), `alimentacao_arquivo`
+e `banco_horas_arquivo`. As coleções quentes e seus índices ficam com o
+quadro que de fato é consultado.
+
+O saldo do banco de horas vai junto com a frequência: a reconstrução só lê a
+frequência quente e removeria saldos de quem não tem registros nela. Cada
+lote roda como uma escrita do banco de horas, sem intercalar com a
+reconstrução.
+
+A cópia é feita com upsert por ID antes da remoção, então uma execução
+interrompida pode ser repetida sem duplicar nada. Relatórios de períodos
+antigos não enxergam os registros arquivados; use a restauração para
+trazer um funcionário de volta.
+
+Desabilitado por padrão: ative com ARQUIVAMENTO_HABILITADO=true.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReplaceOne
+from core.versoes import versoes_colecoes
+from services.banco_horas_service import BancoHorasService
+from services.frequencia_armazenamento import armazenamento_frequencia
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+ARQUIVAMENTO_HABILITADO = os.environ.get("ARQUIVAMENTO_HABILITADO", "false").lower() == "true"
+ARQUIVAMENTO_INATIVOS_DIAS = int(os.environ.get("ARQUIVAMENTO_INATIVOS_DIAS", "365"))
+LOTE_FUNCIONARIOS = 100
+LOTE_REGISTROS = 5000
+
+
+class ArquivoService:
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.frequencia = armazenamento_frequencia(db)
+        self.frequencia_arquivo = f"{self.frequencia.nome_colecao}_arquivo"
+        self.banco_horas = BancoHorasService(db)
+
+    async def candidatos(self, inativos_ha_dias: int = ARQUIVAMENTO_INATIVOS_DIAS) -> List[str]:
+        """IDs dos funcionários inativos há mais de N dias e sem registros recentes"""
+        limite = datetime.utcnow() - timedelta(days=inativos_ha_dias)
+        cursor = self.db.funcionarios.find(
+            {
+                "ativo": False,
+                # Desativados antes do controle da data contam pela frequência
+                "$or": [{"desativado_em": {"$lt": limite}}, {"desativado_em": None}]
+            },
+            {"_id": 0, "id": 1}
+        )
+        ids = [doc["id"] async for doc in cursor]
+        if not ids:
+            return []
+        recentes = await self.frequencia.funcionarios_com_registros(ids, limite.strftime("%Y-%m-%d"))
+        return [funcionario_id for funcionario_id in ids if funcionario_id not in recentes]
+
+    async def _mover(
+        self,
+        origem: str,
+        destino: str,
+        filtro: Dict[str, Any],
+        extras: Optional[Dict[str, Any]] = None,
+        chave: str = "id"
+    ) -> int:
+        """Copia (upsert pela chave) e remove os documentos do filtro, em lotes"""
+        movidos = 0
+        projecao = None if chave == "_id" else {"_id": 0}
+        while True:
+            lote = await self.db[origem].find(filtro, projecao).to_list(length=LOTE_REGISTROS)
+            if not lote:
+                return movidos
+            documentos = []
+            for doc in lote:
+                doc.pop("arquivado_em", None)
+                documentos.append({**doc, **(extras or {})})
+            await self.db[destino].bulk_write(
+                [ReplaceOne({chave: doc[chave]}, doc, upsert=True) for doc in documentos],
+                ordered=False
+            )
+            chaves = [doc[chave] for doc in lote]
+            resultado = await self.db[origem].delete_many({chave: {"$in": chaves}})
+            movidos += resultado.deleted_count
+
+    async def arquivar(
+        self,
+        inativos_ha_dias: int = ARQUIVAMENTO_INATIVOS_DIAS,
+        simular: bool = False
+    ) -> Dict[str, Any]:
+        """Arquiva os candidatos; com simular=True só conta o que seria movido"""
+        ids = await self.candidatos(inativos_ha_dias)
+        if simular or not ids:
+            registros = await self.frequencia.contar(ids) if ids else 0
+            alimentacao = await self.db.alimentacao.count_documents({"funcionario_id": {"$in": ids}}) if ids else 0
+            return {
+                "simulacao": simular,
+                "funcionarios": len(ids),
+                "registros_frequencia": registros,
+                "registros_alimentacao": alimentacao
+            }
+
+        agora = datetime.utcnow()
+        funcionarios = registros = alimentacao = 0
+        for i in range(0, len(ids), LOTE_FUNCIONARIOS):
+            lote = ids[i:i + LOTE_FUNCIONARIOS]
+            filtro = {"funcionario_id": {"$in": lote}}
+            async with self.banco_horas.escrita():
+                # Registros primeiro: se parar no meio, o funcionário continua na
+                # coleção quente e a próxima execução termina o trabalho
+                registros += await self.frequencia.contar(lote)
+                await self._mover(
+                    self.frequencia.nome_colecao, self.frequencia_arquivo,
+                    filtro, {"arquivado_em": agora},
+                    chave=self.frequencia.chave
+                )
+                alimentacao += await self._mover("alimentacao", "alimentacao_arquivo", filtro, {"arquivado_em": agora})
+                await self._mover(
+                    "banco_horas", "banco_horas_arquivo",
+                    filtro, {"arquivado_em": agora},
+                    chave="funcionario_id"
+                )
+                funcionarios += await self._mover(
+                    "funcionarios", "funcionarios_arquivo",
+                    {"id": {"$in": lote}, "ativo": False},
+                    {"arquivado_em": agora}
+                )
+
+        await versoes_colecoes.incrementar("funcionarios")
+        await versoes_colecoes.incrementar("frequencia")
+        await versoes_colecoes.incrementar("alimentacao")
+        logger.info(
+            "Arquivados %s funcionários, %s registros de frequência e %s de alimentação",
+            funcionarios, registros, alimentacao
+        )
+        return {
+            "simulacao": False,
+            "funcionarios": funcionarios,
+            "registros_frequencia": registros,
+            "registros_alimentacao": alimentacao
+        }
+
+    async def restaurar(self, funcionario_id: str) -> Dict[str, Any]:
+        """Traz um funcionário arquivado e seus registros de volta (continua inativo)"""
+        if not await self.db.funcionarios_arquivo.find_one({"id": funcionario_id}, {"_id": 1}):
+            raise ValueError(f"Funcionário {funcionario_id} não está arquivado")
+
+        # Como no arquivamento: registros primeiro e o funcionário por último,
+        # para que uma restauração interrompida possa ser repetida
+        filtro = {"funcionario_id": funcionario_id}
+        async with self.banco_horas.escrita():
+            await self._mover(
+                self.frequencia_arquivo, self.frequencia.nome_colecao,
+                filtro,
+                chave=self.frequencia.chave
+            )
+            alimentacao = await self._mover("alimentacao_arquivo", "alimentacao", filtro)
+            await self._mover("banco_horas_arquivo", "banco_horas", filtro, chave="funcionario_id")
+            await self._mover("funcionarios_arquivo", "funcionarios", {"id": funcionario_id})
+        registros = await self.frequencia.contar(funcionario_id)
+
+        await versoes_colecoes.incrementar("funcionarios")
+        await versoes_colecoes.incrementar("frequencia")
+        await versoes_colecoes.incrementar("alimentacao")
+        logger.info("Funcionário restaurado do arquivo: %s (%s registros)", funcionario_id, registros)
+        return {
+            "funcionario_id": funcionario_id,
+            "registros_frequencia": registros,
+            "registros_alimentacao": alimentacao
+        }
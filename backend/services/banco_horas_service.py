@@ -0,0 +1,295 @@
+"""
+Banco de horas: saldo corrente por funcionário
+
+Cada registro de frequência gera um crédito (ou débito) em minutos:
+- dia útil: (horas trabalhadas - jornada) x multiplicador de dia útil
+- feriado e fim de semana: todas as horas x multiplicador do tipo do dia
+
+O saldo fica em um documento por funcionário na coleção `banco_horas` e é
+atualizado com $inc a cada criação, alteração ou remoção de registro, então
+consultar o saldo é uma leitura por chave. Os valores são inteiros em
+minutos para que desfazer um crédito (update/delete) volte exatamente ao
+saldo anterior. Registros sem total de horas (só entrada) não movimentam o
+banco.
+
+Ao mudar jornada ou multiplicadores, rode a reconstrução a partir do
+histórico (POST /api/banco-horas/reconstruir).
+
+A reconstrução e as escritas incrementais se excluem pela coleção
+`banco_horas_controle`: cada escrita de frequência registra uma marca curta e
+depois confere se há reconstrução; a reconstrução grava o seu lease e depois
+espera as marcas acabarem. Ou a escrita vê a reconstrução (e é recusada com
+ReconstrucaoEmAndamento), ou a reconstrução espera a escrita terminar: nenhum
+$inc se perde nem é contado duas vezes durante a leitura do histórico.
+"""
+from contextlib import asynccontextmanager
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from services.calendario_service import TIPOS_DIA
+from services.frequencia_armazenamento import armazenamento_frequencia
+from typing import Any, AsyncIterator, Dict, Iterable, List, Mapping, Optional
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 5000
+# Duração máxima de uma escrita (registro + crédito) e de uma reconstrução;
+# marcas de processos que caíram expiram sozinhas
+ESCRITA_LEASE_SEGUNDOS = 60
+RECONSTRUCAO_LEASE_SEGUNDOS = int(os.environ.get("BANCO_HORAS_RECONSTRUCAO_LEASE_SEGUNDOS", "3600"))
+
+
+def _ler_multiplicadores(texto: str) -> Dict[str, float]:
+    """'util=1,feriado=2,fim_de_semana=1.5' -> dicionário por tipo de dia"""
+    multiplicadores = {"util": 1.0, "feriado": 2.0, "fim_de_semana": 1.5}
+    for item in texto.split(","):
+        tipo, _, valor = item.strip().partition("=")
+        if not tipo:
+            continue
+        if tipo not in TIPOS_DIA:
+            raise ValueError(f"Tipo de dia inválido em BANCO_HORAS_MULTIPLICADORES: '{tipo}'")
+        multiplicadores[tipo] = float(valor)
+    return multiplicadores
+
+
+JORNADA_MINUTOS = round(float(os.environ.get("BANCO_HORAS_JORNADA_HORAS", "8")) * 60)
+MULTIPLICADORES = _ler_multiplicadores(os.environ.get("BANCO_HORAS_MULTIPLICADORES", ""))
+
+
+def credito_minutos(
+    registro: Mapping[str, Any],
+    jornada_minutos: int = JORNADA_MINUTOS,
+    multiplicadores: Mapping[str, float] = MULTIPLICADORES
+) -> int:
+    """Crédito (positivo) ou débito (negativo) de um registro, em minutos"""
+    total_horas = registro.get("total_horas")
+    if total_horas is None:
+        return 0
+    minutos = round(float(total_horas) * 60)
+    tipo = registro.get("tipo_dia") or "util"
+    if tipo == "util":
+        return round((minutos - jornada_minutos) * multiplicadores["util"])
+    return round(minutos * multiplicadores.get(tipo, 1.0))
+
+
+class ReconstrucaoEmAndamento(Exception):
+    """O banco de horas está sendo reconstruído"""
+
+    # Segundos sugeridos ao cliente (Retry-After) antes de tentar de novo
+    retry_after = 30
+
+
+class BancoHorasService:
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.collection = db.banco_horas
+        self.controle = db.banco_horas_controle
+
+    # --- Exclusão entre escritas e reconstrução ---
+
+    @asynccontextmanager
+    async def escrita(self) -> AsyncIterator[None]:
+        """
+        Envolve a gravação de registros de frequência e o crédito deles
+
+        Recusa com ReconstrucaoEmAndamento enquanto uma reconstrução roda.
+        """
+        agora = datetime.utcnow()
+        marca = str(uuid.uuid4())
+        await self.controle.insert_one({
+            "_id": marca,
+            "tipo": "escrita",
+            "expira_em": agora + timedelta(seconds=ESCRITA_LEASE_SEGUNDOS)
+        })
+        try:
+            # Conferido depois da marca: a reconstrução faz o inverso
+            if await self.controle.find_one({"_id": "reconstrucao", "expira_em": {"$gt": agora}}, {"_id": 1}):
+                raise ReconstrucaoEmAndamento("Banco de horas em reconstrução. Tente novamente em instantes")
+            yield
+        finally:
+            await self.controle.delete_one({"_id": marca})
+
+    async def _adquirir_reconstrucao(self) -> None:
+        agora = datetime.utcnow()
+        lease = {"expira_em": agora + timedelta(seconds=RECONSTRUCAO_LEASE_SEGUNDOS), "iniciado_em": agora}
+        try:
+            await self.controle.insert_one({"_id": "reconstrucao", "tipo": "reconstrucao", **lease})
+        except DuplicateKeyError:
+            # Lease vencido de uma reconstrução interrompida pode ser assumido
+            assumido = await self.controle.find_one_and_update(
+                {"_id": "reconstrucao", "expira_em": {"$lte": agora}},
+                {"$set": lease}
+            )
+            if assumido is None:
+                raise ReconstrucaoEmAndamento("Já existe uma reconstrução do banco de horas em andamento")
+
+    async def _aguardar_escritas(self) -> None:
+        """Espera as escritas iniciadas antes do lease (no máximo até as marcas expirarem)"""
+        while await self.controle.count_documents(
+            {"tipo": "escrita", "expira_em": {"$gt": datetime.utcnow()}}
+        ):
+            await asyncio.sleep(0.1)
+
+    # --- Atualização incremental ---
+
+    @staticmethod
+    def _movimento(registro: Optional[Mapping[str, Any]], sinal: int) -> Dict[str, int]:
+        """Incrementos do documento de saldo para um registro (sinal -1 desfaz)"""
+        if not registro or registro.get("total_horas") is None:
+            return {}
+        credito = credito_minutos(registro) * sinal
+        tipo = registro.get("tipo_dia") or "util"
+        return {
+            "saldo_minutos": credito,
+            f"por_tipo.{tipo}": credito,
+            "registros": sinal
+        }
+
+    async def _aplicar(self, funcionario_id: str, incrementos: Dict[str, int]) -> None:
+        incrementos = {campo: valor for campo, valor in incrementos.items() if valor}
+        if not incrementos:
+            return
+        await self.collection.update_one(
+            {"funcionario_id": funcionario_id},
+            {"$inc": incrementos, "$set": {"atualizado_em": datetime.utcnow()}},
+            upsert=True
+        )
+
+    async def registrar(self, registro: Mapping[str, Any]) -> None:
+        """Credita um registro novo"""
+        await self._aplicar(registro["funcionario_id"], self._movimento(registro, 1))
+
+    async def estornar(self, registro: Mapping[str, Any]) -> None:
+        """Desfaz o crédito de um registro removido"""
+        await self._aplicar(registro["funcionario_id"], self._movimento(registro, -1))
+
+    async def ajustar(self, anterior: Mapping[str, Any], atual: Mapping[str, Any]) -> None:
+        """Aplica só a diferença entre a versão anterior e a atual de um registro"""
+        incrementos = self._movimento(anterior, -1)
+        for campo, valor in self._movimento(atual, 1).items():
+            incrementos[campo] = incrementos.get(campo, 0) + valor
+        await self._aplicar(atual["funcionario_id"], incrementos)
+
+    async def registrar_lote(self, registros: Iterable[Mapping[str, Any]]) -> None:
+        """Credita vários registros novos com um $inc por funcionário (importações)"""
+        por_funcionario: Dict[str, Dict[str, int]] = {}
+        for registro in registros:
+            acumulado = por_funcionario.setdefault(registro["funcionario_id"], {})
+            for campo, valor in self._movimento(registro, 1).items():
+                acumulado[campo] = acumulado.get(campo, 0) + valor
+
+        agora = datetime.utcnow()
+        operacoes = [
+            UpdateOne(
+                {"funcionario_id": funcionario_id},
+                {"$inc": incrementos, "$set": {"atualizado_em": agora}},
+                upsert=True
+            )
+            for funcionario_id, incrementos in por_funcionario.items()
+            if any(incrementos.values())
+        ]
+        if operacoes:
+            await self.collection.bulk_write(operacoes, ordered=False)
+
+    # --- Consultas ---
+
+    @staticmethod
+    def _saldo(funcionario_id: str, doc: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        doc = doc or {}
+        saldo = doc.get("saldo_minutos", 0)
+        por_tipo = doc.get("por_tipo", {})
+        return {
+            "funcionario_id": funcionario_id,
+            "saldo_minutos": saldo,
+            "saldo_horas": round(saldo / 60, 2),
+            "por_tipo": {tipo: round(por_tipo.get(tipo, 0) / 60, 2) for tipo in TIPOS_DIA},
+            "registros": doc.get("registros", 0),
+            "atualizado_em": doc.get("atualizado_em")
+        }
+
+    async def get_saldo(self, funcionario_id: str) -> Dict[str, Any]:
+        """Saldo de um funcionário (leitura única pelo índice de funcionario_id)"""
+        doc = await self.collection.find_one({"funcionario_id": funcionario_id}, {"_id": 0})
+        return self._saldo(funcionario_id, doc)
+
+    async def get_saldos(self, funcionario_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Saldos de vários funcionários (ou de todos)"""
+        query: Dict[str, Any] = {}
+        if funcionario_ids is not None:
+            query["funcionario_id"] = {"$in": funcionario_ids}
+        cursor = self.collection.find(query, {"_id": 0}).sort("funcionario_id", 1)
+        return [self._saldo(doc["funcionario_id"], doc) async for doc in cursor]
+
+    # --- Reconstrução ---
+
+    async def reconstruir(self) -> Dict[str, Any]:
+        """
+        Recalcula todos os saldos a partir do histórico de frequência
+
+        Percorre a coleção em lotes, só com os campos necessários, acumulando
+        um saldo por funcionário (memória proporcional ao número de
+        funcionários, não de registros). Os saldos são regravados em bulk e
+        saldos de funcionários sem registros são removidos.
+
+        Enquanto roda, as escritas de frequência são recusadas (ver escrita).
+        """
+        await self._adquirir_reconstrucao()
+        try:
+            await self._aguardar_escritas()
+            return await self._reconstruir()
+        finally:
+            await self.controle.delete_one({"_id": "reconstrucao"})
+
+    async def _reconstruir(self) -> Dict[str, Any]:
+        inicio = datetime.utcnow()
+        saldos: Dict[str, Dict[str, Any]] = {}
+        total = 0
+
+        lotes = armazenamento_frequencia(self.db).blocos(
+            campos=("funcionario_id", "tipo_dia", "total_horas"),
+            tamanho=TAMANHO_LOTE,
+            nativo=True
+        )
+        async for lote in lotes:
+            total += len(lote)
+            for registro in lote:
+                movimento = self._movimento(registro, 1)
+                if not movimento:
+                    continue
+                saldo = saldos.setdefault(registro["funcionario_id"], {
+                    "saldo_minutos": 0,
+                    "por_tipo": {},
+                    "registros": 0
+                })
+                tipo = registro.get("tipo_dia") or "util"
+                saldo["saldo_minutos"] += movimento["saldo_minutos"]
+                saldo["por_tipo"][tipo] = saldo["por_tipo"].get(tipo, 0) + movimento["saldo_minutos"]
+                saldo["registros"] += 1
+
+        agora = datetime.utcnow()
+        operacoes = [
+            ReplaceOne(
+                {"funcionario_id": funcionario_id},
+                {"funcionario_id": funcionario_id, **saldo, "atualizado_em": agora},
+                upsert=True
+            )
+            for funcionario_id, saldo in saldos.items()
+        ]
+        for i in range(0, len(operacoes), TAMANHO_LOTE):
+            await self.collection.bulk_write(operacoes[i:i + TAMANHO_LOTE], ordered=False)
+        removidos = await self.collection.delete_many({"funcionario_id": {"$nin": list(saldos)}})
+
+        segundos = (datetime.utcnow() - inicio).total_seconds()
+        logger.info("Banco de horas reconstruído: %s registros, %s funcionários em %.1fs", total, len(saldos), segundos)
+        return {
+            "message": "Banco de horas reconstruído",
+            "registros_processados": total,
+            "funcionarios": len(saldos),
+            "saldos_removidos": removidos.deleted_count,
+            "segundos": round(segundos, 2)
+        }
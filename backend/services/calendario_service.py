@@ -0,0 +1,252 @@
+"""
+Calendário de trabalho: feriados nacionais e municipais, dias úteis
+
+Cada ano é calculado uma única vez em tabelas indexadas pelo dia do ano:
+o tipo do dia (útil, fim de semana, feriado) e a contagem acumulada de dias
+úteis. A classificação de uma data e a contagem de dias úteis de um período
+viram leituras diretas nessas tabelas. Elas são só da biblioteca padrão
+(bytes e lista): registrar um ponto não carrega o numpy, que fica para as
+versões vetorizadas (classificar, dias_uteis_vetorizado).
+
+Feriados municipais vêm da variável FERIADOS_MUNICIPAIS, entradas separadas
+por ";" no formato `data=Nome`, onde data pode ser:
+- `MM-DD` para feriados fixos (ex. `12-08=Imaculada Conceição`)
+- `YYYY-MM-DD` para um ano específico
+- `pascoa+N` / `pascoa-N` para datas móveis (ex. `pascoa+60=Corpus Christi`)
+"""
+from __future__ import annotations
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple, Union
+import logging
+import os
+import threading
+
+from core.modulos import modulo_tardio
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+else:
+    np = modulo_tardio("numpy")
+    pd = modulo_tardio("pandas")
+
+logger = logging.getLogger(__name__)
+
+# Códigos dos arrays por ano; a ordem segue o Literal de RegistroFrequencia.tipo_dia
+TIPOS_DIA = ("util", "feriado", "fim_de_semana")
+UTIL, FERIADO, FIM_DE_SEMANA = range(3)
+
+FERIADOS_FIXOS = (
+    ("01-01", "Confraternização Universal"),
+    ("04-21", "Tiradentes"),
+    ("05-01", "Dia do Trabalho"),
+    ("09-07", "Independência do Brasil"),
+    ("10-12", "Nossa Senhora Aparecida"),
+    ("11-02", "Finados"),
+    ("11-15", "Proclamação da República"),
+    ("12-25", "Natal"),
+)
+# Dia Nacional de Zumbi e da Consciência Negra (Lei 14.759/2023)
+CONSCIENCIA_NEGRA_DESDE = 2024
+
+Data = Union[date, datetime, str]
+
+
+def calcular_pascoa(ano: int) -> date:
+    """Domingo de Páscoa (algoritmo de Meeus/Jones/Butcher, calendário gregoriano)"""
+    a = ano % 19
+    b, c = divmod(ano, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return date(ano, mes, dia + 1)
+
+
+def _como_data(valor: Data) -> date:
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.strptime(str(valor)[:10], "%Y-%m-%d").date()
+
+
+def _ler_feriados_municipais(texto: str) -> List[Tuple[str, str]]:
+    """Interpreta FERIADOS_MUNICIPAIS em uma lista de (regra, nome)"""
+    feriados = []
+    for entrada in texto.split(";"):
+        entrada = entrada.strip()
+        if not entrada:
+            continue
+        regra, _, nome = entrada.partition("=")
+        feriados.append((regra.strip().lower(), nome.strip() or "Feriado municipal"))
+    return feriados
+
+
+class CalendarioService:
+    def __init__(self, feriados_municipais: Iterable[Tuple[str, str]] = ()):
+        self.feriados_municipais = list(feriados_municipais)
+        self._tipos: Dict[int, bytes] = {}
+        self._acumulado: Dict[int, List[int]] = {}
+        self._nomes: Dict[int, Dict[date, Tuple[str, str]]] = {}
+        self._lock = threading.Lock()
+        for regra, _ in self.feriados_municipais:
+            # Valida a configuração já na inicialização
+            self._data_da_regra(regra, 2000)
+
+    @classmethod
+    def from_env(cls) -> "CalendarioService":
+        return cls(_ler_feriados_municipais(os.environ.get("FERIADOS_MUNICIPAIS", "")))
+
+    # --- Pré-cálculo por ano ---
+
+    @staticmethod
+    def _data_da_regra(regra: str, ano: int) -> Optional[date]:
+        """Data da regra no ano, ou None se ela é de outro ano"""
+        try:
+            if regra.startswith("pascoa"):
+                deslocamento = int(regra[len("pascoa"):] or 0)
+                return calcular_pascoa(ano) + timedelta(days=deslocamento)
+            if len(regra) == 10:
+                data = datetime.strptime(regra, "%Y-%m-%d").date()
+                return data if data.year == ano else None
+            return datetime.strptime(f"{ano}-{regra}", "%Y-%m-%d").date()
+        except ValueError:
+            raise ValueError(f"Feriado municipal inválido: '{regra}'")
+
+    def _feriados_do_ano(self, ano: int) -> Dict[date, Tuple[str, str]]:
+        feriados: Dict[date, Tuple[str, str]] = {}
+        for dia_mes, nome in FERIADOS_FIXOS:
+            feriados[date.fromisoformat(f"{ano}-{dia_mes}")] = (nome, "nacional")
+        if ano >= CONSCIENCIA_NEGRA_DESDE:
+            feriados[date(ano, 11, 20)] = ("Dia Nacional de Zumbi e da Consciência Negra", "nacional")
+        feriados[calcular_pascoa(ano) - timedelta(days=2)] = ("Sexta-feira Santa", "nacional")
+
+        for regra, nome in self.feriados_municipais:
+            data = self._data_da_regra(regra, ano)
+            if data is not None and data.year == ano:
+                feriados.setdefault(data, (nome, "municipal"))
+        return feriados
+
+    def _ano(self, ano: int) -> bytes:
+        """Tipos dos dias do ano (índice = dia do ano - 1), calculados uma vez"""
+        tipos = self._tipos.get(ano)
+        if tipos is not None:
+            return tipos
+
+        with self._lock:
+            if ano in self._tipos:
+                return self._tipos[ano]
+            inicio = date(ano, 1, 1)
+            total_dias = (date(ano + 1, 1, 1) - inicio).days
+            # weekday(): 0 = segunda ... 5, 6 = sábado, domingo
+            primeiro = inicio.weekday()
+            codigos = bytearray(
+                FIM_DE_SEMANA if (primeiro + indice) % 7 >= 5 else UTIL
+                for indice in range(total_dias)
+            )
+
+            feriados = self._feriados_do_ano(ano)
+            for data in feriados:
+                codigos[(data - inicio).days] = FERIADO
+
+            tipos = bytes(codigos)
+            self._nomes[ano] = feriados
+            self._acumulado[ano] = list(accumulate((codigo == UTIL for codigo in tipos), initial=0))
+            self._tipos[ano] = tipos
+            return tipos
+
+    # --- Consultas ---
+
+    def tipo_dia(self, data: Data) -> str:
+        """'util', 'feriado' ou 'fim_de_semana' para a data"""
+        dia = _como_data(data)
+        return TIPOS_DIA[self._ano(dia.year)[dia.timetuple().tm_yday - 1]]
+
+    def eh_dia_util(self, data: Data) -> bool:
+        return self.tipo_dia(data) == "util"
+
+    def feriados(self, ano: int) -> List[Dict[str, str]]:
+        """Feriados do ano em ordem cronológica"""
+        self._ano(ano)
+        return [
+            {"data": data.isoformat(), "nome": nome, "abrangencia": abrangencia}
+            for data, (nome, abrangencia) in sorted(self._nomes[ano].items())
+        ]
+
+    def feriados_no_periodo(self, data_inicio: Data, data_fim: Data) -> List[date]:
+        """Datas de feriado entre as duas datas (inclusivo)"""
+        inicio, fim = _como_data(data_inicio), _como_data(data_fim)
+        datas = []
+        for ano in range(inicio.year, fim.year + 1):
+            self._ano(ano)
+            datas.extend(d for d in self._nomes[ano] if inicio <= d <= fim)
+        return sorted(datas)
+
+    def dias_uteis(self, data_inicio: Data, data_fim: Data) -> int:
+        """Dias úteis entre as duas datas (inclusivo), pelas somas acumuladas de cada ano"""
+        inicio, fim = _como_data(data_inicio), _como_data(data_fim)
+        if fim < inicio:
+            return 0
+        total = 0
+        for ano in range(inicio.year, fim.year + 1):
+            self._ano(ano)
+            acumulado = self._acumulado[ano]
+            primeiro = inicio.timetuple().tm_yday - 1 if ano == inicio.year else 0
+            ultimo = fim.timetuple().tm_yday if ano == fim.year else len(acumulado) - 1
+            total += acumulado[ultimo] - acumulado[primeiro]
+        return total
+
+    def classificar(self, datas: pd.Series) -> pd.Series:
+        """
+        Tipo do dia de cada data, de forma vetorizada
+
+        Aceita datas em texto (YYYY-MM-DD) ou datetime; datas inválidas
+        ficam como NA.
+        """
+        convertidas = pd.to_datetime(datas.astype("string").str.slice(0, 10), errors="coerce", format="%Y-%m-%d")
+        codigos = np.full(len(convertidas), -1, dtype=np.int8)
+        validas = convertidas.notna().to_numpy()
+        if validas.any():
+            anos = convertidas.dt.year.to_numpy()
+            dia_do_ano = convertidas.dt.dayofyear.to_numpy()
+            for ano in np.unique(anos[validas]).astype(int):
+                mascara = validas & (anos == ano)
+                tipos = np.frombuffer(self._ano(ano), dtype=np.int8)
+                codigos[mascara] = tipos[dia_do_ano[mascara].astype(int) - 1]
+        return pd.Series(
+            pd.Categorical.from_codes(codigos, categories=list(TIPOS_DIA)),
+            index=datas.index
+        )
+
+    def dias_uteis_vetorizado(self, inicios: pd.Series, fins: pd.Series) -> np.ndarray:
+        """
+        Dias úteis (inclusivo) para vários períodos de uma vez
+
+        Usa np.busday_count com os feriados dos anos envolvidos, sem laço
+        por período.
+        """
+        inicio = pd.to_datetime(inicios).to_numpy().astype("datetime64[D]")
+        fim = pd.to_datetime(fins).to_numpy().astype("datetime64[D]") + np.timedelta64(1, "D")
+        if not len(inicio):
+            return np.zeros(0, dtype=np.int64)
+        primeiro_ano = int(str(inicio.min())[:4])
+        ultimo_ano = int(str(fim.max())[:4])
+        feriados = np.array(
+            [d for ano in range(primeiro_ano, ultimo_ano + 1) for d in self._feriados_ano(ano)],
+            dtype="datetime64[D]"
+        )
+        contagem = np.busday_count(inicio, fim, holidays=feriados)
+        return np.where(fim > inicio, contagem, 0)
+
+    def _feriados_ano(self, ano: int) -> List[date]:
+        self._ano(ano)
+        return list(self._nomes[ano])
+
+
+calendario = CalendarioService.from_env()
@@ -1,11 +1,30 @@
-import pandas as pd
+from __future__ import annotations
+
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any, BinaryIO, Iterator, Optional
 from io import BytesIO
 import logging
+import os
+
+from core.modulos import modulo_tardio
+
+if TYPE_CHECKING:
+    import pandas as pd
+else:
+    pd = modulo_tardio("pandas")
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:  # dependência opcional
+    CalamineWorkbook = None
 
 logger = logging.getLogger(__name__)
 
+# Engine de leitura de .xlsx: "openpyxl" (read_only, memória proporcional ao
+# lote) ou "calamine" (mais rápido, exige python-calamine instalado)
+EXCEL_ENGINE = os.environ.get("EXCEL_ENGINE", "openpyxl")
+TAMANHO_LOTE_LEITURA = 1000
+
 
 class ExcelService:
     """Serviço para importação e exportação de dados em Excel"""
@@ -62,62 +81,107 @@ class ExcelService:
                     worksheet.column_dimensions[column_letter].width = adjusted_width
             
             output.seek(0)
-            logger.info(f"Exportados {len(funcionarios)} funcionários para Excel")
+            logger.info("Exportados %s funcionários para Excel", len(funcionarios))
             return output
             
         except Exception as e:
-            logger.error(f"Erro ao exportar funcionários: {e}")
+            logger.error("Erro ao exportar funcionários: %s", e)
             raise ValueError(f"Erro ao gerar arquivo Excel: {str(e)}")
     
     @staticmethod
-    def import_funcionarios_from_excel(file_content: bytes) -> List[Dict[str, Any]]:
+    def ler_em_lotes(
+        arquivo: BinaryIO,
+        nome_arquivo: str,
+        planilha: Optional[str] = None,
+        tamanho_lote: int = TAMANHO_LOTE_LEITURA
+    ) -> Iterator[pd.DataFrame]:
         """
-        Importa funcionários de arquivo Excel
+        Lê uma planilha (.xlsx, .xls ou .csv) em lotes de linhas
+        
+        Cada lote é um DataFrame cujo índice é o número da linha na planilha
+        (cabeçalho na linha 1). Ao menos um lote é produzido, mesmo vazio,
+        para que as colunas possam ser validadas.
         
         Args:
-            file_content: Conteúdo do arquivo Excel em bytes
-            
-        Returns:
-            List[Dict]: Lista de funcionários importados
+            arquivo: Arquivo aberto (ex.: o SpooledTemporaryFile do upload)
+            nome_arquivo: Nome original, usado para identificar o formato
+            planilha: Nome da aba; por padrão a primeira
+            tamanho_lote: Linhas por lote
         """
+        nome = nome_arquivo.lower()
+        if nome.endswith('.csv'):
+            linhas = pd.read_csv(arquivo, chunksize=tamanho_lote)
+            inicio = 2
+            for lote in linhas:
+                lote.index = range(inicio, inicio + len(lote))
+                inicio += len(lote)
+                yield lote
+            return
+        
+        if nome.endswith('.xls'):
+            # Formato binário antigo: sem leitura em streaming
+            df = pd.read_excel(arquivo, sheet_name=planilha or 0)
+            df.index = range(2, len(df) + 2)
+            for inicio in range(0, max(len(df), 1), tamanho_lote):
+                yield df.iloc[inicio:inicio + tamanho_lote]
+            return
+        
+        if EXCEL_ENGINE == 'calamine' and CalamineWorkbook is not None:
+            linhas = ExcelService._linhas_calamine(arquivo, planilha)
+        else:
+            linhas = ExcelService._linhas_openpyxl(arquivo, planilha)
+        
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            raise ValueError("Planilha vazia")
+        colunas = [str(c).strip() if c is not None else '' for c in cabecalho]
+        
+        lote: List[tuple] = []
+        inicio = 2
+        produziu = False
+        for numero, valores in enumerate(linhas, start=2):
+            # O modo read_only devolve linhas em branco no fim da planilha
+            if all(v is None or v == '' for v in valores):
+                continue
+            if not lote:
+                inicio = numero
+            lote.append(tuple(valores[:len(colunas)]))
+            if len(lote) >= tamanho_lote:
+                yield ExcelService._lote_dataframe(lote, colunas, inicio)
+                produziu = True
+                lote = []
+        
+        if lote or not produziu:
+            yield ExcelService._lote_dataframe(lote, colunas, inicio)
+    
+    @staticmethod
+    def _lote_dataframe(linhas: List[tuple], colunas: List[str], inicio: int) -> pd.DataFrame:
+        df = pd.DataFrame.from_records(linhas, columns=colunas) if linhas else pd.DataFrame(columns=colunas)
+        df.index = range(inicio, inicio + len(df))
+        return df
+    
+    @staticmethod
+    def _linhas_openpyxl(arquivo: BinaryIO, planilha: Optional[str]) -> Iterator[tuple]:
+        """Itera as linhas com openpyxl em modo read_only (XML lido em streaming)"""
+        from openpyxl import load_workbook
+        
+        workbook = load_workbook(arquivo, read_only=True, data_only=True)
         try:
-            # Lê Excel do buffer
-            df = pd.read_excel(BytesIO(file_content), sheet_name='Funcionários')
-            
-            # Valida colunas obrigatórias
-            required_columns = ['Nome', 'CPF', 'Cargo', 'Setor', 'Data Admissão']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            
-            if missing_columns:
-                raise ValueError(f"Colunas obrigatórias ausentes: {', '.join(missing_columns)}")
-            
-            # Converte DataFrame para lista de dicionários
-            funcionarios = []
-            for _, row in df.iterrows():
-                # Pula linhas vazias
-                if pd.isna(row['Nome']) or pd.isna(row['CPF']):
-                    continue
-                
-                funcionario = {
-                    'nome': str(row['Nome']).strip(),
-                    'cpf': str(row['CPF']).strip(),
-                    'cargo': str(row['Cargo']).strip(),
-                    'setor': str(row['Setor']).strip(),
-                    'data_admissao': row['Data Admissão'] if isinstance(row['Data Admissão'], str) 
-                                    else row['Data Admissão'].strftime('%Y-%m-%d'),
-                    'telefone': str(row.get('Telefone', '')).strip() if not pd.isna(row.get('Telefone')) else None,
-                    'email': str(row.get('Email', '')).strip() if not pd.isna(row.get('Email')) else None,
-                    'ativo': row.get('Ativo', 'Sim') == 'Sim'
-                }
-                
-                funcionarios.append(funcionario)
-            
-            logger.info(f"Importados {len(funcionarios)} funcionários do Excel")
-            return funcionarios
-            
-        except Exception as e:
-            logger.error(f"Erro ao importar funcionários: {e}")
-            raise ValueError(f"Erro ao processar arquivo Excel: {str(e)}")
+            if planilha and planilha not in workbook.sheetnames:
+                raise ValueError(f"Planilha '{planilha}' não encontrada")
+            worksheet = workbook[planilha] if planilha else workbook.worksheets[0]
+            yield from worksheet.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def _linhas_calamine(arquivo: BinaryIO, planilha: Optional[str]) -> Iterator[list]:
+        """Itera as linhas com o python-calamine (parser em Rust)"""
+        workbook = CalamineWorkbook.from_filelike(arquivo)
+        if planilha and planilha not in workbook.sheet_names:
+            raise ValueError(f"Planilha '{planilha}' não encontrada")
+        sheet = workbook.get_sheet_by_name(planilha) if planilha else workbook.get_sheet_by_index(0)
+        yield from sheet.iter_rows()
     
     @staticmethod
     def export_frequencia_to_excel(registros: List[Dict[str, Any]]) -> BytesIO:
@@ -169,9 +233,9 @@ class ExcelService:
                     worksheet.column_dimensions[column_letter].width = adjusted_width
             
             output.seek(0)
-            logger.info(f"Exportados {len(registros)} registros de frequência para Excel")
+            logger.info("Exportados %s registros de frequência para Excel", len(registros))
             return output
             
         except Exception as e:
-            logger.error(f"Erro ao exportar frequência: {e}")
+            logger.error("Erro ao exportar frequência: %s", e)
             raise ValueError(f"Erro ao gerar arquivo Excel: {str(e)}")
@@ -0,0 +1,340 @@
+"""
+Exportação consolidada: funcionários, frequência, alimentação e materiais em
+uma única planilha
+
+As quatro coleções são lidas ao mesmo tempo, em blocos, e cada bloco vai
+direto para a sua aba de um workbook write_only do openpyxl (as linhas são
+gravadas em arquivos temporários, não ficam na memória). Os totais da aba
+"Resumo" vêm de agregações no banco, disparadas junto com as leituras.
+
+Os estilos (cabeçalho, data, moeda) são NamedStyle registrados uma vez no
+workbook e compartilhados por todas as células; os cabeçalhos usam os mesmos
+nomes de coluna das importações, então cada aba pode ser reimportada.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from tempfile import SpooledTemporaryFile
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import time
+
+from core.modulos import modulo_tardio
+from services.frequencia_armazenamento import armazenamento_frequencia, data_nativa, hora_do_dia
+
+if TYPE_CHECKING:
+    import openpyxl
+else:
+    openpyxl = modulo_tardio("openpyxl")
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_BLOCO = 2000
+# Acima disso o arquivo fica em disco, não na memória
+MEMORIA_MAXIMA_BYTES = 16 * 1024 * 1024
+# Linhas de uma aba do Excel, descontado o cabeçalho
+MAX_LINHAS_ABA = 1_048_575
+
+
+@dataclass(frozen=True)
+class ColunaExportada:
+    """Coluna de uma aba: título, campo do documento, largura e estilo"""
+    titulo: str
+    campo: str
+    largura: int = 15
+    estilo: Optional[str] = None
+    converter: Optional[Callable[[Any], Any]] = None
+
+
+def _data(valor: Any) -> Any:
+    """Datas viram date do Excel (texto 'YYYY-MM-DD' ou datetime)"""
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, str) and len(valor) >= 10:
+        try:
+            return date.fromisoformat(valor[:10])
+        except ValueError:
+            return valor
+    return valor
+
+
+def _sim_nao(valor: Any) -> str:
+    return "Não" if valor is False else "Sim"
+
+
+COLUNAS_FUNCIONARIOS = (
+    ColunaExportada("ID", "id", 38),
+    ColunaExportada("Nome", "nome", 35),
+    ColunaExportada("CPF", "cpf", 16),
+    ColunaExportada("Cargo", "cargo", 22),
+    ColunaExportada("Setor", "setor", 18),
+    ColunaExportada("Data Admissão", "data_admissao", 14, "data", _data),
+    ColunaExportada("Telefone", "telefone", 16),
+    ColunaExportada("Email", "email", 30),
+    ColunaExportada("Ativo", "ativo", 8, converter=_sim_nao),
+)
+
+COLUNAS_FREQUENCIA = (
+    ColunaExportada("ID", "id", 38),
+    ColunaExportada("Funcionário ID", "funcionario_id", 38),
+    ColunaExportada("Nome", "nome", 35),
+    ColunaExportada("Data", "data", 12, "data", _data),
+    ColunaExportada("Hora Entrada", "hora_entrada", 12, converter=hora_do_dia),
+    ColunaExportada("Hora Saída", "hora_saida", 12, converter=hora_do_dia),
+    ColunaExportada("Tipo Dia", "tipo_dia", 14),
+    ColunaExportada("Total Horas", "total_horas", 12, "horas"),
+    ColunaExportada("Observação", "observacao", 40),
+)
+
+COLUNAS_ALIMENTACAO = (
+    ColunaExportada("Funcionário ID", "funcionario_id", 38),
+    ColunaExportada("Nome", "nome", 35),
+    ColunaExportada("Data", "data", 12, "data", _data),
+    ColunaExportada("Tipo Refeição", "tipo_refeicao", 16),
+    ColunaExportada("Valor Unitário", "valor_unitario", 14, "moeda"),
+    ColunaExportada("Quantidade", "quantidade", 12),
+    ColunaExportada("Fornecedor", "fornecedor", 25),
+    ColunaExportada("Total Dia", "total_dia", 14, "moeda"),
+)
+
+COLUNAS_MATERIAIS = (
+    ColunaExportada("ID", "id", 38),
+    ColunaExportada("Data", "data", 12, "data", _data),
+    ColunaExportada("Descrição", "descricao", 40),
+    ColunaExportada("Local Uso", "local_uso", 22),
+    ColunaExportada("Categoria", "categoria", 18),
+    ColunaExportada("Quantidade", "quantidade", 12),
+    ColunaExportada("Valor Unitário", "valor_unitario", 14, "moeda"),
+    ColunaExportada("Autorizado Por", "autorizado_por", 22),
+    ColunaExportada("Valor Total", "valor_total", 14, "moeda"),
+)
+
+COLUNAS_RESUMO = (
+    ColunaExportada("Conjunto", "conjunto", 16),
+    ColunaExportada("Registros", "registros", 12),
+    ColunaExportada("Funcionários", "funcionarios", 14),
+    ColunaExportada("Quantidade", "quantidade", 12),
+    ColunaExportada("Horas", "horas", 12, "horas"),
+    ColunaExportada("Valor Total", "valor", 16, "moeda"),
+)
+
+
+class PlanilhaGrandeDemais(ValueError):
+    """Uma das abas passaria do limite de linhas do Excel"""
+
+
+class ExportacaoConsolidadaService:
+    """Monta a planilha consolidada do período em uma única passada"""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.armazenamento = armazenamento_frequencia(db)
+
+    # --- Leitura ---
+
+    def _filtro_data(self, data_inicio: Optional[str], data_fim: Optional[str]) -> Dict[str, Any]:
+        """Alimentação e materiais guardam a data como texto 'YYYY-MM-DD'"""
+        if not data_inicio and not data_fim:
+            return {}
+        intervalo = {}
+        if data_inicio:
+            intervalo["$gte"] = data_inicio
+        if data_fim:
+            intervalo["$lte"] = data_fim
+        return {"data": intervalo}
+
+    async def _blocos_colecao(
+        self,
+        colecao: str,
+        filtro: Dict[str, Any],
+        tamanho: int = TAMANHO_BLOCO
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        cursor = self.db[colecao].find(filtro, {"_id": 0}, batch_size=tamanho)
+        while True:
+            bloco = await cursor.to_list(length=tamanho)
+            if not bloco:
+                return
+            yield bloco
+
+    async def _totais(
+        self,
+        colecao: str,
+        estagios: List[Dict[str, Any]],
+        quantidade: Optional[str] = None,
+        horas: Optional[str] = None,
+        valor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Registros, funcionários distintos e somas de um conjunto, pelo banco"""
+        somas = {
+            nome: {"$sum": {"$ifNull": [f"${campo}", 0]}}
+            for nome, campo in (("quantidade", quantidade), ("horas", horas), ("valor", valor))
+            if campo
+        }
+        pipeline = estagios + [
+            # Primeiro por funcionário, para contar os distintos sem montar um conjunto
+            {"$group": {"_id": "$funcionario_id", "registros": {"$sum": 1}, **somas}},
+            {"$group": {
+                "_id": None,
+                "registros": {"$sum": "$registros"},
+                "funcionarios": {"$sum": {"$cond": [{"$ifNull": ["$_id", False]}, 1, 0]}},
+                **{nome: {"$sum": f"${nome}"} for nome in somas},
+            }},
+        ]
+        resultado = await self.db[colecao].aggregate(pipeline).to_list(length=1)
+        totais = resultado[0] if resultado else {"registros": 0, "funcionarios": 0}
+        totais.pop("_id", None)
+        return {campo: round(valor, 2) if isinstance(valor, float) else valor for campo, valor in totais.items()}
+
+    async def _resumo(self, data_inicio: Optional[str], data_fim: Optional[str]) -> List[Dict[str, Any]]:
+        filtro_data = self._filtro_data(data_inicio, data_fim)
+        funcionarios, frequencia, alimentacao, materiais = await asyncio.gather(
+            self._totais("funcionarios", [{"$addFields": {"funcionario_id": "$id"}}]),
+            self._totais(
+                self.armazenamento.colecao.name,
+                self.armazenamento.estagios(data_inicio=data_inicio, data_fim=data_fim),
+                horas="total_horas"
+            ),
+            self._totais(
+                "alimentacao", [{"$match": filtro_data}],
+                quantidade="quantidade", valor="total_dia"
+            ),
+            self._totais(
+                "materiais", [{"$match": filtro_data}],
+                quantidade="quantidade", valor="valor_total"
+            ),
+        )
+        return [
+            {"conjunto": "Funcionários", **funcionarios},
+            {"conjunto": "Frequência", **frequencia},
+            {"conjunto": "Alimentação", **alimentacao},
+            {"conjunto": "Materiais", **materiais},
+        ]
+
+    # --- Escrita ---
+
+    @staticmethod
+    def _estilos(workbook: openpyxl.Workbook) -> None:
+        """Registra os estilos compartilhados (uma entrada cada no styles.xml)"""
+        from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+
+        cabecalho = NamedStyle(name="cabecalho")
+        cabecalho.font = Font(bold=True, color="FFFFFF")
+        cabecalho.fill = PatternFill("solid", fgColor="305496")
+        cabecalho.alignment = Alignment(horizontal="center", vertical="center")
+
+        data = NamedStyle(name="data", number_format="DD/MM/YYYY")
+        horas = NamedStyle(name="horas", number_format="0.00")
+        moeda = NamedStyle(name="moeda", number_format='"R$" #,##0.00')
+
+        for estilo in (cabecalho, data, horas, moeda):
+            workbook.add_named_style(estilo)
+
+    @staticmethod
+    def _aba(workbook: openpyxl.Workbook, titulo: str, colunas: Tuple[ColunaExportada, ...]):
+        """Cria a aba com larguras fixas e o cabeçalho (larguras antes das linhas, exigência do write_only)"""
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.utils import get_column_letter
+
+        aba = workbook.create_sheet(titulo)
+        aba.freeze_panes = "A2"
+        for indice, coluna in enumerate(colunas, start=1):
+            aba.column_dimensions[get_column_letter(indice)].width = coluna.largura
+
+        cabecalho = []
+        for coluna in colunas:
+            celula = WriteOnlyCell(aba, value=coluna.titulo)
+            celula.style = "cabecalho"
+            cabecalho.append(celula)
+        aba.append(cabecalho)
+        return aba
+
+    @staticmethod
+    def _escrever(aba, colunas: Tuple[ColunaExportada, ...], documentos: List[Dict[str, Any]]) -> None:
+        """Grava um bloco de documentos; só as colunas com estilo viram WriteOnlyCell"""
+        from openpyxl.cell import WriteOnlyCell
+
+        for doc in documentos:
+            linha = []
+            for coluna in colunas:
+                valor = doc.get(coluna.campo)
+                if coluna.converter is not None and valor is not None:
+                    valor = coluna.converter(valor)
+                if coluna.estilo and valor is not None and not isinstance(valor, str):
+                    celula = WriteOnlyCell(aba, value=valor)
+                    celula.style = coluna.estilo
+                    valor = celula
+                linha.append(valor)
+            aba.append(linha)
+
+    async def exportar(
+        self,
+        data_inicio: Optional[str] = None,
+        data_fim: Optional[str] = None
+    ) -> SpooledTemporaryFile:
+        """
+        Gera a planilha consolidada do período
+
+        O período filtra frequência, alimentação e materiais; funcionários
+        saem todos. Retorna o arquivo .xlsx posicionado no início.
+        """
+        # Período inválido falha antes de qualquer leitura (ValueError -> 400)
+        data_nativa(data_inicio), data_nativa(data_fim)
+
+        inicio = time.perf_counter()
+        workbook = openpyxl.Workbook(write_only=True)
+        self._estilos(workbook)
+
+        # A aba de resumo é a primeira, mas só é preenchida no fim
+        resumo = self._aba(workbook, "Resumo", COLUNAS_RESUMO)
+        filtro_data = self._filtro_data(data_inicio, data_fim)
+        conjuntos = (
+            ("Funcionários", COLUNAS_FUNCIONARIOS, self._blocos_colecao("funcionarios", {})),
+            ("Frequência", COLUNAS_FREQUENCIA, self.armazenamento.blocos(
+                data_inicio=data_inicio, data_fim=data_fim, tamanho=TAMANHO_BLOCO, nativo=True
+            )),
+            ("Alimentação", COLUNAS_ALIMENTACAO, self._blocos_colecao("alimentacao", filtro_data)),
+            ("Materiais", COLUNAS_MATERIAIS, self._blocos_colecao("materiais", filtro_data)),
+        )
+
+        # O workbook não é thread-safe: um bloco por vez é gravado fora do
+        # event loop, enquanto as outras leituras seguem
+        trava = asyncio.Lock()
+
+        async def copiar(titulo: str, colunas, blocos) -> int:
+            aba = self._aba(workbook, titulo, colunas)
+            linhas = 0
+            async for bloco in blocos:
+                linhas += len(bloco)
+                if linhas > MAX_LINHAS_ABA:
+                    raise PlanilhaGrandeDemais(
+                        f"A aba {titulo} passaria de {MAX_LINHAS_ABA} linhas; reduza o período"
+                    )
+                async with trava:
+                    await asyncio.to_thread(self._escrever, aba, colunas, bloco)
+            return linhas
+
+        tarefas = [asyncio.ensure_future(self._resumo(data_inicio, data_fim))] + [
+            asyncio.ensure_future(copiar(titulo, colunas, blocos)) for titulo, colunas, blocos in conjuntos
+        ]
+        destino = SpooledTemporaryFile(max_size=MEMORIA_MAXIMA_BYTES)
+        try:
+            totais, *linhas = await asyncio.gather(*tarefas)
+            self._escrever(resumo, COLUNAS_RESUMO, totais)
+            await asyncio.to_thread(workbook.save, destino)
+        except BaseException:
+            # Uma leitura falhou (ou o cliente desistiu): as outras param também
+            for tarefa in tarefas:
+                tarefa.cancel()
+            destino.close()
+            raise
+
+        destino.seek(0)
+        logger.info(
+            "Planilha consolidada gerada em %.0f ms",
+            (time.perf_counter() - inicio) * 1000,
+            extra={"linhas": dict(zip((titulo for titulo, _, _ in conjuntos), linhas))}
+        )
+        return destino
@@ -0,0 +1,708 @@
+"""
+Layouts de armazenamento da frequência
+
+- `diario` (padrão): um documento por funcionário e dia na coleção
+  `frequencia`, no mesmo formato de RegistroFrequencia.
+- `mensal`: um documento por funcionário e mês na coleção
+  `frequencia_mensal`, com _id "<funcionario_id>:<YYYY-MM>", o primeiro
+  dia do mês (`inicio`), o nome uma única vez e os dias em um array
+  compacto:
+
+      {"i": id, "d": dia do mês, "t": tipo do dia (0 útil, 1 feriado,
+       2 fim de semana), "e"/"s": entrada/saída em minutos do dia,
+       "h": total de horas, "o": observação, "u": atualizado_em}
+
+  Campos vazios são omitidos. Cada mês de um funcionário vira uma entrada
+  nos índices em vez de ~22, e as chaves curtas e os horários inteiros
+  encolhem cada dia.
+
+Nos dois layouts os tipos gravados são nativos: no diário, `data` é um
+datetime (meia-noite UTC) e `hora_entrada`/`hora_saida` são minutos do dia
+(inteiros); no mensal, o dia do mês e os minutos são inteiros. Os filtros de
+período comparam datas de verdade, não texto. A API continua recebendo e
+devolvendo "YYYY-MM-DD" e "HH:MM": a conversão fica no codec abaixo. Bases
+com registros antigos em texto: `migracoes/frequencia_tipos_nativos.py`.
+
+O layout é escolhido por FREQUENCIA_ARMAZENAMENTO e fica atrás da mesma
+interface: FrequenciaService, análises, banco de horas, feed, importação e
+arquivamento falam com o armazenamento, nunca com a coleção diretamente, e
+recebem sempre registros no formato diário. Para trocar de layout com dados
+existentes use `migracoes/frequencia_mensal.py`.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from services.calendario_service import TIPOS_DIA
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple, Union
+from datetime import date, datetime
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+MODOS = ("diario", "mensal")
+MODO = os.environ.get("FREQUENCIA_ARMAZENAMENTO", "diario").lower()
+if MODO not in MODOS:
+    raise ValueError(f"FREQUENCIA_ARMAZENAMENTO inválido: '{MODO}' (use {' ou '.join(MODOS)})")
+
+TAMANHO_BLOCO = 5000
+MS_POR_DIA = 24 * 60 * 60 * 1000
+
+FuncionarioIds = Union[str, List[str], None]
+
+# Campo do registro diário -> chave no array compacto do layout mensal
+CHAVES_COMPACTAS = {
+    "id": "i",
+    "tipo_dia": "t",
+    "hora_entrada": "e",
+    "hora_saida": "s",
+    "total_horas": "h",
+    "observacao": "o",
+    "atualizado_em": "u",
+}
+
+
+CAMPOS_HORA = ("hora_entrada", "hora_saida")
+
+# --- Codec: tipos nativos no banco, texto na API ---
+
+
+def minutos_do_dia(hora: Union[str, int, None]) -> Optional[int]:
+    """'07:30' -> 450 (None quando vazio; inteiros passam direto)"""
+    if hora is None or isinstance(hora, int):
+        return hora
+    if not str(hora).strip():
+        return None
+    horas, _, minutos = str(hora).strip().partition(":")
+    return int(horas) * 60 + int(minutos[:2])
+
+
+def hora_do_dia(minutos: Union[int, str, None]) -> Optional[str]:
+    """450 -> '07:30' (texto de registros antigos volta normalizado)"""
+    if isinstance(minutos, str):
+        minutos = minutos_do_dia(minutos)
+    if minutos is None:
+        return None
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+def data_nativa(valor: Union[str, date, None]) -> Optional[datetime]:
+    """
+    '2025-01-20' ou '2025-01-20 00:00:00' -> datetime(2025, 1, 20)
+
+    Texto fora do formato gera ValueError com mensagem para o cliente (os
+    routers respondem 400).
+    """
+    if valor is None or valor == "":
+        return None
+    if isinstance(valor, datetime):
+        return datetime(valor.year, valor.month, valor.day)
+    if isinstance(valor, date):
+        return datetime(valor.year, valor.month, valor.day)
+    try:
+        return datetime.strptime(str(valor).strip()[:10], "%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"Data inválida: '{valor}' (use YYYY-MM-DD)") from None
+
+
+def data_texto(valor: Union[str, date, None]) -> Optional[str]:
+    """datetime(2025, 1, 20) -> '2025-01-20'"""
+    if valor is None:
+        return None
+    if isinstance(valor, date):
+        return valor.strftime("%Y-%m-%d")
+    return str(valor)[:10]
+
+
+def _normalizar_data(valor: Union[str, date, None]) -> Optional[str]:
+    """'2025-1-5' -> '2025-01-05': valida como data_nativa e volta ao texto comparável"""
+    return data_texto(data_nativa(valor))
+
+
+def codificar(registro: Dict[str, Any]) -> Dict[str, Any]:
+    """Registro da API -> documento gravado (só converte os campos presentes)"""
+    doc = dict(registro)
+    if "data" in doc:
+        doc["data"] = data_nativa(doc["data"])
+    for campo in CAMPOS_HORA:
+        if campo in doc:
+            doc[campo] = minutos_do_dia(doc[campo])
+    return doc
+
+
+def decodificar(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Documento gravado -> registro da API"""
+    registro = {campo: valor for campo, valor in doc.items() if campo != "_id"}
+    if "data" in registro:
+        registro["data"] = data_texto(registro["data"])
+    for campo in CAMPOS_HORA:
+        if campo in registro:
+            registro[campo] = hora_do_dia(registro[campo])
+    return registro
+
+
+def _dois_digitos(expressao: Any) -> Dict[str, Any]:
+    return {"$cond": [
+        {"$lt": [expressao, 10]},
+        {"$concat": ["0", {"$toString": expressao}]},
+        {"$toString": expressao}
+    ]}
+
+
+def expressao_hora(campo: str) -> Dict[str, Any]:
+    """Expressão de agregação: minutos do dia -> 'HH:MM' (null quando vazio)"""
+    return {"$cond": [
+        {"$eq": [{"$ifNull": [campo, None]}, None]},
+        None,
+        {"$concat": [
+            _dois_digitos({"$toInt": {"$floor": {"$divide": [campo, 60]}}}),
+            ":",
+            _dois_digitos({"$toInt": {"$mod": [campo, 60]}})
+        ]}
+    ]}
+
+
+def _filtro_funcionarios(funcionario_ids: FuncionarioIds) -> Dict[str, Any]:
+    if funcionario_ids is None:
+        return {}
+    if isinstance(funcionario_ids, str):
+        return {"funcionario_id": funcionario_ids}
+    return {"funcionario_id": {"$in": list(funcionario_ids)}}
+
+
+def _intervalo(inicio: Any, fim: Any) -> Dict[str, Any]:
+    intervalo = {}
+    if inicio:
+        intervalo["$gte"] = inicio
+    if fim:
+        intervalo["$lte"] = fim
+    return intervalo
+
+
+def _projetar(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aplica uma projeção de inclusão ({campo: 1}) a um registro já montado"""
+    campos = [campo for campo, incluir in (projection or {}).items() if incluir and campo != "_id"]
+    if not campos:
+        return doc
+    return {campo: doc[campo] for campo in campos if campo in doc}
+
+
+class ArmazenamentoDiario:
+    """Um documento por funcionário e dia (layout original)"""
+
+    modo = "diario"
+    nome_colecao = "frequencia"
+    # Chave usada para copiar documentos entre coleções (arquivamento)
+    chave = "id"
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.colecao = db[self.nome_colecao]
+
+    def filtro(
+        self,
+        funcionario_ids: FuncionarioIds = None,
+        data_inicio: Optional[str] = None,
+        data_fim: Optional[str] = None
+    ) -> Dict[str, Any]:
+        query = _filtro_funcionarios(funcionario_ids)
+        if data_inicio or data_fim:
+            query["data"] = _intervalo(data_nativa(data_inicio), data_nativa(data_fim))
+        return query
+
+    # --- Escrita ---
+
+    async def existe(self, funcionario_id: str, data: str) -> bool:
+        return await self.colecao.find_one(
+            {"funcionario_id": funcionario_id, "data": data_nativa(data)},
+            {"_id": 1}
+        ) is not None
+
+    async def inserir(self, registro: Dict[str, Any]) -> None:
+        await self.colecao.insert_one(codificar(registro))
+
+    async def inserir_lote(
+        self,
+        registros: List[Dict[str, Any]],
+        manter_atualizado_em: bool = False
+    ) -> Tuple[int, int, List[Dict[str, Any]]]:
+        """
+        Insere registros ignorando os que já existem (funcionário + data)
+
+        Retorna (criados, existentes, registros criados).
+        """
+        if not registros:
+            return 0, 0, []
+        operacoes = []
+        for reg in registros:
+            doc = codificar(reg)
+            operacoes.append(UpdateOne(
+                {"funcionario_id": doc["funcionario_id"], "data": doc["data"]},
+                {"$setOnInsert": doc},
+                upsert=True
+            ))
+        resultado = await self.colecao.bulk_write(operacoes, ordered=False)
+        novos = [registros[indice] for indice in resultado.upserted_ids]
+        return resultado.upserted_count, resultado.matched_count, novos
+
+    async def atualizar(self, registro_id: str, campos: Dict[str, Any]) -> bool:
+        resultado = await self.colecao.update_one({"id": registro_id}, {"$set": codificar(campos)})
+        return resultado.modified_count > 0
+
+    async def remover(self, registro_id: str) -> Optional[Dict[str, Any]]:
+        """Remove o registro e retorna a versão removida"""
+        doc = await self.colecao.find_one_and_delete({"id": registro_id}, projection={"_id": 0})
+        return decodificar(doc) if doc else None
+
+    # --- Leitura ---
+
+    async def buscar(self, registro_id: str) -> Optional[Dict[str, Any]]:
+        doc = await self.colecao.find_one({"id": registro_id}, {"_id": 0})
+        return decodificar(doc) if doc else None
+
+    async def listar(
+        self,
+        funcionario_ids: FuncionarioIds = None,
+        data_inicio: Optional[str] = None,
+        data_fim: Optional[str] = None,
+        projection: Optional[Dict[str, Any]] = None,
+        limit: int = 5000
+    ) -> List[Dict[str, Any]]:
+        """Registros do filtro, do mais recente para o mais antigo"""
+        projecao = {**(projection or {}), "_id": 0}
+        cursor = self.colecao.find(self.filtro(funcionario_ids, data_inicio, data_fim), projecao).sort("data", -1)
+        return [decodificar(doc) for doc in await cursor.to_list(length=limit)]
+
+    async def blocos(
+        self,
+        funcionario_ids: FuncionarioIds = None,
+        data_inicio: Optional[str] = None,
+        data_fim: Optional[str] = None,
+        campos: Optional[Iterable[str]] = None,
+        tamanho: int = TAMANHO_BLOCO,
+        nativo: bool = False
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Percorre os registros em blocos (leituras grandes, sem ordenação)
+
+        Com nativo=True os registros vêm com os tipos do banco (data em
+        datetime, horários em minutos), sem conversão para texto.
+        """
+        projecao = {**{campo: 1 for campo in campos or ()}, "_id": 0}
+        cursor = self.colecao.find(
+            self.filtro(funcionario_ids, data_inicio, data_fim),
+            projecao,
+            batch_size=tamanho
+        )
+        while True:
+            bloco = await cursor.to_list(length=tamanho)
+            if not bloco:
+                return
+            yield bloco if nativo else [decodificar(doc) for doc in bloco]
+
+    def estagios(
+        self,
+        funcionario_ids: FuncionarioIds = None,
+        data_inicio: Optional[str] = None,
+        data_fim: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Início de um pipeline de agregação que produz registros diários com os
+        tipos nativos (data em Date, horários em minutos; ver expressao_hora)
+        """
+        return [{"$match": self.filtro(funcionario_ids, data_inicio, data_fim)}]
+
+    async def contar(self, funcionario_ids: FuncionarioIds = None) -> int:
+        return await self.colecao.count_documents(self.filtro(funcionario_ids))
+
+    async def ids_existentes(self, ids: List[str]) -> Set[str]:
+        """Quais dos IDs de registro estão gravados"""
+        return set(await self.colecao.distinct("id", {"id": {"$in": ids}}))
+
+    async def funcionarios_com_registros(self, funcionario_ids: List[str], desde: str) -> Set[str]:
+        """Quais dos funcionários têm registros a partir da data"""
+        return set(await self.colecao.distinct(
+            "funcionario_id",
+            self.filtro(funcionario_ids, data_inicio=desde)
+        ))
+
+    # --- Feed ao vivo ---
+
+    def filtro_feed(self, data: Optional[str], funcionario_ids: Optional[List[str]]) -> Dict[str, Any]:
+        return self.filtro(funcionario_ids, data, data)
+
+    def registros_alterados(
+        self,
+        doc: Dict[str, Any],
+        data: Optional[str] = None,
+        desde: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """Registros de um documento alterado (no diário, o próprio documento)"""
+        return [decodificar(doc)]
+
+    async def tem_registros_legados(self) -> bool:
+        """Há registros com data ou horários ainda em texto (antes da migração)?"""
+        return await self.colecao.find_one(
+            {"$or": [{campo: {"$type": "string"}} for campo in ("data",) + CAMPOS_HORA]},
+            {"_id": 1}
+        ) is not None
+
+
+class ArmazenamentoMensal(ArmazenamentoDiario):
+    """Um documento por funcionário e mês, com os dias em um array compacto"""
+
+    modo = "mensal"
+    nome_colecao = "frequencia_mensal"
+    chave = "_id"
+
+    @staticmethod
+    def chave_mes(funcionario_id: str, data: Union[str, date]) -> str:
+        return f"{funcionario_id}:{data_texto(data)[:7]}"
+
+    @staticmethod
+    def compactar(registro: Dict[str, Any]) -> Dict[str, Any]:
+        """Registro diário -> item do array de dias"""
+        dia: Dict[str, Any] = {"d": int(data_texto(registro["data"])[8:10])}
+        for campo, chave in CHAVES_COMPACTAS.items():
+            valor = registro.get(campo)
+            if campo == "tipo_dia":
+                valor = TIPOS_DIA.index(valor) if valor in TIPOS_DIA else None
+            elif campo in ("hora_entrada", "hora_saida"):
+                valor = minutos_do_dia(valor)
+            if valor is not None:
+                dia[chave] = valor
+        return dia
+
+    @staticmethod
+    def expandir(documento: Dict[str, Any], dia: Dict[str, Any], nativo: bool = False) -> Dict[str, Any]:
+        """Item do array de dias -> registro diário (texto ou tipos nativos)"""
+        data = f"{documento['mes']}-{dia['d']:02d}"
+        return {
+            "id": dia.get("i"),
+            "funcionario_id": documento["funcionario_id"],
+            "nome": documento.get("nome"),
+            "data": data_nativa(data) if nativo else data,
+            "tipo_dia": TIPOS_DIA[dia.get("t", 0)],
+            "hora_entrada": dia.get("e") if nativo else hora_do_dia(dia.get("e")),
+            "hora_saida": dia.get("s") if nativo else hora_do_dia(dia.get("s")),
+            "observacao": dia.get("o"),
+            "total_horas": dia.get("h"),
+            "atualizado_em": dia.get("u"),
+        }
+
+    def _registros(
+        self,
+        documento: Dict[str, Any],
+        data_inicio: Optional[str] = None,
+        data_fim: Optional[str] = None,
+        nativo: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Registros de um documento mensal dentro do período (limites já normalizados)"""
+        dias = documento.get("dias", ())
+        if data_inicio or data_fim:
+            mes = documento["mes"]
+            dias = [
+                dia for dia in dias
+                if (not data_inicio or f"{mes}-{dia['d']:02d}" >= data_inicio)
+                and (not data_fim or f"{mes}-{dia['d']:02d}" <= data_fim)
+            ]
+        return [self.expandir(documento, dia, nativo) for dia in dias]
+
+    def filtro(
+        self,
+        funcionario_ids: FuncionarioIds = None,
+        data_inicio: Optional[str] = None,
+        data_fim: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Filtro dos documentos mensais que cobrem o período"""
+        query = _filtro_funcionarios(funcionario_ids)
+        if data_inicio or data_fim:
+            # O filtro é pelo mês em texto: '2025-1-5' precisa virar '2025-01'
+            data_inicio, data_fim = _normalizar_data(data_inicio), _normalizar_data(data_fim)
+            query["mes"] = _intervalo(data_inicio and data_inicio[:7], data_fim and data_fim[:7])
+        return query
+
+    # --- Escrita ---
+
+    async def existe(self, funcionario_id: str, data: str) -> bool:
+        return await self.colecao.find_one(
+            {"_id": self.chave_mes(funcionario_id, data), "dias.d": int(data_texto(data)[8:10])},
+            {"_id": 1}
+        ) is not None
+
+    async def inserir(self, registro: Dict[str, Any]) -> None:
+        await self.inserir_lote([registro])
+
+    async def inserir_lote(
+        self,
+        registros: List[Dict[str, Any]],
+        manter_atualizado_em: bool = False
+    ) -> Tuple[int, int, List[Dict[str, Any]]]:
+        """
+        Insere registros ignorando os que já existem (funcionário + data)
+
+        Lê uma vez os dias já gravados dos meses envolvidos e faz um $push
+        por mês com os dias novos, condicionado a nenhum deles estar no
+        array: duas escritas concorrentes no mesmo mês não duplicam um dia.
+        Um mês recusado (outra escrita gravou um dos dias nesse meio tempo)
+        é refeito dia a dia. Retorna só os dias de fato gravados. Os dias
+        novos recebem a data da escrita (usada pelo feed ao vivo), exceto
+        com manter_atualizado_em (migração).
+        """
+        if not registros:
+            return 0, 0, []
+        por_mes: Dict[str, List[Dict[str, Any]]] = {}
+        for reg in registros:
+            por_mes.setdefault(self.chave_mes(reg["funcionario_id"], reg["data"]), []).append(reg)
+
+        cursor = self.colecao.find({"_id": {"$in": list(por_mes)}}, {"dias.d": 1})
+        gravados = {doc["_id"]: {dia["d"] for dia in doc.get("dias", ())} async for doc in cursor}
+
+        agora = datetime.utcnow()
+        lotes: List[Tuple[str, List[Dict[str, Any]]]] = []
+        for chave, do_mes in por_mes.items():
+            dias = set(gravados.get(chave, ()))
+            inseridos = []
+            for reg in do_mes:
+                dia = int(data_texto(reg["data"])[8:10])
+                if dia in dias:
+                    continue
+                dias.add(dia)
+                inseridos.append(reg)
+            if inseridos:
+                lotes.append((chave, inseridos))
+
+        recusados = await self._gravar_dias([
+            self._push(chave, inseridos, agora, manter_atualizado_em) for chave, inseridos in lotes
+        ])
+        novos = [reg for indice, (_, inseridos) in enumerate(lotes) if indice not in recusados for reg in inseridos]
+
+        # Depois da recusa o documento do mês existe: uma nova recusa do dia
+        # isolado quer dizer que ele já está gravado
+        avulsos = [(chave, reg) for indice in sorted(recusados) for reg in lotes[indice][1]]
+        recusados = await self._gravar_dias([
+            self._push(chave, [reg], agora, manter_atualizado_em) for chave, reg in avulsos
+        ])
+        novos.extend(reg for indice, (_, reg) in enumerate(avulsos) if indice not in recusados)
+        return len(novos), len(registros) - len(novos), novos
+
+    def _push(
+        self,
+        chave: str,
+        inseridos: List[Dict[str, Any]],
+        agora: datetime,
+        manter_atualizado_em: bool
+    ) -> UpdateOne:
+        """
+        $push dos dias no documento do mês, só se nenhum deles já estiver lá
+
+        Com algum dos dias presente o filtro não casa e o upsert tenta criar
+        outro documento com o mesmo _id: a escrita é recusada (chave duplicada).
+        """
+        primeiro = inseridos[0]
+        return UpdateOne(
+            {"_id": chave, "dias.d": {"$nin": [int(data_texto(reg["data"])[8:10]) for reg in inseridos]}},
+            {
+                "$push": {"dias": {"$each": [
+                    self.compactar(reg if manter_atualizado_em else {**reg, "atualizado_em": agora})
+                    for reg in inseridos
+                ]}},
+                "$set": {"nome": primeiro.get("nome"), "atualizado_em": agora},
+                "$setOnInsert": {
+                    "funcionario_id": primeiro["funcionario_id"],
+                    "mes": data_texto(primeiro["data"])[:7],
+                    "inicio": data_nativa(data_texto(primeiro["data"])[:7] + "-01")
+                }
+            },
+            upsert=True
+        )
+
+    async def _gravar_dias(self, operacoes: List[UpdateOne]) -> Set[int]:
+        """Executa os $push e retorna os índices recusados por chave duplicada"""
+        if not operacoes:
+            return set()
+        try:
+            await self.colecao.bulk_write(operacoes, ordered=False)
+        except BulkWriteError as e:
+            erros = e.details.get("writeErrors", [])
+            if any(erro.get("code") != 11000 for erro in erros):
+                raise
+            return {erro["index"] for erro in erros}
+        return set()
+
+    async def atualizar(self, registro_id: str, campos: Dict[str, Any]) -> bool:
+        agora = campos.get("atualizado_em") or datetime.utcnow()
+        dia = self.compactar({"data": "0000-00-01", **campos, "atualizado_em": agora})
+        atribuir = {f"dias.$.{chave}": valor for chave, valor in dia.items() if chave != "d"}
+        # Campos enviados como None (ex. total_horas recalculado) são removidos
+        remover = {
+            f"dias.$.{CHAVES_COMPACTAS[campo]}": ""
+            for campo, valor in campos.items()
+            if valor is None and campo in CHAVES_COMPACTAS
+        }
+        operacao: Dict[str, Any] = {"$set": {**atribuir, "atualizado_em": agora}}
+        if remover:
+            operacao["$unset"] = remover
+        resultado = await self.colecao.update_one({"dias.i": registro_id}, operacao)
+        return resultado.modified_count > 0
+
+    async def remover(self, registro_id: str) -> Optional[Dict[str, Any]]:
+        removido = await self.buscar(registro_id)
+        if not removido:
+            return None
+        chave = self.chave_mes(removido["funcionario_id"], removido["data"])
+        resultado = await self.colecao.update_one(
+            {"_id": chave},
+            {"$pull": {"dias": {"i": registro_id}}, "$set": {"atualizado_em": datetime.utcnow()}}
+        )
+        if not resultado.modified_count:
+            return None
+        await self.colecao.delete_one({"_id": chave, "dias": {"$size": 0}})
+        return removido
+
+    # --- Leitura ---
+
+    async def buscar(self, registro_id: str) -> Optional[Dict[str, Any]]:
+        doc = await self.colecao.find_one(
+            {"dias.i": registro_id},
+            {"funcionario_id": 1, "mes": 1, "nome": 1, "dias": {"$elemMatch": {"i": registro_id}}}
+        )
+        if not doc or not doc.get("dias"):
+            return None
+        return self.expandir(doc, doc["dias"][0])
+
+    async def listar(
+        self,
+        funcionario_ids: FuncionarioIds = None,
+        data_inicio: Optional[str] = None,
+        data_fim: Optional[str] = None,
+        projection: Optional[Dict[str, Any]] = None,
+        limit: int = 5000
+    ) -> List[Dict[str, Any]]:
+        """
+        Registros do filtro, do mais recente para o mais antigo
+
+        Os meses são lidos do mais recente para o mais antigo e a leitura
+        para assim que o limite é atingido e o mês muda.
+        """
+        data_inicio, data_fim = _normalizar_data(data_inicio), _normalizar_data(data_fim)
+        cursor = self.colecao.find(self.filtro(funcionario_ids, data_inicio, data_fim)).sort("mes", -1)
+        registros: List[Dict[str, Any]] = []
+        mes_limite = None
+        async for doc in cursor:
+            if mes_limite and doc["mes"] < mes_limite:
+                break
+            registros.extend(self._registros(doc, data_inicio, data_fim))
+            if mes_limite is None and len(registros) >= limit:
+                mes_limite = doc["mes"]
+        registros.sort(key=lambda reg: reg["data"], reverse=True)
+        return [_projetar(reg, projection) for reg in registros[:limit]]
+
+    async def blocos(
+        self,
+        funcionario_ids: FuncionarioIds = None,
+        data_inicio: Optional[str] = None,
+        data_fim: Optional[str] = None,
+        campos: Optional[Iterable[str]] = None,
+        tamanho: int = TAMANHO_BLOCO,
+        nativo: bool = False
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        projecao = {campo: 1 for campo in campos or ()}
+        data_inicio, data_fim = _normalizar_data(data_inicio), _normalizar_data(data_fim)
+        # ~22 dias por documento mensal
+        cursor = self.colecao.find(
+            self.filtro(funcionario_ids, data_inicio, data_fim),
+            batch_size=max(1, tamanho // 22)
+        )
+        bloco: List[Dict[str, Any]] = []
+        async for doc in cursor:
+            bloco.extend(_projetar(reg, projecao) for reg in self._registros(doc, data_inicio, data_fim, nativo))
+            if len(bloco) >= tamanho:
+                yield bloco
+                bloco = []
+        if bloco:
+            yield bloco
+
+    def estagios(
+        self,
+        funcionario_ids: FuncionarioIds = None,
+        data_inicio: Optional[str] = None,
+        data_fim: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Desdobra os documentos mensais em registros diários (tipos nativos) no pipeline"""
+        estagios: List[Dict[str, Any]] = [
+            {"$match": self.filtro(funcionario_ids, data_inicio, data_fim)},
+            {"$unwind": "$dias"},
+            {"$project": {
+                "_id": 0,
+                "id": "$dias.i",
+                "funcionario_id": 1,
+                "nome": 1,
+                # inicio (1º dia do mês) + (dia - 1) dias, sem parse de texto
+                "data": {"$add": ["$inicio", {"$multiply": [{"$subtract": ["$dias.d", 1]}, MS_POR_DIA]}]},
+                "tipo_dia": {"$arrayElemAt": [list(TIPOS_DIA), {"$ifNull": ["$dias.t", 0]}]},
+                "hora_entrada": "$dias.e",
+                "hora_saida": "$dias.s",
+                "total_horas": "$dias.h",
+                "observacao": "$dias.o",
+                "atualizado_em": "$dias.u",
+            }},
+        ]
+        if data_inicio or data_fim:
+            estagios.append({"$match": {"data": _intervalo(data_nativa(data_inicio), data_nativa(data_fim))}})
+        return estagios
+
+    async def contar(self, funcionario_ids: FuncionarioIds = None) -> int:
+        resultado = await self.colecao.aggregate([
+            {"$match": self.filtro(funcionario_ids)},
+            {"$group": {"_id": None, "total": {"$sum": {"$size": "$dias"}}}}
+        ]).to_list(length=1)
+        return resultado[0]["total"] if resultado else 0
+
+    async def ids_existentes(self, ids: List[str]) -> Set[str]:
+        # distinct devolve todos os dias dos meses encontrados
+        return set(ids) & set(await self.colecao.distinct("dias.i", {"dias.i": {"$in": ids}}))
+
+    async def funcionarios_com_registros(self, funcionario_ids: List[str], desde: str) -> Set[str]:
+        """Granularidade de mês: qualquer registro no mês de `desde` conta"""
+        return set(await self.colecao.distinct(
+            "funcionario_id",
+            {**_filtro_funcionarios(funcionario_ids), "mes": {"$gte": desde[:7]}}
+        ))
+
+    # --- Feed ao vivo ---
+
+    def filtro_feed(self, data: Optional[str], funcionario_ids: Optional[List[str]]) -> Dict[str, Any]:
+        query = _filtro_funcionarios(funcionario_ids)
+        if data:
+            query["mes"] = _normalizar_data(data)[:7]
+        return query
+
+    def registros_alterados(
+        self,
+        doc: Dict[str, Any],
+        data: Optional[str] = None,
+        desde: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Dias alterados de um documento mensal: os com atualizado_em depois de
+        `desde` ou, sem ele, os gravados na última escrita do documento
+        """
+        if desde is None:
+            alterados = [dia for dia in doc.get("dias", ()) if dia.get("u") == doc.get("atualizado_em")]
+        else:
+            alterados = [dia for dia in doc.get("dias", ()) if dia.get("u") and dia["u"] > desde]
+        registros = [self.expandir(doc, dia) for dia in alterados]
+        if data:
+            data = _normalizar_data(data)
+            registros = [reg for reg in registros if reg["data"] == data]
+        return registros
+
+
+LAYOUTS = {"diario": ArmazenamentoDiario, "mensal": ArmazenamentoMensal}
+COLECAO_FREQUENCIA = LAYOUTS[MODO].nome_colecao
+
+
+def armazenamento_frequencia(db: AsyncIOMotorDatabase, modo: Optional[str] = None) -> ArmazenamentoDiario:
+    """Armazenamento de frequência configurado (ou o do modo informado)"""
+    return LAYOUTS[modo or MODO](db)
@@ -0,0 +1,129 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure
+from models.frequencia import RegistroFrequencia
+from services.funcionario_service import FuncionarioService
+from services.frequencia_armazenamento import armazenamento_frequencia
+from typing import Any, AsyncIterator, Dict, List, Optional
+from datetime import datetime
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Códigos retornados pelo mongod quando change streams não são suportados
+# (servidor standalone, sem replica set)
+CODIGOS_SEM_CHANGE_STREAM = {40573, 40415, 20}
+
+INTERVALO_POLLING = float(os.environ.get("FREQUENCIA_FEED_POLLING_SEGUNDOS", "3"))
+INTERVALO_HEARTBEAT_MS = int(os.environ.get("FREQUENCIA_FEED_HEARTBEAT_MS", "15000"))
+
+
+class FrequenciaFeedService:
+    """
+    Feed ao vivo de registros de frequência.
+
+    Usa um change stream na coleção da frequência e, em servidores standalone
+    (sem replica set), cai para polling incremental pelo campo `atualizado_em`.
+    No layout mensal cada evento de um documento do mês vira um evento por
+    dia alterado.
+    Cada item produzido é um evento com o registro, ou None como heartbeat.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.armazenamento = armazenamento_frequencia(db)
+        self.collection = self.armazenamento.colecao
+        self.funcionario_service = FuncionarioService(db)
+
+    async def _ids_do_setor(self, setor: Optional[str]) -> Optional[List[str]]:
+        """Resolve os funcionários do setor uma única vez, no início do feed"""
+        if not setor:
+            return None
+        funcionarios = await self.funcionario_service.get_all_raw(
+            setor=setor, projection={"id": 1}, limit=None
+        )
+        return [f["id"] for f in funcionarios]
+
+    def _evento(self, operacao: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "operacao": operacao,
+            "registro": RegistroFrequencia.model_construct(**doc).model_dump()
+        }
+
+    async def eventos(
+        self,
+        data: Optional[str] = None,
+        setor: Optional[str] = None
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Produz inserções e atualizações filtradas por data e/ou setor"""
+        ids = await self._ids_do_setor(setor)
+        inicio = datetime.utcnow()
+
+        try:
+            async for evento in self._change_stream(data, ids):
+                yield evento
+        except OperationFailure as e:
+            if e.code not in CODIGOS_SEM_CHANGE_STREAM:
+                raise
+            logger.info("Change streams indisponíveis, feed de frequência em modo polling")
+            async for evento in self._polling(data, ids, inicio):
+                yield evento
+
+    async def _change_stream(
+        self,
+        data: Optional[str],
+        ids: Optional[List[str]]
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        match: Dict[str, Any] = {"operationType": {"$in": ["insert", "update", "replace"]}}
+        for campo, condicao in self.armazenamento.filtro_feed(data, ids).items():
+            match[f"fullDocument.{campo}"] = condicao
+
+        async with self.collection.watch(
+            [{"$match": match}],
+            full_document="updateLookup",
+            max_await_time_ms=INTERVALO_HEARTBEAT_MS
+        ) as stream:
+            while stream.alive:
+                change = await stream.try_next()
+                if change is None:
+                    yield None
+                    continue
+                # Documento removido antes do updateLookup (possível sem
+                # filtro de data ou setor): não há o que enviar
+                if not change.get("fullDocument"):
+                    continue
+                for registro in self.armazenamento.registros_alterados(change["fullDocument"], data):
+                    yield self._evento(change["operationType"], registro)
+
+    async def _polling(
+        self,
+        data: Optional[str],
+        ids: Optional[List[str]],
+        inicio: datetime
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        ultimo = inicio
+        ciclos_sem_evento = 0
+        ciclos_por_heartbeat = max(1, int(INTERVALO_HEARTBEAT_MS / 1000 / INTERVALO_POLLING))
+
+        while True:
+            query: Dict[str, Any] = {**self.armazenamento.filtro_feed(data, ids), "atualizado_em": {"$gt": ultimo}}
+            cursor = self.collection.find(query).sort("atualizado_em", 1)
+            novos = await cursor.to_list(length=1000)
+
+            desde = ultimo
+            for doc in novos:
+                ultimo = max(ultimo, doc["atualizado_em"])
+                # Em polling não há como distinguir inserção de atualização
+                for registro in self.armazenamento.registros_alterados(doc, data, desde):
+                    yield self._evento("upsert", registro)
+
+            if novos:
+                ciclos_sem_evento = 0
+            else:
+                ciclos_sem_evento += 1
+                if ciclos_sem_evento >= ciclos_por_heartbeat:
+                    ciclos_sem_evento = 0
+                    yield None
+
+            await asyncio.sleep(INTERVALO_POLLING)
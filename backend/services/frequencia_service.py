@@ -1,8 +1,13 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models.frequencia import RegistroFrequencia, RegistroFrequenciaCreate, RegistroFrequenciaUpdate
 from services.funcionario_service import FuncionarioService
-from typing import List, Optional
-from datetime import datetime, time
+from services.calendario_service import calendario
+from services.banco_horas_service import BancoHorasService
+from services.frequencia_armazenamento import armazenamento_frequencia, expressao_hora
+from core.versoes import versoes_colecoes
+from typing import Any, Dict, List, Optional
+from datetime import datetime, time, timedelta
+import calendar
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,8 +16,11 @@ logger = logging.getLogger(__name__)
 class FrequenciaService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
-        self.collection = db.frequencia
+        # Layout configurado em FREQUENCIA_ARMAZENAMENTO (diário ou mensal)
+        self.armazenamento = armazenamento_frequencia(db)
+        self.collection = self.armazenamento.colecao
         self.funcionario_service = FuncionarioService(db)
+        self.banco_horas = BancoHorasService(db)
 
     def _calcular_horas(self, hora_entrada: Optional[str], hora_saida: Optional[str]) -> Optional[float]:
         """Calcula total de horas trabalhadas"""
@@ -35,52 +43,74 @@ class FrequenciaService:
             raise ValueError(f"Funcionário {registro_data.funcionario_id} não encontrado")
         
         # Verifica se já existe registro para esta data
-        existing = await self.collection.find_one({
-            "funcionario_id": registro_data.funcionario_id,
-            "data": registro_data.data
-        })
-        if existing:
+        if await self.armazenamento.existe(registro_data.funcionario_id, registro_data.data):
             raise ValueError(f"Já existe registro de frequência para {funcionario.nome} em {registro_data.data}")
         
         # Calcula total de horas
         total_horas = self._calcular_horas(registro_data.hora_entrada, registro_data.hora_saida)
         
+        dados = registro_data.model_dump()
+        # Sem tipo_dia informado, o calendário classifica a data
+        if "tipo_dia" not in registro_data.model_fields_set:
+            dados["tipo_dia"] = calendario.tipo_dia(registro_data.data)
+        
         registro = RegistroFrequencia(
-            **registro_data.model_dump(),
+            **dados,
             nome=funcionario.nome,
             total_horas=total_horas
         )
         
-        await self.collection.insert_one(registro.model_dump())
-        logger.info(f"Frequência registrada: {funcionario.nome} - {registro_data.data}")
+        # Registro e crédito não podem intercalar com a reconstrução do banco de horas
+        async with self.banco_horas.escrita():
+            # atualizado_em alimenta o feed ao vivo no modo polling
+            await self.armazenamento.inserir({**registro.model_dump(), "atualizado_em": datetime.utcnow()})
+            await versoes_colecoes.incrementar("frequencia")
+            await self.banco_horas.registrar(registro.model_dump())
+        logger.debug("Frequência registrada: %s - %s", funcionario.nome, registro_data.data)
         return registro
 
     async def get_all(
         self,
         data_inicio: Optional[str] = None,
         data_fim: Optional[str] = None,
-        funcionario_id: Optional[str] = None
+        funcionario_id: Optional[str] = None,
+        trusted: bool = False
     ) -> List[RegistroFrequencia]:
-        """Lista registros de frequência com filtros"""
-        query = {}
-        
-        if funcionario_id:
-            query["funcionario_id"] = funcionario_id
+        """
+        Lista registros de frequência com filtros
         
-        if data_inicio and data_fim:
-            query["data"] = {"$gte": data_inicio, "$lte": data_fim}
-        elif data_inicio:
-            query["data"] = {"$gte": data_inicio}
-        elif data_fim:
-            query["data"] = {"$lte": data_fim}
-        
-        cursor = self.collection.find(query).sort("data", -1)
-        registros = await cursor.to_list(length=5000)
+        Com trusted=True os documentos não são revalidados (model_construct),
+        pois vêm do nosso próprio banco. Use apenas em consumidores internos.
+        """
+        registros = await self.get_all_raw(
+            data_inicio=data_inicio,
+            data_fim=data_fim,
+            funcionario_id=funcionario_id
+        )
+        if trusted:
+            return [RegistroFrequencia.model_construct(**reg) for reg in registros]
         return [RegistroFrequencia(**reg) for reg in registros]
 
+    async def get_all_raw(
+        self,
+        data_inicio: Optional[str] = None,
+        data_fim: Optional[str] = None,
+        funcionario_id: Optional[str] = None,
+        projection: Optional[Dict[str, Any]] = None,
+        limit: int = 5000
+    ) -> List[Dict[str, Any]]:
+        """Lista registros de frequência como dicionários, sem passar pelo Pydantic"""
+        return await self.armazenamento.listar(
+            funcionario_id,
+            data_inicio,
+            data_fim,
+            projection=projection,
+            limit=limit
+        )
+
     async def get_by_id(self, registro_id: str) -> Optional[RegistroFrequencia]:
         """Busca registro por ID"""
-        doc = await self.collection.find_one({"id": registro_id})
+        doc = await self.armazenamento.buscar(registro_id)
         if doc:
             return RegistroFrequencia(**doc)
         return None
@@ -93,48 +123,198 @@ class FrequenciaService:
         if not update_dict:
             return await self.get_by_id(registro_id)
         
-        # Busca registro atual
-        registro_atual = await self.get_by_id(registro_id)
-        if not registro_atual:
-            return None
-        
-        # Recalcula horas se entrada ou saída mudaram
-        hora_entrada = update_dict.get("hora_entrada", registro_atual.hora_entrada)
-        hora_saida = update_dict.get("hora_saida", registro_atual.hora_saida)
-        
-        if "hora_entrada" in update_dict or "hora_saida" in update_dict:
-            update_dict["total_horas"] = self._calcular_horas(hora_entrada, hora_saida)
-        
-        result = await self.collection.update_one(
-            {"id": registro_id},
-            {"$set": update_dict}
-        )
-        
-        if result.modified_count > 0:
-            logger.info(f"Frequência atualizada: {registro_id}")
-            return await self.get_by_id(registro_id)
+        async with self.banco_horas.escrita():
+            # Busca registro atual
+            registro_atual = await self.get_by_id(registro_id)
+            if not registro_atual:
+                return None
+            
+            # Recalcula horas se entrada ou saída mudaram
+            hora_entrada = update_dict.get("hora_entrada", registro_atual.hora_entrada)
+            hora_saida = update_dict.get("hora_saida", registro_atual.hora_saida)
+            
+            if "hora_entrada" in update_dict or "hora_saida" in update_dict:
+                update_dict["total_horas"] = self._calcular_horas(hora_entrada, hora_saida)
+            
+            update_dict["atualizado_em"] = datetime.utcnow()
+            if await self.armazenamento.atualizar(registro_id, update_dict):
+                await versoes_colecoes.incrementar("frequencia")
+                logger.debug("Frequência atualizada: %s", registro_id)
+                registro = await self.get_by_id(registro_id)
+                if registro:
+                    await self.banco_horas.ajustar(registro_atual.model_dump(), registro.model_dump())
+                return registro
         
         return None
 
     async def delete(self, registro_id: str) -> bool:
         """Remove um registro de frequência"""
-        result = await self.collection.delete_one({"id": registro_id})
-        if result.deleted_count > 0:
-            logger.info(f"Frequência removida: {registro_id}")
-            return True
+        async with self.banco_horas.escrita():
+            removido = await self.armazenamento.remover(registro_id)
+            if removido:
+                await versoes_colecoes.incrementar("frequencia")
+                await self.banco_horas.estornar(removido)
+                logger.debug("Frequência removida: %s", registro_id)
+                return True
         return False
 
     async def get_by_funcionario_mes(self, funcionario_id: str, ano: int, mes: int) -> List[RegistroFrequencia]:
         """Busca todos os registros de um funcionário em um mês específico"""
-        data_inicio = f"{ano}-{mes:02d}-01"
-        # Calcula último dia do mês
-        if mes == 12:
-            data_fim = f"{ano}-12-31"
-        else:
-            data_fim = f"{ano}-{mes+1:02d}-01"
+        data_inicio, data_fim = self._limites_mes(ano, mes)
         
         return await self.get_all(
             data_inicio=data_inicio,
             data_fim=data_fim,
             funcionario_id=funcionario_id
         )
+
+    @staticmethod
+    def _limites_mes(ano: int, mes: int) -> tuple:
+        """Retorna o primeiro e o último dia do mês (YYYY-MM-DD, inclusivos)"""
+        ultimo_dia = calendar.monthrange(ano, mes)[1]
+        return f"{ano}-{mes:02d}-01", f"{ano}-{mes:02d}-{ultimo_dia:02d}"
+
+    async def get_folha_ponto(
+        self,
+        ano: int,
+        mes: int,
+        funcionario_id: Optional[str] = None,
+        setor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Monta a folha de ponto mensal de um funcionário ou de um setor inteiro
+        
+        Os dias sem registro são preenchidos com $densify e os totais por
+        funcionário saem do mesmo pipeline de agregação ($group), exigindo
+        MongoDB 5.1+. Funcionários sem nenhum registro no mês recebem o
+        calendário vazio montado aqui.
+        """
+        if not funcionario_id and not setor:
+            raise ValueError("Informe funcionario_id ou setor")
+        
+        # Resolve os funcionários da folha
+        if funcionario_id:
+            funcionario = await self.funcionario_service.collection.find_one(
+                {"id": funcionario_id},
+                {"_id": 0, "id": 1, "nome": 1, "setor": 1}
+            )
+            if not funcionario:
+                raise ValueError(f"Funcionário {funcionario_id} não encontrado")
+            funcionarios = [funcionario]
+        else:
+            funcionarios = await self.funcionario_service.get_all_raw(
+                ativo=True,
+                setor=setor,
+                projection={"id": 1, "nome": 1, "setor": 1},
+                limit=None
+            )
+        
+        data_inicio, data_fim = self._limites_mes(ano, mes)
+        inicio = datetime(ano, mes, 1)
+        fim_exclusivo = inicio + timedelta(days=calendar.monthrange(ano, mes)[1])
+        # Horários em minutos do dia: 0 (meia-noite) também é presença
+        presente = {"$ne": [{"$ifNull": ["$hora_entrada", None]}, None]}
+        feriados = [
+            datetime.combine(dia, time.min)
+            for dia in calendario.feriados_no_periodo(data_inicio, data_fim)
+        ]
+        
+        pipeline = self.armazenamento.estagios([f["id"] for f in funcionarios], data_inicio, data_fim) + [
+            {"$project": {
+                "_id": 0,
+                "funcionario_id": 1,
+                "hora_entrada": 1,
+                "hora_saida": 1,
+                "total_horas": 1,
+                "tipo_dia": 1,
+                "dia": "$data"
+            }},
+            {"$densify": {
+                "field": "dia",
+                "partitionByFields": ["funcionario_id"],
+                "range": {"step": 1, "unit": "day", "bounds": [inicio, fim_exclusivo]}
+            }},
+            {"$addFields": {"dia_semana": {"$isoDayOfWeek": "$dia"}}},
+            {"$addFields": {
+                "fim_de_semana": {"$gte": ["$dia_semana", 6]},
+                "feriado": {"$or": [{"$eq": ["$tipo_dia", "feriado"]}, {"$in": ["$dia", feriados]}]},
+                "presente": presente
+            }},
+            {"$addFields": {
+                "falta": {"$not": [{"$or": ["$presente", "$fim_de_semana", "$feriado"]}]}
+            }},
+            {"$sort": {"funcionario_id": 1, "dia": 1}},
+            {"$group": {
+                "_id": "$funcionario_id",
+                "dias": {"$push": {
+                    "data": {"$dateToString": {"date": "$dia", "format": "%Y-%m-%d"}},
+                    "dia_semana": "$dia_semana",
+                    "fim_de_semana": "$fim_de_semana",
+                    "feriado": "$feriado",
+                    "hora_entrada": expressao_hora("$hora_entrada"),
+                    "hora_saida": expressao_hora("$hora_saida"),
+                    "total_horas": {"$ifNull": ["$total_horas", 0]},
+                    "falta": "$falta"
+                }},
+                "total_horas": {"$sum": {"$ifNull": ["$total_horas", 0]}},
+                "dias_trabalhados": {"$sum": {"$cond": ["$presente", 1, 0]}},
+                "faltas": {"$sum": {"$cond": ["$falta", 1, 0]}}
+            }}
+        ]
+        
+        resultado = {
+            doc["_id"]: doc
+            async for doc in self.collection.aggregate(pipeline, allowDiskUse=True)
+        }
+        
+        folhas = []
+        for func in funcionarios:
+            doc = resultado.get(func["id"]) or self._folha_vazia(inicio, fim_exclusivo)
+            folhas.append({
+                "funcionario_id": func["id"],
+                "nome": func.get("nome"),
+                "setor": func.get("setor"),
+                "dias": doc["dias"],
+                "total_horas": round(doc["total_horas"], 2),
+                "dias_trabalhados": doc["dias_trabalhados"],
+                "faltas": doc["faltas"]
+            })
+        
+        return {
+            "ano": ano,
+            "mes": mes,
+            "setor": setor,
+            "funcionarios": folhas,
+            "totalizadores": {
+                "total_funcionarios": len(folhas),
+                "dias_no_mes": (fim_exclusivo - inicio).days,
+                "total_horas": round(sum(f["total_horas"] for f in folhas), 2),
+                "total_faltas": sum(f["faltas"] for f in folhas)
+            }
+        }
+
+    @staticmethod
+    def _folha_vazia(inicio: datetime, fim_exclusivo: datetime) -> Dict[str, Any]:
+        """Calendário do mês para quem não tem nenhum registro"""
+        dias = []
+        dia = inicio
+        while dia < fim_exclusivo:
+            fim_de_semana = dia.isoweekday() >= 6
+            feriado = calendario.tipo_dia(dia) == "feriado"
+            dias.append({
+                "data": dia.strftime("%Y-%m-%d"),
+                "dia_semana": dia.isoweekday(),
+                "fim_de_semana": fim_de_semana,
+                "feriado": feriado,
+                "hora_entrada": None,
+                "hora_saida": None,
+                "total_horas": 0,
+                "falta": not (fim_de_semana or feriado)
+            })
+            dia += timedelta(days=1)
+        return {
+            "dias": dias,
+            "total_horas": 0,
+            "dias_trabalhados": 0,
+            "faltas": sum(1 for d in dias if d["falta"])
+        }
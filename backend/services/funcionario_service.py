@@ -1,10 +1,46 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
 from models.funcionario import Funcionario, FuncionarioCreate, FuncionarioUpdate
-from typing import List, Optional
+from core.carregador import carregadores_atuais, escopo_carregadores
+from core.versoes import versoes_colecoes
+from services.propagacao_nome_service import PropagacaoNomeService
+from contextlib import nullcontext
+from typing import Any, Dict, Iterable, List, Optional
+from datetime import datetime
+import asyncio
 import logging
+import re
+import unicodedata
 
 logger = logging.getLogger(__name__)
 
+# Campos internos de busca, fora das respostas da API
+CAMPOS_BUSCA = ("busca_tokens", "cpf_digitos")
+
+# Quadro ativo em memória, válido enquanto a versão de "funcionarios" não muda
+_quadro_ativo: Dict[str, Any] = {"versao": None, "funcionarios": []}
+
+
+def normalizar_texto(texto: Optional[str]) -> str:
+    """'João Conceição' -> 'joao conceicao'"""
+    sem_acento = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode()
+    return sem_acento.lower()
+
+
+def tokenizar(texto: Optional[str]) -> List[str]:
+    return re.findall(r"[a-z0-9]+", normalizar_texto(texto))
+
+
+def campos_busca(nome: Optional[str], cargo: Optional[str], cpf: Optional[str]) -> Dict[str, Any]:
+    """
+    Campos indexados da busca: tokens normalizados de nome e cargo (busca
+    por prefixo sem acento) e os dígitos do CPF (busca parcial)
+    """
+    return {
+        "busca_tokens": sorted(set(tokenizar(nome)) | set(tokenizar(cargo))),
+        "cpf_digitos": re.sub(r"\D", "", cpf or "")
+    }
+
 
 class FuncionarioService:
     def __init__(self, db: AsyncIOMotorDatabase):
@@ -19,29 +55,194 @@ class FuncionarioService:
             raise ValueError(f"Funcionário com CPF {funcionario_data.cpf} já existe")
         
         funcionario = Funcionario(**funcionario_data.model_dump())
-        await self.collection.insert_one(funcionario.model_dump())
-        logger.info(f"Funcionário criado: {funcionario.id} - {funcionario.nome}")
+        await self.collection.insert_one({
+            **funcionario.model_dump(),
+            **campos_busca(funcionario.nome, funcionario.cargo, funcionario.cpf)
+        })
+        await versoes_colecoes.incrementar("funcionarios")
+        self._invalidar_carregadores()
+        logger.debug("Funcionário criado: %s - %s", funcionario.id, funcionario.nome)
         return funcionario
 
-    async def get_all(self, ativo: Optional[bool] = None, setor: Optional[str] = None) -> List[Funcionario]:
-        """Lista todos os funcionários com filtros opcionais"""
-        query = {}
+    async def get_all(
+        self,
+        ativo: Optional[bool] = None,
+        setor: Optional[str] = None,
+        trusted: bool = False
+    ) -> List[Funcionario]:
+        """
+        Lista todos os funcionários com filtros opcionais
+        
+        Com trusted=True os documentos não são revalidados (model_construct).
+        """
+        funcionarios = await self.get_all_raw(ativo=ativo, setor=setor)
+        if trusted:
+            return [Funcionario.model_construct(**func) for func in funcionarios]
+        return [Funcionario(**func) for func in funcionarios]
+
+    async def get_all_raw(
+        self,
+        ativo: Optional[bool] = None,
+        setor: Optional[str] = None,
+        projection: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = 1000
+    ) -> List[Dict[str, Any]]:
+        """
+        Lista funcionários como dicionários, sem passar pelo Pydantic
+        
+        limit=None lê o quadro inteiro: use quando a lista alimenta cálculos
+        (filtros por setor, denominadores), não uma listagem paginada.
+        """
+        if ativo is True and not projection:
+            return [
+                dict(func) for func in await self.get_quadro_ativo()
+                if not setor or func.get("setor") == setor
+            ][:limit]
+        
+        query: Dict[str, Any] = {}
         if ativo is not None:
             query["ativo"] = ativo
         if setor:
             query["setor"] = setor
+        if projection:
+            projecao = {**projection, "_id": 0}
+        else:
+            projecao = {"_id": 0, **{campo: 0 for campo in CAMPOS_BUSCA}}
         
-        cursor = self.collection.find(query).sort("nome", 1)
-        funcionarios = await cursor.to_list(length=1000)
-        return [Funcionario(**func) for func in funcionarios]
+        cursor = self.collection.find(query, projecao).sort("nome", 1)
+        return await cursor.to_list(length=limit)
+
+    async def get_quadro_ativo(self) -> List[Dict[str, Any]]:
+        """
+        Funcionários ativos, ordenados por nome, direto da memória
+        
+        A lista é recarregada (pelo índice parcial de ativo=true) só quando
+        algum funcionário é criado, alterado ou desativado. Os dicionários
+        são compartilhados: copie antes de alterar.
+        """
+        versao = versoes_colecoes.get("funcionarios")
+        if _quadro_ativo["versao"] != versao:
+            projecao = {"_id": 0, **{campo: 0 for campo in CAMPOS_BUSCA}}
+            cursor = self.collection.find({"ativo": True}, projecao).sort("nome", 1)
+            _quadro_ativo["funcionarios"] = await cursor.to_list(length=None)
+            _quadro_ativo["versao"] = versao
+        return _quadro_ativo["funcionarios"]
+
+    async def buscar(
+        self,
+        termo: str,
+        ativo: Optional[bool] = None,
+        setor: Optional[str] = None,
+        modo: str = "prefixo",
+        limite: int = 20
+    ) -> List[Funcionario]:
+        """
+        Busca funcionários por nome, cargo ou CPF
+        
+        - prefixo: cada palavra do termo casa com o início de uma palavra do
+          nome ou do cargo, sem diferenciar acentos e maiúsculas; números
+          casam com qualquer trecho do CPF. Usa o índice de busca_tokens.
+        - texto: busca textual do MongoDB (palavras inteiras, com radical em
+          português), ordenada por relevância.
+        """
+        query: Dict[str, Any] = {}
+        if ativo is not None:
+            query["ativo"] = ativo
+        if setor:
+            query["setor"] = setor
+        projecao: Dict[str, Any] = {"_id": 0, **{campo: 0 for campo in CAMPOS_BUSCA}}
+        
+        if modo == "texto":
+            query["$text"] = {"$search": termo}
+            projecao = {"_id": 0, "score": {"$meta": "textScore"}}
+            cursor = self.collection.find(query, projecao).sort([("score", {"$meta": "textScore"})])
+        else:
+            condicoes = []
+            tokens = tokenizar(termo)
+            if tokens and all(token.isdigit() for token in tokens):
+                # Só números (ex. "456.789-0"): trecho contínuo do CPF
+                tokens = ["".join(tokens)]
+            for token in tokens:
+                if token.isdigit():
+                    condicoes.append({"cpf_digitos": {"$regex": re.escape(token)}})
+                else:
+                    # Regex ancorada no início usa os limites do índice
+                    condicoes.append({"busca_tokens": {"$regex": f"^{re.escape(token)}"}})
+            if not condicoes:
+                return []
+            query["$and"] = condicoes
+            cursor = self.collection.find(query, projecao).sort("nome", 1)
+        
+        docs = await cursor.to_list(length=limite)
+        return [Funcionario.model_construct(**doc) for doc in docs]
+
+    async def indexar_busca(self, tamanho_lote: int = 1000) -> int:
+        """Preenche os campos de busca de funcionários gravados antes deles existirem"""
+        total = 0
+        while True:
+            pendentes = await self.collection.find(
+                {"busca_tokens": {"$exists": False}},
+                {"_id": 0, "id": 1, "nome": 1, "cargo": 1, "cpf": 1}
+            ).to_list(length=tamanho_lote)
+            if not pendentes:
+                break
+            await self.collection.bulk_write([
+                UpdateOne(
+                    {"id": doc["id"]},
+                    {"$set": campos_busca(doc.get("nome"), doc.get("cargo"), doc.get("cpf"))}
+                )
+                for doc in pendentes
+            ], ordered=False)
+            total += len(pendentes)
+        if total:
+            logger.info("Campos de busca preenchidos para %s funcionários", total)
+        return total
+
+    async def _buscar_lote(self, campo: str, valores: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Uma consulta $in para todas as chaves pedidas na mesma volta do loop"""
+        cursor = self.collection.find({campo: {"$in": valores}})
+        return {doc[campo]: doc async for doc in cursor}
+
+    async def _carregar(self, campo: str, valor: str) -> Optional[Dict[str, Any]]:
+        """
+        Documento pelo campo único (id ou cpf). Dentro de uma requisição passa
+        pelo carregador em lote; fora dela, consulta direto.
+        """
+        carregadores = carregadores_atuais()
+        if carregadores is None:
+            return await self.collection.find_one({campo: valor})
+        carregador = carregadores.obter(
+            f"funcionarios.{campo}",
+            lambda valores: self._buscar_lote(campo, valores)
+        )
+        return await carregador.carregar(valor)
+
+    def _invalidar_carregadores(self) -> None:
+        """Descarta os documentos já carregados nesta requisição"""
+        carregadores = carregadores_atuais()
+        if carregadores is not None:
+            carregadores.limpar("funcionarios.")
 
     async def get_by_id(self, funcionario_id: str) -> Optional[Funcionario]:
         """Busca funcionário por ID"""
-        doc = await self.collection.find_one({"id": funcionario_id})
+        doc = await self._carregar("id", funcionario_id)
         if doc:
             return Funcionario(**doc)
         return None
 
+    async def get_nomes(self, funcionario_ids: Iterable[str]) -> Dict[str, str]:
+        """
+        Nome atual de cada funcionário encontrado
+
+        Cada ID é buscado como no get_by_id, todos ao mesmo tempo: o carregador
+        junta as buscas em um único $in e reaproveita os já carregados na
+        requisição. Fora de uma requisição abre um escopo próprio.
+        """
+        ids = list(dict.fromkeys(funcionario_ids))
+        with nullcontext() if carregadores_atuais() is not None else escopo_carregadores():
+            docs = await asyncio.gather(*(self._carregar("id", funcionario_id) for funcionario_id in ids))
+        return {funcionario_id: doc["nome"] for funcionario_id, doc in zip(ids, docs) if doc}
+
     async def update(self, funcionario_id: str, update_data: FuncionarioUpdate) -> Optional[Funcionario]:
         """Atualiza um funcionário"""
         # Remove campos None do update
@@ -59,13 +260,33 @@ class FuncionarioService:
             if existing:
                 raise ValueError(f"CPF {update_dict['cpf']} já está em uso")
         
+        # Data da desativação, usada pelo arquivamento de inativos
+        if "ativo" in update_dict:
+            update_dict["desativado_em"] = None if update_dict["ativo"] else datetime.utcnow()
+        
+        # Mantém os campos de busca em dia com nome, cargo e CPF
+        atual = None
+        if {"nome", "cargo", "cpf"} & update_dict.keys():
+            atual = await self.collection.find_one(
+                {"id": funcionario_id},
+                {"_id": 0, "nome": 1, "cargo": 1, "cpf": 1}
+            )
+            if atual:
+                mesclado = {**atual, **update_dict}
+                update_dict.update(campos_busca(mesclado.get("nome"), mesclado.get("cargo"), mesclado.get("cpf")))
+        
         result = await self.collection.update_one(
             {"id": funcionario_id},
             {"$set": update_dict}
         )
         
         if result.modified_count > 0:
-            logger.info(f"Funcionário atualizado: {funcionario_id}")
+            await versoes_colecoes.incrementar("funcionarios")
+            self._invalidar_carregadores()
+            logger.info("Funcionário atualizado: %s", funcionario_id)
+            # Troca de nome: os registros com o nome copiado são atualizados em segundo plano
+            if "nome" in update_dict and atual and atual.get("nome") != update_dict["nome"]:
+                await PropagacaoNomeService(self.db).agendar(funcionario_id, update_dict["nome"])
             return await self.get_by_id(funcionario_id)
         
         return None
@@ -73,17 +294,19 @@ class FuncionarioService:
     async def delete(self, funcionario_id: str) -> bool:
         """Remove um funcionário (soft delete - marca como inativo)"""
         result = await self.collection.update_one(
-            {"id": funcionario_id},
-            {"$set": {"ativo": False}}
+            {"id": funcionario_id, "ativo": {"$ne": False}},
+            {"$set": {"ativo": False, "desativado_em": datetime.utcnow()}}
         )
         if result.modified_count > 0:
-            logger.info(f"Funcionário desativado: {funcionario_id}")
+            await versoes_colecoes.incrementar("funcionarios")
+            self._invalidar_carregadores()
+            logger.info("Funcionário desativado: %s", funcionario_id)
             return True
         return False
 
     async def get_by_cpf(self, cpf: str) -> Optional[Funcionario]:
         """Busca funcionário por CPF"""
-        doc = await self.collection.find_one({"cpf": cpf})
+        doc = await self._carregar("cpf", cpf)
         if doc:
             return Funcionario(**doc)
         return None
@@ -0,0 +1,730 @@
+"""
+Motor de importação de planilhas baseado em esquemas declarativos
+
+Cada dataset descreve suas colunas (tipo, obrigatoriedade, valores aceitos),
+os campos derivados e as chaves de deduplicação. O esquema é compilado uma
+vez em um pipeline que valida o DataFrame inteiro de forma vetorizada e grava
+os registros válidos em lotes, com o mesmo formato de erro para todos.
+
+Importações com hash de conteúdo são registradas na coleção `importacoes`
+com um checkpoint por lote: reenviar o mesmo arquivo não grava nada de novo
+e uma importação interrompida continua do último lote gravado. Os IDs dos
+registros são derivados do hash e do número da linha, então regravar um lote
+interrompido no meio não duplica registros.
+
+A etapa `apos_gravar` (crédito no banco de horas) é registrada no mesmo
+checkpoint do lote: um lote gravado cujo crédito não chegou a rodar é
+creditado na retomada, em vez de voltar como "já existente" e ficar de fora.
+Gravação e crédito de cada lote rodam dentro da `escrita` do esquema, que
+os exclui da reconstrução do banco de horas.
+"""
+from __future__ import annotations
+from contextlib import nullcontext
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pydantic import ValidationError
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, AsyncContextManager, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import asyncio
+import logging
+import os
+import re
+import unicodedata
+import uuid
+
+from core.modulos import modulo_tardio
+from core.versoes import versoes_colecoes
+from models.funcionario import FuncionarioCreate
+from services.calendario_service import calendario
+from services.banco_horas_service import BancoHorasService
+from services.funcionario_service import FuncionarioService, campos_busca
+from services.frequencia_armazenamento import armazenamento_frequencia
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+else:
+    np = modulo_tardio("numpy")
+    pd = modulo_tardio("pandas")
+
+logger = logging.getLogger(__name__)
+
+TIPOS_COLUNA = ("texto", "inteiro", "decimal", "data", "hora")
+REGEX_HORA = r"^\s*(\d{1,2}):(\d{2})"
+
+# Uma importação em andamento sem checkpoint há mais que isso é considerada
+# interrompida e pode ser retomada por um novo envio do mesmo arquivo
+IMPORTACAO_LEASE_SEGUNDOS = int(os.environ.get("IMPORTACAO_LEASE_SEGUNDOS", "120"))
+
+
+@dataclass(frozen=True)
+class Coluna:
+    """Especificação de uma coluna da planilha"""
+    nome: str
+    tipo: str = "texto"
+    obrigatoria: bool = False
+    padrao: Any = None
+    valores: Optional[Sequence[str]] = None
+
+
+@dataclass(frozen=True)
+class EsquemaImportacao:
+    """Esquema declarativo de um dataset importável"""
+    nome: str
+    colecao: str
+    colunas: Sequence[Coluna]
+    # Campos calculados a partir das colunas já convertidas
+    derivados: Dict[str, Callable[[pd.DataFrame], Any]] = field(default_factory=dict)
+    # Chaves naturais: linhas repetidas no arquivo viram erro e registros já
+    # existentes no banco não são duplicados
+    chaves_unicas: Tuple[str, ...] = ()
+    # Etapa assíncrona opcional (ex.: busca de nomes no banco); retorna o
+    # DataFrame enriquecido e uma série de mensagens de erro por linha
+    enriquecer: Optional[
+        Callable[[AsyncIOMotorDatabase, pd.DataFrame], Awaitable[Tuple[pd.DataFrame, pd.Series]]]
+    ] = None
+    # Gravação própria de um lote (ex.: layouts de armazenamento que não são um
+    # documento por linha); retorna (criados, existentes, documentos criados)
+    gravar_lote: Optional[
+        Callable[[AsyncIOMotorDatabase, List[Dict[str, Any]]], Awaitable[Tuple[int, int, List[Dict[str, Any]]]]]
+    ] = None
+    # Etapa assíncrona opcional chamada com os documentos efetivamente criados
+    apos_gravar: Optional[
+        Callable[[AsyncIOMotorDatabase, List[Dict[str, Any]]], Awaitable[None]]
+    ] = None
+    # Quais dos IDs já estão gravados (por padrão, busca pelo campo id na
+    # coleção); usado para reconhecer, na retomada, as linhas que o lote
+    # interrompido chegou a gravar
+    ids_gravados: Optional[
+        Callable[[AsyncIOMotorDatabase, List[str]], Awaitable[Set[str]]]
+    ] = None
+    # Contexto em que cada lote é gravado e passa por apos_gravar (ex.: a
+    # exclusão com a reconstrução do banco de horas)
+    escrita: Optional[Callable[[AsyncIOMotorDatabase], AsyncContextManager[None]]] = None
+    # Aba lida em planilhas Excel; por padrão a primeira
+    planilha: Optional[str] = None
+
+
+class LimiteLinhasExcedido(ValueError):
+    """A planilha tem mais linhas do que o limite de importação"""
+
+
+class ImportacaoEmAndamento(Exception):
+    """O mesmo arquivo já está sendo importado por outra requisição"""
+
+
+def normalizar_nome_coluna(nome: Any) -> str:
+    """'Funcionário ID' -> 'funcionario_id'"""
+    texto = unicodedata.normalize("NFKD", str(nome)).encode("ascii", "ignore").decode()
+    return re.sub(r"\W+", "_", texto.strip().lower()).strip("_")
+
+
+class PipelineImportacao:
+    """Esquema compilado: conversões e validações vetorizadas + escrita em lotes"""
+
+    TAMANHO_LOTE = 1000
+
+    def __init__(self, esquema: EsquemaImportacao):
+        for coluna in esquema.colunas:
+            if coluna.tipo not in TIPOS_COLUNA:
+                raise ValueError(f"Tipo de coluna inválido em {esquema.nome}.{coluna.nome}: {coluna.tipo}")
+        self.esquema = esquema
+        self.obrigatorias = [c.nome for c in esquema.colunas if c.obrigatoria]
+        self.conversores = {
+            "texto": self._texto,
+            "inteiro": self._inteiro,
+            "decimal": self._decimal,
+            "data": self._data,
+            "hora": self._hora,
+        }
+
+    # --- Conversões vetorizadas: retornam (série convertida, máscara de inválidos) ---
+
+    @staticmethod
+    def _vazios(serie: pd.Series) -> pd.Series:
+        return serie.isna() | (serie.astype("string").str.strip() == "")
+
+    def _texto(self, serie: pd.Series) -> Tuple[pd.Series, pd.Series]:
+        convertida = serie.astype("string").str.strip()
+        # Planilhas gravam IDs numéricos como float ("123.0")
+        convertida = convertida.str.replace(r"^(\d+)\.0$", r"\1", regex=True)
+        convertida = convertida.mask(convertida == "")
+        return convertida, pd.Series(False, index=serie.index)
+
+    def _decimal(self, serie: pd.Series) -> Tuple[pd.Series, pd.Series]:
+        texto = serie.astype("string").str.strip().str.replace(",", ".", regex=False)
+        convertida = pd.to_numeric(texto, errors="coerce").astype("Float64")
+        return convertida, convertida.isna() & ~self._vazios(serie)
+
+    def _inteiro(self, serie: pd.Series) -> Tuple[pd.Series, pd.Series]:
+        numerica, invalidos = self._decimal(serie)
+        nao_inteiro = numerica.notna() & (numerica % 1 != 0)
+        return numerica.round().astype("Int64"), invalidos | nao_inteiro.fillna(False)
+
+    def _data(self, serie: pd.Series) -> Tuple[pd.Series, pd.Series]:
+        # ISO (e datas nativas do Excel) primeiro; o que sobrar é lido como DD/MM/AAAA
+        datas = pd.to_datetime(serie, errors="coerce", format="ISO8601")
+        restantes = datas.isna() & ~self._vazios(serie)
+        if restantes.any():
+            datas[restantes] = pd.to_datetime(
+                serie[restantes].astype("string"), errors="coerce", format="mixed", dayfirst=True
+            )
+        convertida = datas.dt.strftime("%Y-%m-%d").astype("string")
+        return convertida, datas.isna() & ~self._vazios(serie)
+
+    def _hora(self, serie: pd.Series) -> Tuple[pd.Series, pd.Series]:
+        partes = serie.astype("string").str.extract(REGEX_HORA)
+        horas = pd.to_numeric(partes[0], errors="coerce")
+        minutos = pd.to_numeric(partes[1], errors="coerce")
+        validas = (horas < 24) & (minutos < 60)
+        convertida = (
+            horas.astype("Int64").astype("string").str.zfill(2) + ":" + partes[1]
+        ).where(validas)
+        return convertida.astype("string"), ~validas.fillna(False) & ~self._vazios(serie)
+
+    # --- Validação ---
+
+    def validar(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+        """
+        Converte e valida o DataFrame inteiro.
+
+        O índice do DataFrame deve ser o número da linha na planilha. Retorna
+        os registros válidos (já com os campos derivados) e a lista de erros.
+        """
+        df = df.rename(columns=normalizar_nome_coluna)
+        ausentes = [c for c in self.obrigatorias if c not in df.columns]
+        if ausentes:
+            raise ValueError(f"Colunas obrigatórias ausentes: {', '.join(ausentes)}")
+
+        saida = pd.DataFrame(index=df.index)
+        mensagens = pd.Series("", index=df.index, dtype="string")
+
+        def registrar(mascara: pd.Series, mensagem: str) -> None:
+            nonlocal mensagens
+            mensagens = mensagens.mask(mascara, mensagens + mensagem + "; ")
+
+        for coluna in self.esquema.colunas:
+            bruta = df[coluna.nome] if coluna.nome in df.columns else pd.Series(pd.NA, index=df.index)
+            convertida, invalidos = self.conversores[coluna.tipo](bruta)
+            registrar(invalidos, f"{coluna.nome} inválido")
+
+            if coluna.padrao is not None:
+                convertida = convertida.fillna(coluna.padrao)
+            if coluna.obrigatoria:
+                registrar(convertida.isna() & ~invalidos, f"{coluna.nome} obrigatório")
+            if coluna.valores is not None:
+                fora = convertida.notna() & ~convertida.isin(coluna.valores)
+                registrar(fora.fillna(False), f"{coluna.nome} deve ser um de: {', '.join(coluna.valores)}")
+            saida[coluna.nome] = convertida
+
+        if self.esquema.chaves_unicas:
+            chaves = list(self.esquema.chaves_unicas)
+            candidatas = mensagens == ""
+            duplicadas = saida[candidatas].duplicated(subset=chaves, keep="first")
+            registrar(duplicadas.reindex(saida.index, fill_value=False), "linha duplicada no arquivo")
+
+        validas = mensagens == ""
+        erros = self._erros(mensagens[~validas])
+        saida = saida[validas]
+
+        for nome, derivar in self.esquema.derivados.items():
+            saida[nome] = derivar(saida) if len(saida) else pd.Series(dtype=object)
+
+        return saida, erros
+
+    @staticmethod
+    def _erros(mensagens: pd.Series) -> List[Dict[str, Any]]:
+        return [
+            {"linha": int(linha), "erro": mensagem.rstrip("; ")}
+            for linha, mensagem in mensagens.items()
+        ]
+
+    # --- Escrita ---
+
+    @staticmethod
+    def _para_documentos(df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Converte para dicionários com None no lugar de NaN/NA"""
+        objetos = df.astype(object)
+        return objetos.where(objetos.notna(), None).to_dict("records")
+
+    async def _ids_gravados(self, db: AsyncIOMotorDatabase, ids: List[str]) -> Set[str]:
+        if self.esquema.ids_gravados:
+            return await self.esquema.ids_gravados(db, ids)
+        return set(await db[self.esquema.colecao].distinct("id", {"id": {"$in": ids}}))
+
+    async def gravar(
+        self,
+        db: AsyncIOMotorDatabase,
+        df: pd.DataFrame,
+        semente: Optional[str] = None,
+        recuperar: bool = False
+    ) -> Dict[str, int]:
+        """
+        Grava os registros válidos em lotes
+
+        Com `semente`, o ID de cada registro é derivado dela e do número da
+        linha e, sem chaves naturais no esquema, o próprio ID vira a chave
+        do upsert: regravar as mesmas linhas não cria duplicatas.
+
+        Com `recuperar` (lote regravado após uma interrupção), as linhas que
+        já existiam com o ID desta importação foram gravadas pela tentativa
+        anterior: contam como criadas e voltam em `novos`.
+        """
+        colecao = db[self.esquema.colecao]
+        chaves = self.esquema.chaves_unicas or (("id",) if semente else ())
+        criados = existentes = 0
+        novos: List[Dict[str, Any]] = []
+
+        for inicio in range(0, len(df), self.TAMANHO_LOTE):
+            lote = df.iloc[inicio:inicio + self.TAMANHO_LOTE].copy()
+            if semente:
+                lote["id"] = [str(uuid.uuid5(uuid.NAMESPACE_OID, f"{semente}:{linha}")) for linha in lote.index]
+            else:
+                lote["id"] = [str(uuid.uuid4()) for _ in range(len(lote))]
+            documentos = self._para_documentos(lote)
+
+            if self.esquema.gravar_lote:
+                lote_criados, lote_existentes, lote_novos = await self.esquema.gravar_lote(db, documentos)
+                criados += lote_criados
+                existentes += lote_existentes
+                novos.extend(lote_novos)
+            elif chaves:
+                operacoes = [
+                    UpdateOne(
+                        {chave: doc[chave] for chave in chaves},
+                        {"$setOnInsert": doc},
+                        upsert=True
+                    )
+                    for doc in documentos
+                ]
+                resultado = await colecao.bulk_write(operacoes, ordered=False)
+                criados += resultado.upserted_count
+                existentes += resultado.matched_count
+                novos.extend(documentos[indice] for indice in resultado.upserted_ids)
+            else:
+                try:
+                    resultado = await colecao.insert_many(documentos, ordered=False)
+                    criados += len(resultado.inserted_ids)
+                    novos.extend(documentos)
+                except BulkWriteError as e:
+                    criados += e.details.get("nInserted", 0)
+                    raise
+
+            if recuperar and semente:
+                ids_novos = {doc["id"] for doc in novos}
+                restantes = [doc for doc in documentos if doc["id"] not in ids_novos]
+                gravados = await self._ids_gravados(db, [doc["id"] for doc in restantes]) if restantes else set()
+                recuperados = [doc for doc in restantes if doc["id"] in gravados]
+                novos.extend(recuperados)
+                criados += len(recuperados)
+                existentes -= len(recuperados)
+
+        return {"criados": criados, "existentes": existentes, "novos": novos}
+
+
+class ImportacaoService:
+    """Executa importações a partir de um esquema declarativo"""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+
+    async def importar(
+        self,
+        esquema: EsquemaImportacao,
+        lotes: Iterable[pd.DataFrame],
+        max_linhas: Optional[int] = None,
+        hash_conteudo: Optional[str] = None,
+        nome_arquivo: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Valida, enriquece e grava os lotes lidos da planilha
+
+        Cada lote é lido e validado em uma thread e gravado antes do próximo
+        ser lido, então a memória usada acompanha o tamanho do lote e não o
+        do arquivo. O índice de cada lote é o número da linha na planilha.
+
+        Com `hash_conteudo`, a importação é registrada em `importacoes`:
+        um arquivo já importado retorna o resultado anterior sem gravar nada
+        e uma importação interrompida pula os lotes já gravados.
+        """
+        pipeline = compilar(esquema)
+        job = None
+        if hash_conteudo:
+            job = await self._iniciar_job(esquema, hash_conteudo, nome_arquivo)
+            if job["status"] == "concluida":
+                logger.info("Importação %s: arquivo já importado (%s)", esquema.nome, job['id'])
+                return self._resultado(job, "Arquivo já importado anteriormente")
+
+        if job and job.get("credito_pendente"):
+            # Lote gravado e registrado, mas a etapa posterior não terminou
+            async with self._escrita(esquema):
+                await self._concluir_pendente(esquema, job["id"], job["credito_pendente"])
+
+        lotes_concluidos = job["lotes_concluidos"] if job else 0
+        criados = job["criados"] if job else 0
+        existentes = job["existentes"] if job else 0
+        erros: List[Dict[str, Any]] = list(job["detalhes_erros"]) if job else []
+        semente = f"{esquema.nome}:{hash_conteudo}" if hash_conteudo else None
+        criados_agora = 0
+        iterador = iter(lotes)
+        total = numero_lote = 0
+
+        try:
+            while True:
+                lote = await asyncio.to_thread(next, iterador, None)
+                if lote is None:
+                    break
+                numero_lote += 1
+                total += len(lote)
+                if max_linhas is not None and total > max_linhas:
+                    raise LimiteLinhasExcedido(f"Planilha excede o limite de {max_linhas} linhas")
+                if numero_lote <= lotes_concluidos:
+                    # Lote gravado antes da interrupção
+                    continue
+
+                validos, erros_lote = await asyncio.to_thread(pipeline.validar, lote)
+
+                if esquema.enriquecer and len(validos):
+                    validos, mensagens = await esquema.enriquecer(self.db, validos)
+                    rejeitados = mensagens.notna() & (mensagens != "")
+                    erros_lote.extend(pipeline._erros(mensagens[rejeitados]))
+                    validos = validos[~rejeitados]
+
+                # Só o primeiro lote não registrado de um job retomado pode ter sido gravado em parte
+                recuperar = bool(job and job.get("retomada") and numero_lote == lotes_concluidos + 1)
+                async with self._escrita(esquema):
+                    resultado = await pipeline.gravar(self.db, validos, semente, recuperar=recuperar)
+                    pendentes = resultado["novos"] if esquema.apos_gravar else []
+                    if job:
+                        await self._checkpoint(job["id"], numero_lote, len(lote), resultado, erros_lote, pendentes)
+                    if pendentes:
+                        if job:
+                            await self._concluir_pendente(esquema, job["id"], pendentes)
+                        else:
+                            await esquema.apos_gravar(self.db, pendentes)
+                criados += resultado["criados"]
+                existentes += resultado["existentes"]
+                criados_agora += resultado["criados"]
+                erros.extend(erros_lote)
+        except Exception as e:
+            if job:
+                await self.db.importacoes.update_one(
+                    {"id": job["id"]},
+                    {"$set": {"status": "erro", "mensagem": str(e), "atualizado_em": datetime.utcnow()}}
+                )
+            raise
+        finally:
+            if criados_agora:
+                await versoes_colecoes.incrementar(esquema.colecao)
+
+        erros.sort(key=lambda e: e["linha"])
+        if job:
+            await self.db.importacoes.update_one(
+                {"id": job["id"]},
+                {"$set": {
+                    "status": "concluida",
+                    "total_processados": total,
+                    "detalhes_erros": erros,
+                    "atualizado_em": datetime.utcnow()
+                }}
+            )
+
+        logger.info(
+            "Importação %s: %s criados, %s já existentes, %s erros",
+            esquema.nome, criados, existentes, len(erros)
+        )
+        resultado = {
+            "message": "Importação concluída",
+            "total_processados": total,
+            "criados": criados,
+            "existentes": existentes,
+            "erros": len(erros),
+            "detalhes_erros": erros
+        }
+        if job:
+            resultado["importacao_id"] = job["id"]
+        return resultado
+
+    async def get_job(self, importacao_id: str) -> Optional[Dict[str, Any]]:
+        """Situação de uma importação registrada"""
+        return await self.db.importacoes.find_one(
+            {"id": importacao_id},
+            {"_id": 0, "detalhes_erros": 0}
+        )
+
+    async def _iniciar_job(
+        self,
+        esquema: EsquemaImportacao,
+        hash_conteudo: str,
+        nome_arquivo: Optional[str]
+    ) -> Dict[str, Any]:
+        """
+        Cria o job do arquivo ou assume um existente
+
+        Jobs concluídos são retornados como estão. Jobs com erro ou sem
+        checkpoint dentro do lease são assumidos por esta requisição; um job
+        ativo em outra requisição gera ImportacaoEmAndamento.
+        """
+        agora = datetime.utcnow()
+        chave = {"esquema": esquema.nome, "hash": hash_conteudo}
+        try:
+            job = {
+                "id": str(uuid.uuid4()),
+                **chave,
+                "nome_arquivo": nome_arquivo,
+                "status": "em_andamento",
+                "lotes_concluidos": 0,
+                "linhas_processadas": 0,
+                "criados": 0,
+                "existentes": 0,
+                "detalhes_erros": [],
+                "criado_em": agora,
+                "atualizado_em": agora
+            }
+            await self.db.importacoes.insert_one(job)
+            job.pop("_id", None)
+            return job
+        except DuplicateKeyError:
+            pass
+
+        job = await self.db.importacoes.find_one_and_update(
+            {
+                **chave,
+                "$or": [
+                    {"status": "erro"},
+                    {"status": "em_andamento", "atualizado_em": {"$lt": agora - timedelta(seconds=IMPORTACAO_LEASE_SEGUNDOS)}}
+                ]
+            },
+            {"$set": {"status": "em_andamento", "atualizado_em": agora}, "$unset": {"mensagem": ""}},
+            projection={"_id": 0, "mensagem": 0}
+        )
+        if job:
+            job.update(status="em_andamento", atualizado_em=agora, retomada=True)
+            logger.info("Importação %s: retomando %s após o lote %s", esquema.nome, job['id'], job['lotes_concluidos'])
+            return job
+
+        job = await self.db.importacoes.find_one(chave, {"_id": 0})
+        if job and job["status"] == "concluida":
+            return job
+        raise ImportacaoEmAndamento("Este arquivo já está sendo importado")
+
+    async def _checkpoint(
+        self,
+        importacao_id: str,
+        numero_lote: int,
+        linhas: int,
+        resultado: Dict[str, int],
+        erros: List[Dict[str, Any]],
+        pendentes: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Registra um lote gravado; a retomada começa do lote seguinte
+
+        Os registros em `pendentes` ainda não passaram por `apos_gravar`:
+        ficam no job até _concluir_pendente, para a retomada completar a etapa.
+        """
+        atualizacao: Dict[str, Any] = {"lotes_concluidos": numero_lote, "atualizado_em": datetime.utcnow()}
+        if pendentes:
+            atualizacao["credito_pendente"] = pendentes
+        await self.db.importacoes.update_one(
+            {"id": importacao_id},
+            {
+                "$set": atualizacao,
+                "$inc": {
+                    "linhas_processadas": linhas,
+                    "criados": resultado["criados"],
+                    "existentes": resultado["existentes"]
+                },
+                "$push": {"detalhes_erros": {"$each": erros}}
+            }
+        )
+
+    def _escrita(self, esquema: EsquemaImportacao) -> AsyncContextManager[None]:
+        return esquema.escrita(self.db) if esquema.escrita else nullcontext()
+
+    async def _concluir_pendente(
+        self,
+        esquema: EsquemaImportacao,
+        importacao_id: str,
+        pendentes: List[Dict[str, Any]]
+    ) -> None:
+        """Executa apos_gravar nos registros pendentes e os retira do job"""
+        await esquema.apos_gravar(self.db, pendentes)
+        await self.db.importacoes.update_one({"id": importacao_id}, {"$unset": {"credito_pendente": ""}})
+
+    @staticmethod
+    def _resultado(job: Dict[str, Any], mensagem: str) -> Dict[str, Any]:
+        erros = job.get("detalhes_erros", [])
+        return {
+            "message": mensagem,
+            "total_processados": job.get("total_processados", job["linhas_processadas"]),
+            "criados": job["criados"],
+            "existentes": job["existentes"],
+            "erros": len(erros),
+            "detalhes_erros": erros,
+            "importacao_id": job["id"]
+        }
+
+
+_compilados: Dict[str, PipelineImportacao] = {}
+
+
+def compilar(esquema: EsquemaImportacao) -> PipelineImportacao:
+    """Compila o esquema uma única vez por processo"""
+    if esquema.nome not in _compilados:
+        _compilados[esquema.nome] = PipelineImportacao(esquema)
+    return _compilados[esquema.nome]
+
+
+# --- Esquemas dos datasets ---
+
+def _minutos(horas: pd.Series) -> pd.Series:
+    partes = horas.astype("string").str.split(":", expand=True)
+    if partes.shape[1] < 2:
+        return pd.Series(np.nan, index=horas.index)
+    return pd.to_numeric(partes[0], errors="coerce") * 60 + pd.to_numeric(partes[1], errors="coerce")
+
+
+def _total_horas(df: pd.DataFrame) -> pd.Series:
+    return ((_minutos(df["hora_saida"]) - _minutos(df["hora_entrada"])) / 60).round(2)
+
+
+async def _enriquecer_frequencia(
+    db: AsyncIOMotorDatabase,
+    df: pd.DataFrame
+) -> Tuple[pd.DataFrame, pd.Series]:
+    """Preenche o nome do funcionário e rejeita IDs inexistentes (uma consulta $in)"""
+    nomes = await FuncionarioService(db).get_nomes(df["funcionario_id"].dropna().unique().tolist())
+
+    df = df.copy()
+    df["nome"] = df["funcionario_id"].map(nomes)
+    mensagens = pd.Series(pd.NA, index=df.index, dtype="string").mask(
+        df["nome"].isna(),
+        "funcionario_id não encontrado"
+    )
+    return df, mensagens
+
+
+async def _gravar_frequencia(
+    db: AsyncIOMotorDatabase,
+    documentos: List[Dict[str, Any]]
+) -> Tuple[int, int, List[Dict[str, Any]]]:
+    """Grava pelo armazenamento configurado, sem duplicar funcionário + data"""
+    return await armazenamento_frequencia(db).inserir_lote(documentos)
+
+
+async def _ids_frequencia(db: AsyncIOMotorDatabase, ids: List[str]) -> Set[str]:
+    return await armazenamento_frequencia(db).ids_existentes(ids)
+
+
+async def _creditar_banco_horas(db: AsyncIOMotorDatabase, registros: List[Dict[str, Any]]) -> None:
+    """Credita no banco de horas os registros de frequência importados"""
+    await BancoHorasService(db).registrar_lote(registros)
+
+
+ESQUEMA_FREQUENCIA = EsquemaImportacao(
+    nome="frequencia",
+    colecao="frequencia",
+    colunas=[
+        Coluna("funcionario_id", obrigatoria=True),
+        Coluna("data", "data", obrigatoria=True),
+        Coluna("hora_entrada", "hora"),
+        Coluna("hora_saida", "hora"),
+        Coluna("tipo_dia", valores=("util", "feriado", "fim_de_semana")),
+        Coluna("observacao"),
+    ],
+    derivados={
+        # Tipo do dia em branco na planilha: classificado pelo calendário
+        "tipo_dia": lambda df: df["tipo_dia"].fillna(calendario.classificar(df["data"]).astype("string")),
+        "total_horas": _total_horas,
+        "atualizado_em": lambda df: datetime.utcnow(),
+    },
+    chaves_unicas=("funcionario_id", "data"),
+    enriquecer=_enriquecer_frequencia,
+    gravar_lote=_gravar_frequencia,
+    apos_gravar=_creditar_banco_horas,
+    ids_gravados=_ids_frequencia,
+    escrita=lambda db: BancoHorasService(db).escrita(),
+)
+
+async def _validar_funcionarios(
+    db: AsyncIOMotorDatabase,
+    df: pd.DataFrame
+) -> Tuple[pd.DataFrame, pd.Series]:
+    """Aplica as regras do modelo (CPF, telefone, e-mail, tamanhos) linha a linha"""
+    mensagens = pd.Series(pd.NA, index=df.index, dtype="string")
+    for linha, registro in zip(df.index, PipelineImportacao._para_documentos(df)):
+        try:
+            FuncionarioCreate(**registro)
+        except ValidationError as e:
+            mensagens[linha] = "; ".join(f"{erro['loc'][0]} inválido" for erro in e.errors())
+    return df, mensagens
+
+
+def _campos_busca(df: pd.DataFrame, campo: str) -> List[Any]:
+    return [
+        campos_busca(nome, cargo, cpf)[campo]
+        for nome, cargo, cpf in zip(df["nome"], df["cargo"], df["cpf"])
+    ]
+
+
+ESQUEMA_FUNCIONARIOS = EsquemaImportacao(
+    nome="funcionarios",
+    colecao="funcionarios",
+    colunas=[
+        Coluna("nome", obrigatoria=True),
+        Coluna("cpf", obrigatoria=True),
+        Coluna("cargo", obrigatoria=True),
+        Coluna("setor", obrigatoria=True),
+        Coluna("data_admissao", "data", obrigatoria=True),
+        Coluna("telefone"),
+        Coluna("email"),
+        Coluna("ativo", padrao="Sim", valores=("Sim", "Não")),
+    ],
+    derivados={
+        "ativo": lambda df: df["ativo"] == "Sim",
+        "busca_tokens": lambda df: _campos_busca(df, "busca_tokens"),
+        "cpf_digitos": lambda df: _campos_busca(df, "cpf_digitos"),
+    },
+    # CPF já cadastrado conta como existente, sem duplicar o funcionário
+    chaves_unicas=("cpf",),
+    enriquecer=_validar_funcionarios,
+    planilha="Funcionários",
+)
+
+ESQUEMA_ALIMENTACAO = EsquemaImportacao(
+    nome="alimentacao",
+    colecao="alimentacao",
+    colunas=[
+        Coluna("funcionario_id", obrigatoria=True),
+        Coluna("nome"),
+        Coluna("data", "data", obrigatoria=True),
+        Coluna("tipo_refeicao", obrigatoria=True),
+        Coluna("valor_unitario", "decimal", padrao=0.0),
+        Coluna("quantidade", "inteiro", padrao=1),
+        Coluna("fornecedor"),
+    ],
+    derivados={
+        "total_dia": lambda df: (df["valor_unitario"] * df["quantidade"]).round(2),
+    },
+    chaves_unicas=("funcionario_id", "data", "tipo_refeicao"),
+)
+
+ESQUEMA_MATERIAIS = EsquemaImportacao(
+    nome="materiais",
+    colecao="materiais",
+    colunas=[
+        Coluna("data", "data", obrigatoria=True),
+        Coluna("descricao", obrigatoria=True),
+        Coluna("local_uso", obrigatoria=True),
+        Coluna("categoria"),
+        Coluna("quantidade", "decimal", padrao=1.0),
+        Coluna("valor_unitario", "decimal", padrao=0.0),
+        Coluna("autorizado_por"),
+    ],
+    derivados={
+        "valor_total": lambda df: (df["quantidade"] * df["valor_unitario"]).round(2),
+    },
+)
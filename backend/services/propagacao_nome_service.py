@@ -0,0 +1,214 @@
+"""
+Propagação do nome do funcionário para os registros desnormalizados
+
+Frequência e alimentação guardam uma cópia do nome do funcionário para que
+as leituras não precisem de $lookup. Quando o nome muda, um job é gravado na
+coleção `propagacoes_nome` e o worker em segundo plano aplica a troca com um
+único update_many por coleção, restrito aos registros daquele funcionário
+(índice de funcionario_id) que ainda têm o nome antigo.
+
+Os jobs ficam no banco: renomeações seguidas do mesmo funcionário viram um
+só job pendente. Todos os workers rodam o propagador, então cada funcionário
+tem no máximo um job em andamento (índice único parcial) e o nome aplicado é
+sempre o atual do cadastro, não o do job: se uma renomeação mais nova terminar
+antes, a mais antiga não grava o nome velho de volta. Um job em andamento sem
+sinal de vida dentro do lease (worker que caiu) é assumido por outro worker.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+from core.versoes import versoes_colecoes
+from services.frequencia_armazenamento import COLECAO_FREQUENCIA
+from typing import Any, Dict, Optional, Set
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Coleções com cópia do nome do funcionário (no layout mensal da frequência,
+# uma cópia por mês)
+COLECOES_COM_NOME = (COLECAO_FREQUENCIA, "alimentacao")
+INTERVALO_SEGUNDOS = float(os.environ.get("PROPAGACAO_NOME_INTERVALO_SEGUNDOS", "30"))
+# Job em andamento sem atualização há mais que isso é considerado interrompido
+LEASE_SEGUNDOS = float(os.environ.get("PROPAGACAO_NOME_LEASE_SEGUNDOS", "300"))
+
+
+class PropagacaoNomeService:
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.collection = db.propagacoes_nome
+
+    async def agendar(self, funcionario_id: str, nome: str) -> str:
+        """Registra (ou atualiza) o job pendente do funcionário e acorda o worker"""
+        agora = datetime.utcnow()
+        await self.collection.update_one(
+            {"funcionario_id": funcionario_id, "status": "pendente"},
+            {
+                "$set": {"nome": nome, "atualizado_em": agora},
+                "$setOnInsert": {"id": str(uuid.uuid4()), "criado_em": agora, "colecoes": {}}
+            },
+            upsert=True
+        )
+        job = await self.collection.find_one(
+            {"funcionario_id": funcionario_id, "status": "pendente"},
+            {"_id": 0, "id": 1}
+        )
+        propagador_nomes.acordar()
+        return job["id"] if job else ""
+
+    async def get_ultimo(self, funcionario_id: str) -> Optional[Dict[str, Any]]:
+        """Job de propagação mais recente do funcionário"""
+        cursor = self.collection.find({"funcionario_id": funcionario_id}, {"_id": 0}).sort("criado_em", -1)
+        jobs = await cursor.to_list(length=1)
+        return jobs[0] if jobs else None
+
+    async def _reivindicar(self, ocupados: Set[str]) -> Optional[Dict[str, Any]]:
+        """
+        Assume o job mais antigo de um funcionário sem outro job em andamento
+
+        Candidatos: pendentes e em andamento com o lease vencido. O índice
+        único parcial garante um job em andamento por funcionário mesmo com
+        dois workers reivindicando ao mesmo tempo.
+        """
+        agora = datetime.utcnow()
+        vencido = agora - timedelta(seconds=LEASE_SEGUNDOS)
+        ocupados.update(await self.collection.distinct(
+            "funcionario_id",
+            {"status": "em_andamento", "atualizado_em": {"$gte": vencido}}
+        ))
+        while True:
+            try:
+                return await self.collection.find_one_and_update(
+                    {
+                        "funcionario_id": {"$nin": list(ocupados)},
+                        "$or": [
+                            {"status": "pendente"},
+                            {"status": "em_andamento", "atualizado_em": {"$lt": vencido}}
+                        ]
+                    },
+                    {"$set": {"status": "em_andamento", "iniciado_em": agora, "atualizado_em": agora}},
+                    projection={"_id": 0},
+                    sort=[("criado_em", 1)]
+                )
+            except DuplicateKeyError as e:
+                # Outro worker assumiu um job do mesmo funcionário entre a consulta e a reivindicação
+                funcionario_id = (e.details or {}).get("keyValue", {}).get("funcionario_id")
+                if funcionario_id is None:
+                    return None
+                ocupados.add(funcionario_id)
+
+    async def processar_pendentes(self) -> int:
+        """Processa os jobs disponíveis em ordem de criação; retorna quantos rodou"""
+        processados = 0
+        ocupados: Set[str] = set()
+        while True:
+            job = await self._reivindicar(ocupados)
+            if not job:
+                return processados
+            await self._processar(job)
+            processados += 1
+
+    async def _processar(self, job: Dict[str, Any]) -> None:
+        try:
+            # O nome aplicado é o atual do cadastro: jobs antigos nunca regravam um nome velho
+            funcionario = await self.db.funcionarios.find_one(
+                {"id": job["funcionario_id"]}, {"_id": 0, "nome": 1}
+            )
+            if funcionario is None:
+                await self.collection.update_one(
+                    {"id": job["id"]},
+                    {"$set": {
+                        "status": "concluida",
+                        "mensagem": "Funcionário não encontrado",
+                        "concluido_em": datetime.utcnow()
+                    }}
+                )
+                return
+            nome = funcionario["nome"]
+            filtro = {"funcionario_id": job["funcionario_id"], "nome": {"$ne": nome}}
+
+            for colecao in COLECOES_COM_NOME:
+                total = await self.db[colecao].count_documents(filtro)
+                await self.collection.update_one(
+                    {"id": job["id"]},
+                    {"$set": {
+                        f"colecoes.{colecao}": {"total": total, "atualizados": 0},
+                        "atualizado_em": datetime.utcnow()
+                    }}
+                )
+                if not total:
+                    continue
+                resultado = await self.db[colecao].update_many(filtro, {"$set": {"nome": nome}})
+                await self.collection.update_one(
+                    {"id": job["id"]},
+                    {"$set": {
+                        f"colecoes.{colecao}.atualizados": resultado.modified_count,
+                        "atualizado_em": datetime.utcnow()
+                    }}
+                )
+                if resultado.modified_count:
+                    await versoes_colecoes.incrementar("frequencia" if colecao == COLECAO_FREQUENCIA else colecao)
+
+            await self.collection.update_one(
+                {"id": job["id"]},
+                {"$set": {"status": "concluida", "nome_aplicado": nome, "concluido_em": datetime.utcnow()}}
+            )
+            logger.info("Nome propagado: %s -> %s", job['funcionario_id'], nome)
+        except Exception as e:
+            logger.error("Erro ao propagar nome de %s: %s", job['funcionario_id'], e)
+            await self.collection.update_one(
+                {"id": job["id"]},
+                {"$set": {"status": "erro", "mensagem": str(e), "concluido_em": datetime.utcnow()}}
+            )
+
+
+class PropagadorNomes:
+    """
+    Worker em segundo plano: roda os jobs pendentes quando acordado por um
+    novo agendamento e, por garantia, a cada intervalo
+    """
+
+    def __init__(self, intervalo_segundos: float = INTERVALO_SEGUNDOS):
+        self.intervalo_segundos = intervalo_segundos
+        self._evento: Optional[asyncio.Event] = None
+        self._tarefa: Optional[asyncio.Task] = None
+
+    def iniciar(self, db: AsyncIOMotorDatabase) -> None:
+        if self._tarefa and not self._tarefa.done():
+            return
+        self._evento = asyncio.Event()
+        self._tarefa = asyncio.create_task(self._executar(PropagacaoNomeService(db)))
+
+    async def parar(self) -> None:
+        if self._tarefa:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
+
+    def acordar(self) -> None:
+        if self._evento is not None:
+            self._evento.set()
+
+    async def _executar(self, service: PropagacaoNomeService) -> None:
+        while True:
+            # Limpo antes de processar: um agendamento durante o processamento
+            # faz a espera abaixo retornar na hora
+            self._evento.clear()
+            try:
+                await service.processar_pendentes()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Erro no worker de propagação de nomes: %s", e)
+            try:
+                await asyncio.wait_for(self._evento.wait(), timeout=self.intervalo_segundos)
+            except asyncio.TimeoutError:
+                pass
+
+
+propagador_nomes = PropagadorNomes()
@@ -2,12 +2,20 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 from models.relatorio import RelatorioRequest, RelatorioResponse
 from services.frequencia_service import FrequenciaService
 from services.funcionario_service import FuncionarioService
+from services.calendario_service import calendario
+from core.estado import estado_compartilhado, versoes_publicadas
 from typing import Dict, Any, List
 from datetime import datetime
+import hashlib
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+# Relatórios prontos ficam no estado compartilhado (visível a todos os workers)
+# enquanto funcionários e frequência não mudam; 0 desativa o cache
+RELATORIOS_CACHE_TTL = float(os.environ.get("RELATORIOS_CACHE_TTL", "300"))
+
 
 class RelatorioService:
     def __init__(self, db: AsyncIOMotorDatabase):
@@ -16,7 +24,24 @@ class RelatorioService:
         self.funcionario_service = FuncionarioService(db)
 
     async def gerar_relatorio(self, request: RelatorioRequest) -> RelatorioResponse:
-        """Gera relatório baseado nos parâmetros"""
+        """Gera relatório baseado nos parâmetros, reaproveitando o cache compartilhado"""
+        if RELATORIOS_CACHE_TTL <= 0:
+            return await self._gerar(request)
+
+        # A chave inclui as versões publicadas: qualquer escrita, em qualquer worker, a invalida
+        versoes = await versoes_publicadas("funcionarios", "frequencia")
+        parametros = hashlib.sha1(request.model_dump_json().encode()).hexdigest()
+        chave = f"relatorio:{versoes}:{parametros}"
+
+        em_cache = await estado_compartilhado.obter(chave)
+        if em_cache:
+            return RelatorioResponse.model_validate_json(em_cache)
+
+        relatorio = await self._gerar(request)
+        await estado_compartilhado.definir(chave, relatorio.model_dump_json(), ttl=RELATORIOS_CACHE_TTL)
+        return relatorio
+
+    async def _gerar(self, request: RelatorioRequest) -> RelatorioResponse:
         if request.tipo == "frequencia":
             return await self._relatorio_frequencia(request)
         elif request.tipo == "geral":
@@ -31,13 +56,18 @@ class RelatorioService:
         registros = await self.frequencia_service.get_all(
             data_inicio=request.data_inicio,
             data_fim=request.data_fim,
-            funcionario_id=request.funcionario_id
+            funcionario_id=request.funcionario_id,
+            trusted=True
         )
         
         # Filtra por setor se necessário
         if request.setor:
-            funcionarios_setor = await self.funcionario_service.get_all(setor=request.setor)
-            ids_setor = {f.id for f in funcionarios_setor}
+            funcionarios_setor = await self.funcionario_service.get_all_raw(
+                setor=request.setor,
+                projection={"id": 1},
+                limit=None
+            )
+            ids_setor = {f["id"] for f in funcionarios_setor}
             registros = [r for r in registros if r.funcionario_id in ids_setor]
         
         # Calcula totalizadores
@@ -61,6 +91,16 @@ class RelatorioService:
             if registro.hora_entrada and registro.hora_saida:
                 por_funcionario[registro.funcionario_id]["dias_trabalhados"] += 1
         
+        # Nome atual (o gravado no registro pode estar à espera da propagação)
+        nomes = await self.funcionario_service.get_nomes(por_funcionario)
+        for funcionario_id, dados in por_funcionario.items():
+            dados["nome"] = nomes.get(funcionario_id, dados["nome"])
+        
+        # Dias úteis do período (sem fins de semana e feriados) para a taxa de presença
+        dias_uteis = calendario.dias_uteis(request.data_inicio, request.data_fim)
+        for dados in por_funcionario.values():
+            dados["taxa_presenca"] = round(dados["dias_trabalhados"] / dias_uteis, 4) if dias_uteis else None
+        
         return RelatorioResponse(
             tipo="frequencia",
             periodo={
@@ -71,27 +111,29 @@ class RelatorioService:
             totalizadores={
                 "total_registros": total_registros,
                 "total_horas": round(total_horas, 2),
-                "total_funcionarios": len(por_funcionario)
+                "total_funcionarios": len(por_funcionario),
+                "dias_uteis": dias_uteis
             },
             gerado_em=datetime.utcnow().isoformat()
         )
 
     async def _relatorio_geral(self, request: RelatorioRequest) -> RelatorioResponse:
         """Gera relatório geral com resumo de todas as áreas"""
-        # Busca dados de frequência
-        registros_freq = await self.frequencia_service.get_all(
+        # Busca dados de frequência (apenas o campo usado no resumo)
+        registros_freq = await self.frequencia_service.get_all_raw(
             data_inicio=request.data_inicio,
-            data_fim=request.data_fim
+            data_fim=request.data_fim,
+            projection={"total_horas": 1}
         )
         
         # Busca todos os funcionários ativos
-        funcionarios = await self.funcionario_service.get_all(ativo=True)
+        funcionarios = await self.funcionario_service.get_all(ativo=True, trusted=True)
         
         # Filtra por setor se necessário
         if request.setor:
             funcionarios = [f for f in funcionarios if f.setor == request.setor]
         
-        total_horas_trabalhadas = sum(r.total_horas or 0 for r in registros_freq)
+        total_horas_trabalhadas = sum(r.get("total_horas") or 0 for r in registros_freq)
         
         return RelatorioResponse(
             tipo="geral",
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Os módulos do backend são importados como no servidor (a partir de backend/)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
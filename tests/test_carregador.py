@@ -0,0 +1,90 @@
+"""
+Carregamento em lote: N buscas de funcionário na mesma volta do loop viram
+uma única consulta $in
+"""
+import asyncio
+from types import SimpleNamespace
+
+from core.carregador import CarregadorEmLote, escopo_carregadores
+from services.funcionario_service import FuncionarioService
+
+
+class ColecaoFalsa:
+    """Coleção em memória que registra as consultas recebidas"""
+
+    def __init__(self, documentos):
+        self.documentos = documentos
+        self.consultas = []
+
+    def find(self, filtro, *args, **kwargs):
+        self.consultas.append(filtro)
+        campo, condicao = next(iter(filtro.items()))
+
+        async def cursor():
+            for doc in self.documentos:
+                if doc[campo] in condicao["$in"]:
+                    yield dict(doc)
+
+        return cursor()
+
+    async def find_one(self, filtro, *args, **kwargs):
+        self.consultas.append(filtro)
+        campo, valor = next(iter(filtro.items()))
+        return next((dict(doc) for doc in self.documentos if doc[campo] == valor), None)
+
+
+def _servico(quantidade=20):
+    documentos = [
+        {
+            "id": f"f{i}",
+            "nome": f"Funcionário {i}",
+            "cpf": f"000.000.000-{i:02d}",
+            "cargo": "Pedreiro",
+            "setor": "Obras",
+            "data_admissao": "2024-01-15",
+            "ativo": True,
+        }
+        for i in range(quantidade)
+    ]
+    colecao = ColecaoFalsa(documentos)
+    return FuncionarioService(SimpleNamespace(funcionarios=colecao)), colecao
+
+
+def test_carregador_agrupa_chaves_da_mesma_volta():
+    lotes = []
+
+    async def buscar_lote(chaves):
+        lotes.append(list(chaves))
+        return {chave: chave.upper() for chave in chaves}
+
+    async def executar():
+        carregador = CarregadorEmLote(buscar_lote)
+        return await asyncio.gather(*(carregador.carregar(c) for c in ["a", "b", "a", "c", "b"]))
+
+    assert asyncio.run(executar()) == ["A", "B", "A", "C", "B"]
+    assert lotes == [["a", "b", "c"]]
+
+
+def test_get_by_id_concorrentes_viram_um_in():
+    servico, colecao = _servico()
+
+    async def executar():
+        with escopo_carregadores():
+            funcionarios = await asyncio.gather(*(servico.get_by_id(f"f{i}") for i in range(20)))
+            # Já carregados na requisição: não voltam ao banco
+            await servico.get_by_id("f3")
+        return funcionarios
+
+    funcionarios = asyncio.run(executar())
+    assert [f.id for f in funcionarios] == [f"f{i}" for i in range(20)]
+    assert colecao.consultas == [{"id": {"$in": [f"f{i}" for i in range(20)]}}]
+
+
+def test_get_nomes_fora_de_requisicao_faz_uma_consulta():
+    servico, colecao = _servico()
+    ids = ["f1", "f2", "f1", "inexistente", "f7"]
+
+    nomes = asyncio.run(servico.get_nomes(ids))
+
+    assert nomes == {"f1": "Funcionário 1", "f2": "Funcionário 2", "f7": "Funcionário 7"}
+    assert colecao.consultas == [{"id": {"$in": ["f1", "f2", "inexistente", "f7"]}}]
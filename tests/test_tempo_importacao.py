@@ -0,0 +1,89 @@
+"""
+Orçamento de tempo de importação do servidor (cold start)
+
+Importa `server` em um interpretador novo, algumas vezes, e verifica:
+- a mediana do tempo de importação fica abaixo do orçamento
+- pandas, numpy e openpyxl não foram carregados (só no primeiro uso)
+- nenhuma conexão com o MongoDB foi aberta (o cliente é criado no startup)
+
+E que classificar o dia de um ponto (calendario.tipo_dia, chamado a cada
+registro sem tipo_dia) também não carrega o numpy.
+
+O orçamento pode ser ajustado com ORCAMENTO_IMPORTACAO_MS. Para ver os
+módulos mais lentos: `python -X importtime -c "import server"` em backend/.
+"""
+from pathlib import Path
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+ORCAMENTO_MS = float(os.environ.get("ORCAMENTO_IMPORTACAO_MS", "1500"))
+REPETICOES = 5
+MODULOS_TARDIOS = ("pandas", "numpy", "openpyxl")
+
+SONDA = """
+import json, sys, time
+inicio = time.perf_counter()
+import server
+duracao = (time.perf_counter() - inicio) * 1000
+print(json.dumps({
+    "ms": duracao,
+    "carregados": [m for m in %r if m in sys.modules],
+    "cliente_mongo": server.client is not None,
+}))
+""" % (MODULOS_TARDIOS,)
+
+SONDA_CALENDARIO = """
+import json, sys
+from services.calendario_service import calendario
+calendario.tipo_dia("2025-01-20")
+calendario.dias_uteis("2025-01-01", "2025-12-31")
+print(json.dumps({"numpy": "numpy" in sys.modules}))
+"""
+
+
+def _ambiente() -> dict:
+    # Endereço que não responde: se algo tentar conectar, não conecta de verdade
+    return {
+        **os.environ,
+        "MONGO_URL": os.environ.get("MONGO_URL", "mongodb://127.0.0.1:9"),
+        "DB_NAME": os.environ.get("DB_NAME", "orcamento_importacao"),
+    }
+
+
+def _sondar(sonda: str = SONDA) -> dict:
+    saida = subprocess.run(
+        [sys.executable, "-c", sonda], cwd=BACKEND_DIR, env=_ambiente(),
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+@pytest.fixture(scope="module")
+def sondas() -> list:
+    # A primeira execução compila os .pyc e aquece o cache de disco
+    _sondar()
+    return [_sondar() for _ in range(REPETICOES)]
+
+
+def test_importacao_dentro_do_orcamento(sondas):
+    mediana = statistics.median(sonda["ms"] for sonda in sondas)
+    assert mediana <= ORCAMENTO_MS, f"importação de server levou {mediana:.0f} ms (orçamento {ORCAMENTO_MS:.0f} ms)"
+
+
+def test_modulos_pesados_nao_carregados(sondas):
+    assert sondas[-1]["carregados"] == []
+
+
+def test_cliente_mongo_nao_criado_na_importacao(sondas):
+    assert sondas[-1]["cliente_mongo"] is False
+
+
+def test_tipo_dia_nao_carrega_numpy():
+    assert _sondar(SONDA_CALENDARIO)["numpy"] is False